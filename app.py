@@ -1,9 +1,8 @@
 # ia_resumen_bancario.py
 # Herramienta para uso interno - AIE San Justo
 
-import io, re
+import hashlib, time
 from pathlib import Path
-import numpy as np
 import pandas as pd
 import streamlit as st
 
@@ -23,95 +22,26 @@ except Exception as e:
     st.error(f"No se pudo importar pdfplumber: {e}\nRevisá requirements.txt")
     st.stop()
 
-# Para PDF del “Resumen Operativo: Registración Módulo IVA”
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib import colors
-    REPORTLAB_OK = True
-except Exception:
-    REPORTLAB_OK = False
-
-# --- regex base ---
-DATE_RE  = re.compile(r"\b\d{1,2}/\d{2}/\d{2,4}\b")  # dd/mm/aa o dd/mm/aaaa
-
-# ACEPTA IMPORTES CON SIGNO ADELANTE O GUION ATRÁS (ej: -2.114.972,30 o 2.114.972,30-)
-MONEY_RE = re.compile(
-    r'(?<!\S)-?(?:\d{1,3}(?:\.\d{3})*|\d+)\s?,\s?\d{2}-?(?!\S)'
-)
-
-LONG_INT_RE = re.compile(r"\b\d{6,}\b")
-
-# ====== PATRONES ESPECÍFICOS ======
-# ---- Banco Macro ----
-HYPH = r"[-\u2010\u2011\u2012\u2013\u2014\u2212]"  # guiones variantes
-ACCOUNT_TOKEN_RE = re.compile(rf"\b\d\s*{HYPH}\s*\d{{3}}\s*{HYPH}\s*\d{{10}}\s*{HYPH}\s*\d\b")
-SALDO_ANT_PREFIX   = re.compile(r"^SALDO\s+U?LTIMO\s+EXTRACTO\s+AL", re.IGNORECASE)
-SALDO_FINAL_PREFIX = re.compile(r"^SALDO\s+FINAL\s+AL\s+D[ÍI]A",     re.IGNORECASE)
-RE_MACRO_ACC_START = re.compile(r"^CUENTA\s+(.+)$", re.IGNORECASE)
-RE_HAS_NRO         = re.compile(r"\bN[ROº°\.]*\s*:?\b", re.IGNORECASE)
-RE_MACRO_ACC_NRO   = re.compile(rf"N[ROº°\.]*\s*:?\s*({ACCOUNT_TOKEN_RE.pattern})", re.IGNORECASE)
-PER_PAGE_TITLE_PAT = re.compile(rf"^CUENTA\s+.+N[ROº°\.]*\s*:?\s*({ACCOUNT_TOKEN_RE.pattern})", re.IGNORECASE)
-HEADER_ROW_PAT = re.compile(r"^(FECHA\s+DESCRIPC(?:I[ÓO]N|ION)|FECHA\s+CONCEPTO|FECHA\s+DETALLE).*(SALDO|D[ÉE]BITO|CR[ÉE]DITO)", re.IGNORECASE)
-NON_MOV_PAT    = re.compile(r"(INFORMACI[ÓO]N\s+DE\s+SU/S\s+CUENTA/S|TOTAL\s+RESUMEN\s+OPERATIVO|RESUMEN\s+DEL\s+PER[IÍ]ODO)", re.IGNORECASE)
-INFO_HEADER    = re.compile(r"INFORMACI[ÓO]N\s+DE\s+SU/S\s+CUENTA/S", re.IGNORECASE)
-
-# ---- Banco de Santa Fe (Consolidado de cuentas) ----
-SF_ACC_LINE_RE = re.compile(
-    r"\b(Cuenta\s+Corriente\s+Pesos|Cuenta\s+Corriente\s+En\s+D[óo]lares|Caja\s+de\s+Ahorro\s+Pesos|Caja\s+de\s+Ahorro\s+En\s+D[óo]lares)\s+Nro\.?\s*([0-9][0-9./-]*)",
-    re.IGNORECASE
-)
-
-# ---- Banco Nación (BNA) ----
-BNA_NAME_HINT = "BANCO DE LA NACION ARGENTINA"
-BNA_PERIODO_RE = re.compile(r"PERIODO:\s*(\d{2}/\d{2}/\d{4})\s*AL\s*(\d{2}/\d{2}/\d{4})", re.IGNORECASE)
-BNA_CUENTA_CBU_RE = re.compile(
-    r"NRO\.\s*CUENTA\s+SUCURSAL\s+CLAVE\s+BANCARIA\s+UNIFORME\s+\(CBU\)\s*[\r\n]+(\d+)\s+\d+\s+(\d{22})",
-    re.IGNORECASE
-)
-# Captura número de cuenta luego de "NRO. CUENTA SUCURSAL" (variante sin CBU en la misma caja)
-BNA_ACC_ONLY_RE = re.compile(
-    r"NRO\.\s*CUENTA\s+SUCURSAL\s*[:\-]?\s*[\r\n ]+(\d{6,})",
-    re.IGNORECASE
+from parsers.core import (
+    fmt_ar, fmt_ar_series, formatted_money, build_csv, detect_bank_from_text,
+    filter_movements, MONEY_COLS,
+    account_meta, movements_table, summary_table, build_parquet, build_arrow,
+    consolidated_movements, consolidated_resumen, resumen_table, build_xlsx, RESUMEN_COLS,
+    result_memory, process_rss, ACCOUNT_WORKERS,
+    corrected_report, account_xlsx,
 )
-# Bloque de gastos finales post “SALDO FINAL”
-BNA_GASTOS_RE = re.compile(
-    r"-\s*(INTERESES|COMISION|SELLADOS|I\.V\.A\.?\s*BASE|SEGURO\s+DE\s+VIDA)\s*\$\s*([0-9\.\s]+,\d{2})",
-    re.IGNORECASE
-)
-
-# ---- NUEVO: Santa Fe - "SALDO ULTIMO RESUMEN" sin fecha ----
-SF_SALDO_ULT_RE = re.compile(r"SALDO\s+U?LTIMO\s+RESUMEN", re.IGNORECASE)
+from parsers.jobs import JOBS, METRICS_WINDOW
+from parsers.pipeline import STAGES, Run, run_statement, run_text, statement_pages, trace_summary
+from parsers.pagecache import PAGE_CACHE
+from parsers.reglas import RULES
 
-# --- utils ---
-def normalize_money(tok: str) -> float:
-    """
-    Normaliza importes argentinos, aceptando:
-    -2.114.972,30   ó   2.114.972,30-
-    """
-    if not tok:
-        return np.nan
-    tok = tok.strip().replace("−", "-")
-    neg = tok.endswith("-") or tok.startswith("-")
-    tok = tok.strip("-")
-    if "," not in tok:
-        return np.nan
-    main, frac = tok.rsplit(",", 1)
-    main = main.replace(".", "").replace(" ", "")
-    try:
-        val = float(f"{main}.{frac}")
-        return -val if neg else val
-    except Exception:
-        return np.nan
-
-
-def fmt_ar(n) -> str:
-    if n is None or (isinstance(n, float) and np.isnan(n)):
-        return "—"
-    return f"{n:,.2f}".replace(",", "§").replace(".", ",").replace("§", ".")
+# Copy-on-Write (de toda la app): seleccionar columnas, assign, drop, etc. comparten los datos del
+# DataFrame original hasta que alguien escribe; así las vistas de la UI/exportes no duplican los
+# movimientos de la sesión. Se activa acá y no en parsers.core para no cambiarle pandas a quien lo importe.
+pd.set_option("mode.copy_on_write", True)
 
 
+# --- utils UI ---
 def metric_full(label: str, value: str):
     """
     Alternativa a st.metric para evitar truncado con '...' en valores largos.
@@ -137,532 +67,228 @@ def metric_full(label: str, value: str):
     )
 
 
-def lines_from_text(page):
-    txt = page.extract_text() or ""
-    return [" ".join(l.split()) for l in txt.splitlines()]
-
-
-def lines_from_words(page, ytol=2.0):
-    words = page.extract_words(extra_attrs=["x0", "top"])
-    if not words:
-        return []
-    words.sort(key=lambda w: (round(w["top"] / ytol), w["x0"]))
-    lines, cur, band = [], [], None
-    for w in words:
-        b = round(w["top"] / ytol)
-        if band is None or b == band:
-            cur.append(w)
-        else:
-            # cerramos la línea anterior
-            lines.append(" ".join(x["text"] for x in cur))
-            cur = [w]
-        band = b
-    if cur:
-        lines.append(" ".join(x["text"] for x in cur))
-    return [" ".join(l.split()) for l in lines]
-
-
-def normalize_desc(desc: str) -> str:
-    if not desc:
-        return ""
-    u = desc.upper()
-    for pref in ("SAN JUS ", "CASA RO ", "CENTRAL ", "GOBERNA ", "GOBERNADOR ", "SANTA FE ", "ROSARIO "):
-        if u.startswith(pref):
-            u = u[len(pref):]
-            break
-    u = LONG_INT_RE.sub("", u)
-    u = " ".join(u.split())
-    return u
-
-
-# ---------- Detección de banco (solo banner) ----------
-BANK_MACRO_HINTS    = ("BANCO MACRO","CUENTA CORRIENTE BANCARIA","SALDO ULTIMO EXTRACTO AL","DEBITO FISCAL IVA BASICO","N/D DBCR 25413")
-BANK_SANTAFE_HINTS  = ("BANCO DE SANTA FE","NUEVO BANCO DE SANTA FE","SALDO ANTERIOR","IMPTRANS","IVA GRAL")
-BANK_NACION_HINTS   = (BNA_NAME_HINT, "SALDO ANTERIOR", "SALDO FINAL", "I.V.A. BASE", "COMIS.")
-
-
-def _text_from_pdf(file_like) -> str:
-    try:
-        with pdfplumber.open(file_like) as pdf:
-            return "\n".join((p.extract_text() or "") for p in pdf.pages)
-    except Exception:
-        return ""
-
-
-def detect_bank_from_text(txt: str) -> str:
-    U = (txt or "").upper()
-    score_macro = sum(1 for k in BANK_MACRO_HINTS   if k in U)
-    score_sf    = sum(1 for k in BANK_SANTAFE_HINTS if k in U)
-    score_bna   = sum(1 for k in BANK_NACION_HINTS  if k in U)
-    scores = [
-        ("Banco Macro",              score_macro),
-        ("Banco de Santa Fe",        score_sf),
-        ("Banco de la Nación Argentina", score_bna),
-    ]
-    scores.sort(key=lambda x: x[1], reverse=True)
-    return scores[0][0] if scores[0][1] > 0 else "Banco no identificado"
-
-
-# ---------- extracción de líneas ----------
-def extract_all_lines(file_like):
-    out = []
-    with pdfplumber.open(file_like) as pdf:
-        for pi, p in enumerate(pdf.pages, start=1):
-            lt = lines_from_text(p)
-            lw = lines_from_words(p, ytol=2.0)
-            seen = set(lt)
-            combined = lt + [l for l in lw if l not in seen]
-            out.extend([(pi, l) for l in combined if l.strip()])
-    return out
-
-
-# ---------- “Información de su/s Cuenta/s” (whitelist Macro) ----------
-def _normalize_account_token(tok: str) -> str:
-    return re.sub(rf"\s*{HYPH}\s*", "-", tok)
-
-
-def macro_extract_account_whitelist(file_like) -> dict:
-    info = {}
-    all_lines = extract_all_lines(file_like)
-    in_table = False
-    last_tipo = None
-    for _, ln in all_lines:
-        if INFO_HEADER.search(ln):
-            in_table = True
-            continue
-        if in_table:
-            m_token = ACCOUNT_TOKEN_RE.search(ln)
-            if m_token:
-                nro = _normalize_account_token(m_token.group(0))
-                u = ln.upper()
-                if "CORRIENTE" in u and "ESPECIAL" in u and ("DOLAR" in u or "DÓLAR" in u or "DOLARES" in u or "DÓLARES" in u):
-                    tipo = "CUENTA CORRIENTE ESPECIAL EN DOLARES"
-                elif "CORRIENTE" in u and "ESPECIAL" in u:
-                    tipo = "CUENTA CORRIENTE ESPECIAL EN PESOS"
-                elif "CUENTA CORRIENTE BANCARIA" in u:
-                    tipo = "CUENTA CORRIENTE BANCARIA"
+
+def wait_for_job(job, label: str):
+    """
+    Muestra el avance por página del trabajo en segundo plano hasta que termine y devuelve su resultado.
+    Si el usuario interactúa, Streamlit corta esta espera con un rerun; el trabajo sigue en el pool
+    y el próximo run lo retoma desde JOBS. Mientras espera turno (la cola es de todo el proceso) se
+    muestra su lugar en la cola.
+    """
+    if not job.done():
+        with st.status(label, expanded=True) as status:
+            bar = st.progress(0.0)
+            while not job.done():
+                if job.started is None:
+                    m = JOBS.metrics()
+                    bar.progress(0.0, text=(
+                        f"En cola: posición {JOBS.position(job)} de {m['en_cola']} "
+                        f"({m['en_curso']} PDF(s) procesándose; primero los de menos páginas) · "
+                        f"esperando hace {job.wait_seconds:.0f} s"
+                    ))
+                elif job.total_steps:
+                    bar.progress(job.fraction, text=f"{job.stage}: página {job.done_steps} de {job.total_steps}")
                 else:
-                    tipo = last_tipo or "CUENTA"
-                info[nro] = {"titulo": tipo}
-                last_tipo = tipo
-            else:
-                if ln.strip().startswith("CUENTA ") and "NRO" in ln.upper():
-                    break
-    return info
-
-
-def _normalize_title_from_pending(pending_title: str) -> str:
-    t = pending_title.upper()
-    if "CORRIENTE" in t and "ESPECIAL" in t and ("DOLAR" in t or "DÓLAR" in t): return "CUENTA CORRIENTE ESPECIAL EN DOLARES"
-    if "CORRIENTE" in t and "ESPECIAL" in t:                                   return "CUENTA CORRIENTE ESPECIAL EN PESOS"
-    if "CORRIENTE" in t:                                                       return "CUENTA CORRIENTE BANCARIA"
-    if "CAJA DE AHORRO" in t:                                                  return "CAJA DE AHORRO"
-    return "CUENTA"
-
-
-# ---------- Macro: segmentación por cuentas (ID = número completo) ----------
-def macro_split_account_blocks(file_like):
-    whitelist = macro_extract_account_whitelist(file_like)
-    white_set = set(whitelist.keys())
-
-    all_lines = extract_all_lines(file_like)
-    accounts, order = {}, []
-    current_nro = None
-    pending_title = None
-    expect_token_in = 0
-
-    def open_block(nro: str, pi: int, titulo_hint: str | None):
-        nonlocal accounts, order, current_nro
-        titulo = (whitelist.get(nro, {}) or {}).get("titulo") or (titulo_hint and _normalize_title_from_pending(titulo_hint)) or "CUENTA"
-        if nro not in accounts:
-            accounts[nro] = {"titulo": titulo, "nro": nro, "lines": [], "pages": [pi, pi], "acc_id": nro}
-            order.append(nro)
-        else:
-            accounts[nro]["pages"][1] = max(accounts[nro]["pages"][1], pi)
-            if accounts[nro]["titulo"] == "CUENTA" and titulo != "CUENTA":
-                accounts[nro]["titulo"] = titulo
-        current_nro = nro
-
-    for (pi, ln) in all_lines:
-        m_title = RE_MACRO_ACC_START.match(ln)
-        if m_title:
-            pending_title = "CUENTA " + m_title.group(1).strip()
-            expect_token_in = 12
-            m_same_line = RE_MACRO_ACC_NRO.search(ln) or ACCOUNT_TOKEN_RE.search(ln)
-            if m_same_line:
-                nro = _normalize_account_token(m_same_line.group(1) if m_same_line.re is RE_MACRO_ACC_NRO else m_same_line.group(0))
-                if (not white_set) or (nro in white_set):
-                    open_block(nro, pi, pending_title)
-                    pending_title = None
-                    expect_token_in = 0
-            continue
-
-        if pending_title and expect_token_in > 0:
-            expect_token_in -= 1
-            m_nro = RE_MACRO_ACC_NRO.search(ln)
-            if m_nro:
-                nro = _normalize_account_token(m_nro.group(1))
-                if (not white_set) or (nro in white_set):
-                    open_block(nro, pi, pending_title)
-                pending_title = None
-                expect_token_in = 0
-                continue
-            m_tok = ACCOUNT_TOKEN_RE.search(ln)
-            if m_tok:
-                nro = _normalize_account_token(m_tok.group(0))
-                if (not white_set) or (nro in white_set):
-                    open_block(nro, pi, pending_title)
-                pending_title = None
-                expect_token_in = 0
-                continue
-            if RE_HAS_NRO.search(ln):
-                expect_token_in = max(expect_token_in, 12)
-                continue
-
-        if (not pending_title) and white_set:
-            m_fallback = ACCOUNT_TOKEN_RE.search(ln)
-            if m_fallback:
-                nro = _normalize_account_token(m_fallback.group(0))
-                if nro in white_set and current_nro != nro:
-                    open_block(nro, pi, None)
-
-        if current_nro is not None:
-            acc = accounts[current_nro]
-            acc["lines"].append(ln)
-            acc["pages"][1] = max(acc["pages"][1], pi)
-
-    blocks = []
-    for nro in order:
-        acc = accounts[nro]
-        acc["pages"] = tuple(acc["pages"])
-        blocks.append(acc)
-    return blocks
-
-
-# ---------- Parsing movimientos (genérico: Macro/SF/BNA) ----------
-def parse_lines(lines) -> pd.DataFrame:
-    rows = []
-    seq = 0  # preserva orden exacto de aparición
-    for ln in lines:
-        if not ln.strip():
-            continue
-        if PER_PAGE_TITLE_PAT.search(ln) or HEADER_ROW_PAT.search(ln) or NON_MOV_PAT.search(ln):
-            continue
-        am = list(MONEY_RE.finditer(ln))
-        if len(am) < 2:
-            continue
-        d = DATE_RE.search(ln)
-        if not d or d.end() >= am[0].start():
-            continue
-        saldo   = normalize_money(am[-1].group(0))
-        importe = normalize_money(am[-2].group(0))
-        first_money = am[0]
-        desc = ln[d.end(): first_money.start()].strip()
-        seq += 1
-        rows.append({
-            "fecha": pd.to_datetime(d.group(0), dayfirst=True, errors="coerce"),
-            "descripcion": desc,
-            "desc_norm": normalize_desc(desc),
-            "debito": 0.0,
-            "credito": 0.0,
-            "importe": importe,      # informativo; conciliamos por Δ saldo
-            "saldo": saldo,
-            "pagina": 0,
-            "orden": seq
-        })
-    return pd.DataFrame(rows)
-
-
-# ---------- Saldos ----------
-def _only_one_amount(line: str) -> bool:
-    return len(list(MONEY_RE.finditer(line))) == 1
-
-
-def _first_amount_value(line: str) -> float:
-    m = MONEY_RE.search(line)
-    return normalize_money(m.group(0)) if m else np.nan
-
-
-def find_saldo_final_from_lines(lines):
-    # 1) Macro/otros con formato expreso
-    for ln in reversed(lines):
-        if SALDO_FINAL_PREFIX.match(ln):
-            d = DATE_RE.search(ln)
-            if d and _only_one_amount(ln):
-                fecha = pd.to_datetime(d.group(0), dayfirst=True, errors="coerce")
-                saldo = _first_amount_value(ln)
-                if pd.notna(fecha) and not np.isnan(saldo):
-                    return fecha, saldo
-    # 2) BNA: "SALDO FINAL" sin fecha
-    for ln in reversed(lines):
-        if "SALDO FINAL" in ln.upper() and _only_one_amount(ln):
-            saldo = _first_amount_value(ln)
-            if not np.isnan(saldo):
-                return pd.NaT, saldo
-    return pd.NaT, np.nan
-
-
-def find_saldo_anterior_from_lines(lines):
-    # 1) Macro (expreso con fecha)
-    for ln in lines:
-        if SALDO_ANT_PREFIX.match(ln):
-            d = DATE_RE.search(ln)
-            if d and _only_one_amount(ln):
-                saldo = _first_amount_value(ln)
-                if not np.isnan(saldo):
-                    return saldo
-    # 2) Genérico: "SALDO ANTERIOR"
-    for ln in lines:
-        U = ln.upper()
-        if "SALDO ANTERIOR" in U and _only_one_amount(ln):
-            saldo = _first_amount_value(ln)
-            if not np.isnan(saldo):
-                return saldo
-    # 3) Macro variantes
-    for ln in lines:
-        U = ln.upper()
-        if "SALDO ULTIMO EXTRACTO" in U or "SALDO ÚLTIMO EXTRACTO" in U:
-            d = DATE_RE.search(ln)
-            if d and _only_one_amount(ln):
-                saldo = _first_amount_value(ln)
-                if not np.isnan(saldo):
-                    return saldo
-    # 4) Santa Fe — "SALDO ULTIMO RESUMEN"
-    for i, ln in enumerate(lines):
-        if SF_SALDO_ULT_RE.search(ln):
-            if _only_one_amount(ln):
-                v = _first_amount_value(ln)
-                if not np.isnan(v):
-                    return v
-            for j in (i+1, i+2):
-                if 0 <= j < len(lines):
-                    ln2 = lines[j]
-                    if _only_one_amount(ln2):
-                        v2 = _first_amount_value(ln2)
-                        if not np.isnan(v2):
-                            return v2
-            break
-    return np.nan
-
-
-# ---------- Clasificación ----------
-RE_PERCEP_RG2408 = re.compile(r"PERCEPCI[ÓO]N\s+IVA\s+RG\.?\s*2408", re.IGNORECASE)
-
-
-def clasificar(desc: str, desc_norm: str, deb: float, cre: float) -> str:
-    u = (desc or "").upper()
-    n = (desc_norm or "").upper()
-
-    # Saldos
-    if "SALDO ANTERIOR" in u or "SALDO ANTERIOR" in n:
-        return "SALDO ANTERIOR"
-
-    # Impuesto a los débitos y créditos bancarios
-    if ("LEY 25413" in u) or ("IMPTRANS" in u) or ("IMP.S/CREDS" in u) or ("IMPDBCR 25413" in u) or ("N/D DBCR 25413" in u) or \
-       ("LEY 25413" in n) or ("IMPTRANS" in n) or ("IMP.S/CREDS" in n) or ("IMPDBCR 25413" in n) or ("N/D DBCR 25413" in n):
-        return "LEY 25.413"
-
-    # SIRCREB
-    if ("SIRCREB" in u) or ("SIRCREB" in n):
-        return "SIRCREB"
-
-    # Percepciones IVA: atajo RG 2408
-    if RE_PERCEP_RG2408.search(u) or RE_PERCEP_RG2408.search(n):
-        return "Percepciones de IVA"
-
-    # Percepciones / Retenciones IVA (RG 3337 / RG 2408)
-    if (
-        ("IVA PERC" in u) or ("IVA PERCEP" in u) or ("RG3337" in u) or
-        ("IVA PERC" in n) or ("IVA PERCEP" in n) or ("RG3337" in n) or
-        (("RETEN" in u or "RETENC" in u) and (("I.V.A" in u) or ("IVA" in u)) and (("RG.2408" in u) or ("RG 2408" in u) or ("RG2408" in u))) or
-        (("RETEN" in n or "RETENC" in n) and (("I.V.A" in n) or ("IVA" in n)) and (("RG.2408" in n) or ("RG 2408" in n) or ("RG2408" in n)))
-    ):
-        return "Percepciones de IVA"
-
-    # Percepciones IVA genéricas (Macro: RETENCION IVA PERCEPCION)
-    if (
-        ("RETENCION" in u and "IVA" in u and "PERCEP" in u) or
-        ("RETENCION" in n and "IVA" in n and "PERCEP" in n) or
-        ("RETEN" in u and "IVA" in u and "PERC" in u) or
-        ("RETEN" in n and "IVA" in n and "PERC" in n)
+                    bar.progress(0.0, text=job.stage)
+                time.sleep(0.25)
+            status.update(label=f"{label} — listo", state="complete", expanded=False)
+    return job.result()
+
+
+# ---------- Grilla de movimientos (paginada en el servidor) ----------
+GRID_PAGE_SIZES = (100, 250, 500, 1000)
+
+
+def render_movements_grid(df: pd.DataFrame, acc_id: str):
+    """
+    Filtra por Clasificación / rango de fechas y pagina en el servidor: al navegador solo viaja
+    la página visible, y el formato AR se aplica con Styler sobre esas filas (los datos siguen numéricos).
+    """
+    f1, f2 = st.columns(2)
+    with f1:
+        clases = st.multiselect(
+            "Clasificación",
+            options=sorted(df["Clasificación"].dropna().unique()),
+            key=f"grid_clases_{acc_id}",
+        )
+    fechas = df["fecha"].dropna()
+    desde = hasta = None
+    if not fechas.empty:
+        fmin, fmax = fechas.min().date(), fechas.max().date()
+        with f2:
+            rango = st.date_input(
+                "Rango de fechas", value=(fmin, fmax), min_value=fmin, max_value=fmax,
+                format="DD/MM/YYYY", key=f"grid_fechas_{acc_id}",
+            )
+        if isinstance(rango, (tuple, list)) and len(rango) == 2 and tuple(rango) != (fmin, fmax):
+            desde, hasta = rango
+
+    idx = filter_movements(df, clases, desde, hasta)
+    total = len(idx)
+
+    p1, p2, p3 = st.columns([1, 1, 2])
+    with p1:
+        page_size = st.selectbox("Filas por página", GRID_PAGE_SIZES, index=1, key=f"grid_size_{acc_id}")
+    n_pages = max(1, -(-total // page_size))
+    with p2:
+        # la clave incluye n_pages: si un filtro cambia la cantidad de páginas, se vuelve a la 1
+        page = st.number_input("Página", min_value=1, max_value=n_pages, value=1, step=1, key=f"grid_page_{acc_id}_{n_pages}")
+    start = (int(page) - 1) * page_size
+    stop = min(start + page_size, total)
+    with p3:
+        st.caption(f"Filas {start + 1 if total else 0}–{stop} de {total} (página {int(page)} de {n_pages})")
+
+    df_page = df.loc[idx[start:stop]]
+    if st.toggle(
+        "Corregir Clasificación", key=f"grid_edit_on_{acc_id}",
+        help="La clase elegida se aplica a todos los movimientos con la misma descripción, en todas las cuentas de la sesión.",
     ):
-        return "Percepciones de IVA"
-
-    # --- NUEVO: IVA reducido Banco Santa Fe (no trae '10,5' en texto) ---
-    # Ej: "IVA RINS IVA REDUC.R.I."
-    if ("IVA RINS" in u or "IVA RINS" in n or
-        "IVA REDUC" in u or "IVA REDUC" in n):
-        return "IVA 10,5% (sobre comisiones)"
-
-    # IVA sobre comisiones (BNA usa "I.V.A. BASE")
-    if ("I.V.A. BASE" in u) or ("I.V.A. BASE" in n) or ("IVA GRAL" in u) or ("IVA GRAL" in n) or ("DEBITO FISCAL IVA BASICO" in u) or ("DEBITO FISCAL IVA BASICO" in n) \
-       or ("I.V.A" in u and "DÉBITO FISCAL" in u) or ("I.V.A" in n and "DEBITO FISCAL" in n):
-        if "10,5" in u or "10,5" in n or "10.5" in u or "10.5" in n:
-            return "IVA 10,5% (sobre comisiones)"
-        return "IVA 21% (sobre comisiones)"
-
-    # Plazo Fijo (según signo)
-    if ("PLAZO FIJO" in u) or ("PLAZO FIJO" in n) or ("P.FIJO" in u) or ("P.FIJO" in n) or ("P FIJO" in u) or ("P FIJO" in n) or ("PFIJO" in u) or ("PFIJO" in n):
-        if cre and cre != 0:
-            return "Acreditación Plazo Fijo"
-        if deb and deb != 0:
-            return "Débito Plazo Fijo"
-        return "Plazo Fijo"
-
-    # Comisiones varias
-    if ("COMIS.TRANSF" in u) or ("COMIS.TRANSF" in n) or ("COMIS TRANSF" in u) or ("COMIS TRANSF" in n) or \
-       ("COMIS.COMPENSACION" in u) or ("COMIS.COMPENSACION" in n) or ("COMIS COMPENSACION" in u) or ("COMIS COMPENSACION" in n):
-        return "Gastos por comisiones"
-    if ("MANTENIMIENTO MENSUAL PAQUETE" in u) or ("MANTENIMIENTO MENSUAL PAQUETE" in n) or \
-       ("COMOPREM" in n) or ("COMVCAUT" in n) or ("COMTRSIT" in n) or ("COM.NEGO" in n) or ("CO.EXCESO" in n) or ("COM." in n):
-        return "Gastos por comisiones"
-
-    # Débitos automáticos / Seguros
-    if ("DB-SNP" in n) or ("DEB.AUT" in n) or ("DEB.AUTOM" in n) or ("SEGUROS" in n) or ("GTOS SEG" in n):
-        return "Débito automático"
-    if ("DEBITO INMEDIATO" in u) or ("DEBIN" in u):
-        return "Débito automático"
-
-    # Varias
-    if "DYC" in n: return "DyC"
-    if ("AFIP" in n or "ARCA" in n) and deb and deb != 0: return "Débitos ARCA"
-    if "API" in n: return "API"
-
-    if "DEB.CUOTA PRESTAMO" in n or ("PRESTAMO" in n and "DEB." in n): return "Cuota de préstamo"
-    if ("CR.PREST" in n) or ("CREDITO PRESTAMOS" in n) or ("CRÉDITO PRÉSTAMOS" in n): return "Acreditación Préstamos"
-
-    if "CH 48 HS" in n or "CH.48 HS" in n: return "Cheques 48 hs"
-
-    if ("PAGO COMERC" in n) or ("CR-CABAL" in n) or ("CR CABAL" in n) or ("CR TARJ" in n): return "Acreditaciones Tarjetas de Crédito/Débito"
-
-    if ("CR-DEPEF" in n) or ("CR DEPEF" in n) or ("DEPOSITO EFECTIVO" in n) or ("DEP.EFECTIVO" in n) or ("DEP EFECTIVO" in n):
-        return "Depósito en Efectivo"
-
-    if (("CR-TRSFE" in n) or ("TRANSF RECIB" in n) or ("TRANLINK" in n) or ("TRANSFERENCIAS RECIBIDAS" in u)) and cre and cre != 0:
-        return "Transferencia de terceros recibida"
-    if (("DB-TRSFE" in n) or ("TRSFE-ET" in n) or ("TRSFE-IT" in n)) and deb and deb != 0:
-        return "Transferencia a terceros realizada"
-    if ("DTNCTAPR" in n) or ("ENTRE CTA" in n) or ("CTA PROPIA" in n):
-        return "Transferencia entre cuentas propias"
-
-    if ("NEG.CONT" in n) or ("NEGOCIADOS" in n):
-        return "Acreditación de valores"
-
-    if cre and cre != 0: return "Crédito"
-    if deb and deb != 0: return "Débito"
-    return "Otros"
-
-
-# ---------- Ajuste específico Macro: IVA 10,5% INTER.ADEL.CC + DEBITO FISCAL ----------
-def ajustar_macro_iva_105(df: pd.DataFrame) -> pd.DataFrame:
+        render_classification_editor(df_page, f"{acc_id}_{int(page)}_{page_size}")
+        return
+    # textos de la página en una pasada (fmt_ar_series); el Styler solo los busca por valor
+    money = [c for c in MONEY_COLS if c in df_page.columns]
+    textos = {c: dict(zip(df_page[c], fmt_ar_series(df_page[c]))) for c in money}
+    formatos = {c: textos[c].get for c in money}
+    formatos["fecha"] = lambda d: d.strftime("%d/%m/%Y")
+    st.dataframe(df_page.style.format(formatos, na_rep="—"), use_container_width=True)
+
+
+# ---------- Reclasificación manual ----------
+# Correcciones de la sesión por descripción normalizada ({desc_norm: clase}). El `rep` calculado es
+# compartido (memo del pipeline y JOBS), así que la versión corregida de cada cuenta se guarda aparte y
+# cada cambio se aplica sobre la anterior (core.corrected_report): solo las filas afectadas y el PDF.
+def effective_report(acc_id: str, rep: dict) -> dict:
+    overrides = st.session_state.setdefault("reclasificaciones", {})
+    if rep["empty"]:
+        return rep
+    cache = st.session_state.setdefault("reportes_corregidos", {})
+    prev = cache.get(acc_id)
+    if (prev is None or prev["base"] is not rep) and not overrides:
+        return rep
+    cache[acc_id] = corrected_report(prev, rep, overrides)
+    return cache[acc_id]["rep"]
+
+
+def report_xlsx(acc_id: str, rep: dict, kind: str):
+    """
+    Excel de la cuenta ('xlsx' / 'xlsx_creditos'): el de la etapa exportes, o, con correcciones, armado
+    recién cuando se lo pide (botón) y guardado por (acc_id, firma de las correcciones).
+    Devuelve bytes, None (sin xlsxwriter: va el CSV) o False si todavía no se pidió.
+    """
+    if kind in rep:
+        return rep[kind]
+    firma = st.session_state["reportes_corregidos"][acc_id]["firma"]
+    memo = st.session_state.setdefault("excel_corregidos", {})
+    hit = memo.get((acc_id, kind))
+    if hit is not None and hit[0] == firma:
+        return hit[1]
+    label = "Detalle Créditos" if kind == "xlsx_creditos" else "movimientos"
+    if st.button(f"Preparar Excel – {label} (con las correcciones)", key=f"prep_{kind}_{acc_id}", use_container_width=True):
+        memo[(acc_id, kind)] = (firma, account_xlsx(rep, kind))
+        return memo[(acc_id, kind)][1]
+    return False
+
+
+def render_classification_editor(df_page: pd.DataFrame, key: str):
     """
-    En Macro, cuando aparece:
-    N/D INTER.ADEL.CC C/ACUERD
-    DEBITO FISCAL IVA BASICO
-    la segunda línea es IVA 10,5% (sobre comisiones).
+    La página visible con la Clasificación editable. Un cambio se guarda como corrección de la sesión para
+    esa descripción y se vuelve a dibujar la app con los totales ajustados.
     """
-    if df.empty:
-        return df
-    df = df.copy()
-    u = df["desc_norm"].astype(str).str.upper()
-    for i in range(len(df) - 1):
-        if "INTER.ADEL.CC" in u.iloc[i] and "C/ACUERD" in u.iloc[i]:
-            if "DEBITO FISCAL IVA BASICO" in u.iloc[i + 1]:
-                df.at[i + 1, "Clasificación"] = "IVA 10,5% (sobre comisiones)"
-    return df
+    view = pd.DataFrame({
+        "fecha": df_page["fecha"].dt.strftime("%d/%m/%Y"),
+        "descripcion": df_page["descripcion"].astype(str),
+        **{c: fmt_ar_series(df_page[c]) for c in ("debito", "credito", "saldo")},
+        "Clasificación": df_page["Clasificación"].astype(str),
+    }, index=df_page.index)
+    edited = st.data_editor(
+        view, use_container_width=True,
+        disabled=[c for c in view.columns if c != "Clasificación"],
+        column_config={"Clasificación": st.column_config.SelectboxColumn(
+            "Clasificación", options=sorted(set(RULES.classes()) | set(view["Clasificación"])), required=True,
+        )},
+        # la versión cambia con cada corrección: el editor arranca limpio sobre la clasificación nueva
+        key=f"grid_editor_{key}_{st.session_state.get('reclasif_version', 0)}",
+    )
+    cambios = edited.index[edited["Clasificación"].ne(view["Clasificación"])]
+    if len(cambios):
+        overrides = st.session_state.setdefault("reclasificaciones", {})
+        for i in cambios:
+            overrides[str(df_page.at[i, "desc_norm"])] = edited.at[i, "Clasificación"]
+        st.session_state["reclasif_version"] = st.session_state.get("reclasif_version", 0) + 1
+        st.rerun()
+
+
+# ---------- Diagnóstico de conciliación ----------
+def render_reconciliation_breaks(rep: dict):
+    """Primeras filas donde saldo ≠ saldo anterior ± importe del PDF, con página y línea de origen."""
+    quiebres = rep["quiebres"]
+    if quiebres.empty and rep["cuadra"]:
+        return
+    with st.expander("Dónde se rompe la conciliación", expanded=not rep["cuadra"]):
+        if quiebres.empty:
+            df = rep["df"]
+            st.caption(
+                "Todas las filas encadenan saldo anterior ± importe. La diferencia está entre el último saldo "
+                f"de la tabla ($ {fmt_ar(float(df['saldo'].iloc[-1]))}) y el saldo final informado por el PDF "
+                f"($ {fmt_ar(rep['saldo_final_visto'])}), o falta el saldo inicial."
+            )
+            return
+        st.caption(
+            f"Primeras {len(quiebres)} fila(s) donde el saldo no se movió en el importe del PDF"
+            " (diferencia = |Δ saldo| - importe)."
+        )
+        cols = ["saldo_previo", "importe_pdf", "saldo", "delta_saldo", "diferencia"]
+        st.dataframe(formatted_money(quiebres, cols), use_container_width=True)
+
+
+def render_columnar_downloads(table, base_name: str, key: str):
+    """Botones Parquet / Arrow IPC para una pyarrow.Table (nada si pyarrow no está disponible)."""
+    if table is None:
+        return
+    p1, p2 = st.columns(2)
+    with p1:
+        st.download_button(
+            "🗂️ Descargar Parquet",
+            data=build_parquet(table),
+            file_name=f"{base_name}.parquet",
+            mime="application/vnd.apache.parquet",
+            use_container_width=True,
+            key=f"dl_parquet_{key}",
+        )
+    with p2:
+        st.download_button(
+            "🗂️ Descargar Arrow",
+            data=build_arrow(table),
+            file_name=f"{base_name}.arrow",
+            mime="application/vnd.apache.arrow.file",
+            use_container_width=True,
+            key=f"dl_arrow_{key}",
+        )
 
 
 # ---------- Helper de UI por cuenta (genérico) ----------
+# Cada cuenta es un fragmento: filtros, paginado y descargas de una cuenta vuelven a dibujar solo esa
+# sección (con el `rep` ya calculado), no el resto del resumen ni las otras cuentas.
+@st.fragment
 def render_account_report(
     banco_slug: str,
     account_title: str,
     account_number: str,
     acc_id: str,
-    lines: list[str],
-    bna_extras: dict | None = None   # actualmente no usado
+    rep: dict,
 ):
     st.markdown("---")
     st.subheader(f"{account_title} · Nro {account_number}")
+    rep = effective_report(acc_id, rep)
 
-    df = parse_lines(lines)
-    fecha_cierre, saldo_final_pdf = find_saldo_final_from_lines(lines)
-    saldo_anterior = find_saldo_anterior_from_lines(lines)
-
-    # Sin movimientos: mostrar saldos y conciliación
-    if df.empty:
-        total_debitos = 0.0
-        total_creditos = 0.0
-        saldo_inicial = float(saldo_anterior) if not np.isnan(saldo_anterior) else 0.0
-        saldo_final_visto = float(saldo_final_pdf) if not np.isnan(saldo_final_pdf) else saldo_inicial
-        saldo_final_calculado = saldo_inicial + total_creditos - total_debitos
-        diferencia = saldo_final_calculado - saldo_final_visto
-        cuadra = abs(diferencia) < 0.01
-
-        st.caption("Resumen del período")
-        c1, c2, c3 = st.columns(3)
-        with c1: metric_full("Saldo inicial", f"$ {fmt_ar(saldo_inicial)}")
-        with c2: metric_full("Total créditos (+)", f"$ {fmt_ar(total_creditos)}")
-        with c3: metric_full("Total débitos (–)", f"$ {fmt_ar(total_debitos)}")
-
-        c4, c5, c6 = st.columns(3)
-        with c4: st.metric("Saldo final (PDF)", f"$ {fmt_ar(saldo_final_visto)}")
-        with c5: st.metric("Saldo final calculado", f"$ {fmt_ar(saldo_final_calculado)}")
-        with c6: st.metric("Diferencia", f"$ {fmt_ar(diferencia)}")
-        try:
-            st.success("Conciliado.") if cuadra else st.error("No cuadra la conciliación.")
-        except Exception:
-            st.write("Conciliación:", "OK" if cuadra else "No cuadra")
-        if pd.notna(fecha_cierre):
-            st.caption(f"Cierre según PDF: {fecha_cierre.strftime('%d/%m/%Y')}")
-        st.info("Sin Movimientos")
-        return
-
-    # Con movimientos: insertar SALDO ANTERIOR si existe
-    if not np.isnan(saldo_anterior):
-        first_date = df["fecha"].dropna().min()
-        fecha_apertura = (first_date - pd.Timedelta(days=1)).normalize() + pd.Timedelta(hours=23, minutes=59, seconds=59) if pd.notna(first_date) else pd.NaT
-        apertura = pd.DataFrame([{
-            "fecha": fecha_apertura,
-            "descripcion": "SALDO ANTERIOR",
-            "desc_norm": "SALDO ANTERIOR",
-            "debito": 0.0,
-            "credito": 0.0,
-            "importe": 0.0,
-            "saldo": float(saldo_anterior),
-            "pagina": 0,
-            "orden": 0
-        }])
-        df = pd.concat([apertura, df], ignore_index=True)
-
-    # Débito/Crédito por delta de saldo
-    df = df.sort_values(["fecha", "orden"]).reset_index(drop=True)
-    df["delta_saldo"] = df["saldo"].diff()
-    df["debito"]  = np.where(df["delta_saldo"] < 0, -df["delta_saldo"], 0.0)
-    df["credito"] = np.where(df["delta_saldo"] > 0,  df["delta_saldo"], 0.0)
-    df["importe"] = df["debito"] - df["credito"]  # signo contable
-
-    # Clasificación
-    df["Clasificación"] = df.apply(
-        lambda r: clasificar(str(r.get("descripcion","")), str(r.get("desc_norm","")), r.get("debito",0.0), r.get("credito",0.0)),
-        axis=1
-    )
-
-    # Ajuste específico Macro: IVA 10,5% sobre INTER.ADEL.CC C/ACUERD
-    if banco_slug == "macro":
-        df = ajustar_macro_iva_105(df)
-
-    # Totales / conciliación
-    df_sorted = df.drop(columns=["orden"]).reset_index(drop=True)
-    saldo_inicial = float(df_sorted.loc[0, "saldo"])
-    total_debitos = float(df_sorted["debito"].sum())
-    total_creditos = float(df_sorted["credito"].sum())
-    saldo_final_visto = float(df_sorted["saldo"].iloc[-1]) if np.isnan(saldo_final_pdf) else float(saldo_final_pdf)
-    saldo_final_calculado = saldo_inicial + total_creditos - total_debitos
-    diferencia = saldo_final_calculado - saldo_final_visto
-    cuadra = abs(diferencia) < 0.01
-
-    date_suffix = f"_{fecha_cierre.strftime('%Y%m%d')}" if pd.notna(fecha_cierre) else ""
-    acc_suffix  = f"_{account_number}"
+    fecha_cierre = rep["fecha_cierre"]
+    saldo_inicial = rep["saldo_inicial"]
+    total_creditos = rep["total_creditos"]
+    total_debitos = rep["total_debitos"]
+    saldo_final_visto = rep["saldo_final_visto"]
+    saldo_final_calculado = rep["saldo_final_calculado"]
+    diferencia = rep["diferencia"]
+    cuadra = rep["cuadra"]
 
     st.caption("Resumen del período")
     c1, c2, c3 = st.columns(3)
@@ -680,20 +306,21 @@ def render_account_report(
     if pd.notna(fecha_cierre):
         st.caption(f"Cierre según PDF: {fecha_cierre.strftime('%d/%m/%Y')}")
 
+    # Sin movimientos: solo saldos y conciliación
+    if rep["empty"]:
+        st.info("Sin Movimientos")
+        return
+
+    render_reconciliation_breaks(rep)
+
+    df_sorted = rep["df"]
+    date_suffix = f"_{fecha_cierre.strftime('%Y%m%d')}" if pd.notna(fecha_cierre) else ""
+    acc_suffix  = f"_{account_number}"
+
     # ===== Resumen Operativo (IVA + Otros) =====
     st.caption("Resumen Operativo: Registración Módulo IVA")
-    iva21_mask  = df_sorted["Clasificación"].eq("IVA 21% (sobre comisiones)")
-    iva105_mask = df_sorted["Clasificación"].eq("IVA 10,5% (sobre comisiones)")
-    iva21  = float(df_sorted.loc[iva21_mask,  "debito"].sum())
-    iva105 = float(df_sorted.loc[iva105_mask, "debito"].sum())
-    net21  = round(iva21  / 0.21,  2) if iva21  else 0.0
-    net105 = round(iva105 / 0.105, 2) if iva105 else 0.0
-    percep_iva = float(df_sorted.loc[df_sorted["Clasificación"].eq("Percepciones de IVA"), "debito"].sum())
-    ley_mask = df_sorted["Clasificación"].eq("LEY 25.413")
-    ley_25413_debitos = float(df_sorted.loc[ley_mask, "debito"].sum())
-    ley_25413_creditos = float(df_sorted.loc[ley_mask, "credito"].sum())
-    ley_25413 = ley_25413_debitos - ley_25413_creditos
-    sircreb    = float(df_sorted.loc[df_sorted["Clasificación"].eq("SIRCREB"),            "debito"].sum())
+    r = rep["resumen"]
+    net21, iva21, net105, iva105 = r["net21"], r["iva21"], r["net105"], r["iva105"]
 
     # Métricas IVA
     m1, m2, m3 = st.columns(3)
@@ -707,30 +334,39 @@ def render_account_report(
     with n3: st.metric("Bruto 10,5%", f"$ {fmt_ar(net105 + iva105)}")
 
     o1, o2, o3 = st.columns(3)
-    with o1: st.metric("Percepciones de IVA (RG 3337 / RG 2408)", f"$ {fmt_ar(percep_iva)}")
-    with o2: st.metric("Ley 25.413", f"$ {fmt_ar(ley_25413)}")
-    with o3: st.metric("SIRCREB", f"$ {fmt_ar(sircreb)}")
+    with o1: st.metric("Percepciones de IVA (RG 3337 / RG 2408)", f"$ {fmt_ar(r['percep_iva'])}")
+    with o2: st.metric("Ley 25.413", f"$ {fmt_ar(r['ley_25413'])}")
+    with o3: st.metric("SIRCREB", f"$ {fmt_ar(r['sircreb'])}")
 
-    # Tabla (grilla) con números formateados
+    # Tabla (grilla) paginada: columnas numéricas, formato es-AR solo en la página visible
     st.caption("Detalle de movimientos")
-    df_view = df_sorted.copy()
-    for c in ["debito", "credito", "importe", "saldo"]:
-        if c in df_view.columns:
-            df_view[c] = df_view[c].map(fmt_ar)
-    st.dataframe(df_view, use_container_width=True)
+    overrides = st.session_state.get("reclasificaciones", {})
+    if overrides:
+        c_txt, c_btn = st.columns([3, 1])
+        with c_txt:
+            st.caption(
+                f"{len(overrides)} corrección(es) de Clasificación en la sesión: "
+                + " · ".join(f"{d} → {c}" for d, c in list(overrides.items())[:5])
+                + (" …" if len(overrides) > 5 else "")
+            )
+        with c_btn:
+            if st.button("Quitar correcciones", key=f"reclasif_reset_{acc_id}"):
+                overrides.clear()
+                st.session_state["reclasif_version"] = st.session_state.get("reclasif_version", 0) + 1
+                st.rerun()
+    render_movements_grid(df_sorted, acc_id)
 
     # ===== Detalle de créditos (préstamos) =====
     st.caption("Detalle de créditos (préstamos)")
 
-    credit_classes = ["Cuota de préstamo", "Acreditación Préstamos"]
-    df_creditos = df_sorted.loc[df_sorted["Clasificación"].isin(credit_classes)].copy()
+    df_creditos = df_sorted.loc[rep["creditos"]]
 
     if df_creditos.empty:
         st.info("Sin movimientos de créditos/préstamos en el período.")
     else:
         # Resumen
-        total_cuotas = float(df_creditos.loc[df_creditos["Clasificación"].eq("Cuota de préstamo"), "debito"].sum())
-        total_acredit = float(df_creditos.loc[df_creditos["Clasificación"].eq("Acreditación Préstamos"), "credito"].sum())
+        total_cuotas = rep["total_cuotas"]
+        total_acredit = rep["total_acredit"]
         neto_creditos = total_acredit - total_cuotas
 
         k1, k2, k3 = st.columns(3)
@@ -739,56 +375,26 @@ def render_account_report(
         with k3: metric_full("Neto (acreditado – cuotas)", f"$ {fmt_ar(neto_creditos)}")
 
         # Grilla (formateada)
-        df_creditos_view = df_creditos.copy()
-        for c in ["debito", "credito", "importe", "saldo"]:
-            if c in df_creditos_view.columns:
-                df_creditos_view[c] = df_creditos_view[c].map(fmt_ar)
-        st.dataframe(df_creditos_view, use_container_width=True)
+        st.dataframe(formatted_money(df_creditos), use_container_width=True)
 
-        # Descarga (Excel con fallback CSV) — sufijos calculados localmente para evitar UnboundLocalError
+        # Descarga (Excel con fallback CSV)
         st.caption("Descargar detalle de créditos (préstamos)")
 
-        credit_date_suffix = f"_{fecha_cierre.strftime('%Y%m%d')}" if pd.notna(fecha_cierre) else ""
-        credit_acc_suffix  = f"_{account_number}"
-
-        try:
-            import xlsxwriter
-            output_c = io.BytesIO()
-            with pd.ExcelWriter(output_c, engine="xlsxwriter") as writer:
-                df_creditos.to_excel(writer, index=False, sheet_name="Creditos")
-                wb = writer.book
-                ws = writer.sheets["Creditos"]
-                money_fmt = wb.add_format({"num_format": "#,##0.00"})
-                date_fmt  = wb.add_format({"num_format": "dd/mm/yyyy"})
-
-                for idx, col in enumerate(df_creditos.columns, start=0):
-                    col_values = df_creditos[col].astype(str)
-                    max_len = max(len(col), *(len(v) for v in col_values))
-                    ws.set_column(idx, idx, min(max_len + 2, 40))
-
-                for c in ["debito", "credito", "importe", "saldo"]:
-                    if c in df_creditos.columns:
-                        j = df_creditos.columns.get_loc(c)
-                        ws.set_column(j, j, 16, money_fmt)
-
-                if "fecha" in df_creditos.columns:
-                    j = df_creditos.columns.get_loc("fecha")
-                    ws.set_column(j, j, 14, date_fmt)
-
+        xlsx_creditos = report_xlsx(acc_id, rep, "xlsx_creditos")
+        if xlsx_creditos:
             st.download_button(
                 "📥 Descargar Excel – Detalle Créditos",
-                data=output_c.getvalue(),
-                file_name=f"detalle_creditos_{banco_slug}{credit_acc_suffix}{credit_date_suffix}.xlsx",
+                data=xlsx_creditos,
+                file_name=f"detalle_creditos_{banco_slug}{acc_suffix}{date_suffix}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True,
                 key=f"dl_creditos_xlsx_{acc_id}",
             )
-        except Exception:
-            csv_bytes_c = df_creditos.to_csv(index=False).encode("utf-8-sig")
+        elif xlsx_creditos is None:
             st.download_button(
                 "📥 Descargar CSV – Detalle Créditos (fallback)",
-                data=csv_bytes_c,
-                file_name=f"detalle_creditos_{banco_slug}{credit_acc_suffix}{credit_date_suffix}.csv",
+                data=build_csv(df_creditos),
+                file_name=f"detalle_creditos_{banco_slug}{acc_suffix}{date_suffix}.csv",
                 mime="text/csv",
                 use_container_width=True,
                 key=f"dl_creditos_csv_{acc_id}",
@@ -796,152 +402,42 @@ def render_account_report(
 
     # Descargas
     st.caption("Descargar")
-    try:
-        import xlsxwriter
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            df_sorted.to_excel(writer, index=False, sheet_name="Movimientos")
-            wb  = writer.book
-            ws  = writer.sheets["Movimientos"]
-            money_fmt = wb.add_format({"num_format": "#,##0.00"})
-            date_fmt  = wb.add_format({"num_format": "dd/mm/yyyy"})
-            for idx, col in enumerate(df_sorted.columns, start=0):
-                col_values = df_sorted[col].astype(str)
-                max_len = max(len(col), *(len(v) for v in col_values))
-                ws.set_column(idx, idx, min(max_len + 2, 40))
-            for c in ["debito","credito","importe","saldo"]:
-                if c in df_sorted.columns:
-                    j = df_sorted.columns.get_loc(c)
-                    ws.set_column(j, j, 16, money_fmt)
-            if "fecha" in df_sorted.columns:
-                j = df_sorted.columns.get_loc("fecha")
-                ws.set_column(j, j, 14, date_fmt)
-
+    xlsx = report_xlsx(acc_id, rep, "xlsx")
+    if xlsx:
         st.download_button(
             "📥 Descargar Excel",
-            data=output.getvalue(),
+            data=xlsx,
             file_name=f"resumen_bancario_{banco_slug}{acc_suffix}{date_suffix}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             use_container_width=True,
             key=f"dl_xlsx_{acc_id}",
         )
-    except Exception:
-        csv_bytes = df_sorted.to_csv(index=False).encode("utf-8-sig")
+    elif xlsx is None:
         st.download_button(
             "📥 Descargar CSV (fallback)",
-            data=csv_bytes,
+            data=build_csv(df_sorted),
             file_name=f"resumen_bancario_{banco_slug}{acc_suffix}{date_suffix}.csv",
             mime="text/csv",
             use_container_width=True,
             key=f"dl_csv_{acc_id}",
         )
 
-    if REPORTLAB_OK:
-        try:
-            pdf_buf = io.BytesIO()
-            doc = SimpleDocTemplate(pdf_buf, pagesize=A4, title="Resumen Operativo - Registración Módulo IVA")
-            styles = getSampleStyleSheet()
-            elems = []
-            elems.append(Paragraph("Resumen Operativo: Registración Módulo IVA", styles["Title"]))
-            elems.append(Spacer(1, 8))
-            datos = [
-                ["Concepto", "Importe"],
-                ["Neto Comisiones 21%",  fmt_ar(net21)],
-                ["IVA 21%",               fmt_ar(iva21)],
-                ["Bruto 21%",             fmt_ar(net21 + iva21)],
-                ["Neto Comisiones 10,5%", fmt_ar(net105)],
-                ["IVA 10,5%",             fmt_ar(iva105)],
-                ["Bruto 10,5%",           fmt_ar(net105 + iva105)],
-                ["Percepciones de IVA (RG 3337 / RG 2408)", fmt_ar(percep_iva)],
-                ["Ley 25.413",            fmt_ar(ley_25413)],
-                ["SIRCREB",               fmt_ar(sircreb)],
-            ]
-            datos.append(["TOTAL", fmt_ar(net21 + iva21 + net105 + iva105 + percep_iva + ley_25413 + sircreb)])
-
-            tbl = Table(datos, colWidths=[300, 120])
-            tbl.setStyle(TableStyle([
-                ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-                ("TEXTCOLOR",  (0,0), (-1,0), colors.black),
-                ("GRID",       (0,0), (-1,-1), 0.3, colors.grey),
-                ("ALIGN",      (1,1), (1,-1), "RIGHT"),
-                ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
-                ("FONTNAME",   (0,-1), (-1,-1), "Helvetica-Bold"),
-            ]))
-            elems.append(tbl)
-            elems.append(Spacer(1, 12))
-            elems.append(Paragraph("Herramienta para uso interno - AIE San Justo", styles["Normal"]))
-
-            doc.build(elems)
-            st.download_button(
-                "📄 Descargar PDF – Resumen Operativo (IVA)",
-                data=pdf_buf.getvalue(),
-                file_name=f"Resumen_Operativo_IVA_{banco_slug}{acc_suffix}{date_suffix}.pdf",
-                mime="application/pdf",
-                use_container_width=True,
-                key=f"dl_pdf_{acc_id}",
-            )
-        except Exception as e:
-            st.info(f"No se pudo generar el PDF del Resumen Operativo: {e}")
-
-
-# ---------- Banco Santa Fe: extraer Nro de cuenta desde “Consolidado de cuentas” ----------
-def santafe_extract_accounts(file_like):
-    """
-    Busca líneas tipo: 'Cuenta Corriente Pesos Nro. 1646/00'
-    Devuelve lista de dicts [{'title': 'Cuenta Corriente Pesos', 'nro': '1646/00'}]
-    """
-    items = []
-    for _, ln in extract_all_lines(file_like):
-        m = SF_ACC_LINE_RE.search(ln)
-        if m:
-            title = " ".join(m.group(1).split())
-            nro   = m.group(2).strip()
-            items.append({"title": title.title(), "nro": nro})
-    # quitar duplicados preservando orden
-    seen = set()
-    uniq = []
-    for it in items:
-        key = (it["title"], it["nro"])
-        if key not in seen:
-            seen.add(key)
-            uniq.append(it)
-    return uniq
-
-
-# ---------- Banco Nación: meta (Cuenta/CBU/Período) + gastos finales ----------
-def bna_extract_gastos_finales(txt: str) -> dict:
-    out = {}
-    for m in BNA_GASTOS_RE.finditer(txt or ""):
-        etiqueta = m.group(1).upper()
-        importe = normalize_money(m.group(2))
-        if "I.V.A" in etiqueta or "IVA" in etiqueta:
-            etiqueta = "I.V.A. BASE"
-        out[etiqueta] = float(importe) if importe is not None else np.nan
-    return out
-
-
-def bna_extract_meta(file_like):
-    """
-    Lee el texto completo y devuelve dict con:
-    {'account_number': str|None, 'cbu': str|None, 'period_start': str|None, 'period_end': str|None}
-    - Soporta caja larga (Cuenta+CBU) y variante corta de "NRO. CUENTA SUCURSAL"
-    """
-    txt = _text_from_pdf(file_like)
-    acc = cbu = pstart = pend = None
-
-    mper = BNA_PERIODO_RE.search(txt)
-    if mper:
-        pstart, pend = mper.group(1), mper.group(2)
-
-    macc = BNA_CUENTA_CBU_RE.search(txt)
-    if macc:
-        acc, cbu = macc.group(1), macc.group(2)
-    else:
-        monly = BNA_ACC_ONLY_RE.search(txt)
-        if monly:
-            acc = monly.group(1)
+    # Formatos columnares para el data warehouse (fechas, centavos, Clasificación categórica)
+    mov_table = movements_table(df_sorted, account_meta(banco_slug, account_title, account_number, rep))
+    render_columnar_downloads(mov_table, f"movimientos_{banco_slug}{acc_suffix}{date_suffix}", f"mov_{acc_id}")
 
-    return {"account_number": acc, "cbu": cbu, "period_start": pstart, "period_end": pend}
+    pdf_resumen = rep["pdf_resumen"]
+    if isinstance(pdf_resumen, bytes):
+        st.download_button(
+            "📄 Descargar PDF – Resumen Operativo (IVA)",
+            data=pdf_resumen,
+            file_name=f"Resumen_Operativo_IVA_{banco_slug}{acc_suffix}{date_suffix}.pdf",
+            mime="application/pdf",
+            use_container_width=True,
+            key=f"dl_pdf_{acc_id}",
+        )
+    elif pdf_resumen:
+        st.info(f"No se pudo generar el PDF del Resumen Operativo: {pdf_resumen}")
 
 
 # ---------- UI principal ----------
@@ -951,8 +447,34 @@ if uploaded is None:
     st.stop()
 
 data = uploaded.read()
+_doc_key = hashlib.sha1(data).hexdigest()
 
-_bank_txt = _text_from_pdf(io.BytesIO(data)).strip()
+# Etapas memoizadas (parsers.pipeline): cada corrida anota cuáles recalculó. Esta Run es del rerun;
+# los trabajos de JOBS arman la suya y devuelven su traza con el resultado.
+_run = Run()
+
+# Pre-chequeo en milisegundos (solo objetos del PDF): escaneado / páginas sin texto
+_pre = statement_pages(_run, data, _doc_key)
+if _pre["scanned"]:
+    st.error(
+        "No se pudo leer texto del PDF. "
+        f"Este resumen parece estar escaneado (las {_pre['pages']} páginas son solo imagen). "
+        "La herramienta solo funciona con PDFs descargados del home banking, "
+        "donde el texto sea seleccionable."
+    )
+    st.stop()
+if _pre["mixed"]:
+    _pags = ", ".join(map(str, _pre["image_pages"][:20])) + (" …" if len(_pre["image_pages"]) > 20 else "")
+    st.warning(
+        f"Hay {len(_pre['image_pages'])} página(s) escaneada(s) (solo imagen): {_pags}. "
+        "Los movimientos de esas páginas no se van a leer."
+    )
+
+# Lectura de texto (detección de banco) en segundo plano
+_text_key = ("texto", _doc_key)
+_text_reused = JOBS.get(_text_key) is not None
+_text = wait_for_job(JOBS.submit(_text_key, run_text, data, _doc_key, pages=_pre["pages"]), "Leyendo el PDF")
+_bank_txt = _text["texto"]
 
 # Si no hay texto, probablemente sea un PDF escaneado (solo imagen)
 if not _bank_txt:
@@ -971,7 +493,7 @@ with st.expander("Opciones avanzadas (detección de banco)", expanded=False):
         "Forzar identificación del banco",
         options=("Auto (detectar)", "Banco de Santa Fe", "Banco Macro", "Banco de la Nación Argentina"),
         index=0,
-        help="Solo cambia la etiqueta informativa y el nombre de archivo."
+        help="Cambia la segmentación por cuentas, la etiqueta y el nombre de archivo; no vuelve a leer el PDF."
     )
 
 _bank_name = forced if forced != "Auto (detectar)" else _auto_bank_name
@@ -985,47 +507,27 @@ elif _bank_name == "Banco de la Nación Argentina":
 else:
     st.warning("No se pudo identificar el banco automáticamente. Se intentará procesar.")
 
-_bank_slug = ("macro" if _bank_name == "Banco Macro"
-              else "santafe" if _bank_name == "Banco de Santa Fe"
-              else "nacion" if _bank_name == "Banco de la Nación Argentina"
-              else "generico")
-
-# --- Flujo por banco ---
-if _bank_name == "Banco Macro":
-    blocks = macro_split_account_blocks(io.BytesIO(data))
-    if not blocks:
-        st.warning("No se detectaron encabezados de cuenta en Macro. Se intentará procesar todo el PDF (podría mezclar cuentas).")
-        _lines = [l for _, l in extract_all_lines(io.BytesIO(data))]
-
-        render_account_report(_bank_slug, "CUENTA (PDF completo)", "s/n", "macro-pdf-completo", _lines)
-    else:
-        st.caption(f"Información de su/s Cuenta/s: {len(blocks)} cuenta(s) detectada(s).")
-        for b in blocks:
-            render_account_report(_bank_slug, b["titulo"], b["nro"], b["acc_id"], b["lines"])
+# --- Flujo por banco (segundo plano) ---
+_job_key = ("resumen", _doc_key, _bank_name)
+_job_reused = JOBS.get(_job_key) is not None
+try:
+    result = wait_for_job(
+        JOBS.submit(_job_key, run_statement, data, _bank_name, _bank_txt, doc_key=_doc_key, pages=_pre["pages"]),
+        "Procesando movimientos",
+    )
+except Exception as e:
+    st.error(f"No se pudo procesar el PDF: {e}")
+    st.stop()
 
-elif _bank_name == "Banco de Santa Fe":
-    sf_accounts = santafe_extract_accounts(io.BytesIO(data))
-    all_lines = [l for _, l in extract_all_lines(io.BytesIO(data))]
-
-    if sf_accounts:
-        st.caption(f"Consolidado de cuentas: {len(sf_accounts)} detectada(s).")
-        for i, acc in enumerate(sf_accounts, start=1):
-            title = acc["title"]
-            nro   = acc["nro"]
-            acc_id = f"santafe-{re.sub(r'[^0-9A-Za-z]+', '_', nro)}"
-            render_account_report(_bank_slug, title, nro, acc_id, all_lines)
-            if i < len(sf_accounts):
-                st.markdown("")
-    else:
-        render_account_report(_bank_slug, "CUENTA", "s/n", "generica-unica", all_lines)
+_bank_slug = result["bank_slug"]
 
-elif _bank_name == "Banco de la Nación Argentina":
-    meta = bna_extract_meta(io.BytesIO(data))
-    all_lines = [l for _, l in extract_all_lines(io.BytesIO(data))]
-    titulo = "CUENTA (BNA)"
-    nro = meta.get("account_number") or "s/n"
-    acc_id = f"bna-{re.sub(r'[^0-9A-Za-z]+', '_', nro)}"
+if result["notice"]:
+    st.warning(result["notice"])
+if result["caption"]:
+    st.caption(result["caption"])
 
+meta = result["meta"]
+if meta:
     # Meta visible
     col1, col2, col3 = st.columns(3)
     if meta.get("period_start") and meta.get("period_end"):
@@ -1035,13 +537,115 @@ elif _bank_name == "Banco de la Nación Argentina":
     if meta.get("cbu"):
         with col3: st.caption(f"CBU: {meta['cbu']}")
 
-    # Extras BNA -> integrados al Resumen Operativo (por ahora solo se leen)
-    txt_full = _text_from_pdf(io.BytesIO(data))
-    bna_extras = bna_extract_gastos_finales(txt_full)
+for i, acc in enumerate(result["accounts"], start=1):
+    render_account_report(_bank_slug, acc["titulo"], acc["nro"], acc["acc_id"], acc["report"])
+    if _bank_slug == "santafe" and i < len(result["accounts"]):
+        st.markdown("")
 
-    render_account_report(_bank_slug, titulo, nro, acc_id, all_lines, bna_extras=bna_extras)
+# Resumen por cuenta (una fila por cuenta) en formato columnar
+if result["accounts"]:
+    st.markdown("---")
+    st.caption("Resumen por cuenta (saldos, conciliación y Resumen Operativo)")
+    render_columnar_downloads(
+        summary_table([
+            (account_meta(_bank_slug, acc["titulo"], acc["nro"], _rep), _rep)
+            for acc in result["accounts"]
+            for _rep in [effective_report(acc["acc_id"], acc["report"])]
+        ]),
+        f"resumen_cuentas_{_bank_slug}",
+        "resumen",
+    )
 
-else:
-    # Desconocido: procesar genérico
-    all_lines = [l for _, l in extract_all_lines(io.BytesIO(data))]
-    render_account_report(_bank_slug, "CUENTA", "s/n", "generica-unica", all_lines)
+# ---------- Consolidado de la sesión (todas las cuentas y períodos subidos) ----------
+_consolidado = st.session_state.setdefault("consolidado", {})
+_consolidado[_doc_key] = [
+    (account_meta(_bank_slug, acc["titulo"], acc["nro"], _rep), _rep.get("df"))
+    for acc in result["accounts"]
+    for _rep in [effective_report(acc["acc_id"], acc["report"])]
+]
+with st.expander(f"Resumen Operativo consolidado ({len(_consolidado)} resumen(es) subido(s) en la sesión)", expanded=False):
+    st.caption("Subí los resúmenes de otros meses o cuentas: se suman acá, por cuenta y mes.")
+    _mov_all = consolidated_movements([it for items in _consolidado.values() for it in items])
+    _roll = consolidated_resumen(_mov_all)
+    st.dataframe(formatted_money(_roll, RESUMEN_COLS), use_container_width=True, hide_index=True)
+    _xlsx_roll = build_xlsx(_roll, "Consolidado", money_cols=RESUMEN_COLS)
+    if _xlsx_roll is not None:
+        st.download_button(
+            "📥 Descargar Excel – Consolidado",
+            data=_xlsx_roll,
+            file_name="resumen_operativo_consolidado.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            use_container_width=True,
+            key="dl_consolidado_xlsx",
+        )
+    else:
+        st.download_button(
+            "📥 Descargar CSV – Consolidado (fallback)",
+            data=build_csv(_roll, money_cols=RESUMEN_COLS),
+            file_name="resumen_operativo_consolidado.csv",
+            mime="text/csv",
+            use_container_width=True,
+            key="dl_consolidado_csv",
+        )
+    render_columnar_downloads(resumen_table(_roll), "resumen_operativo_consolidado", "consolidado")
+    if st.button("Vaciar consolidado (dejar solo el resumen actual)", key="consolidado_reset"):
+        st.session_state["consolidado"] = {_doc_key: _consolidado[_doc_key]}
+        st.rerun()
+
+# ---------- Diagnóstico ----------
+# memoria de la sesión: los frames de movimientos de cada resumen del consolidado (se cuentan una sola vez;
+# son los mismos objetos que guarda el resultado, no copias)
+_frames = {id(df): df for items in st.session_state["consolidado"].values() for _, df in items if df is not None}
+_mem_session = sum(int(df.memory_usage(deep=True).sum()) for df in _frames.values())
+_mem_doc = result_memory(result)
+_rss = process_rss()
+_trace = _run.trace + ([] if _text_reused else _text["trace"]) + ([] if _job_reused else result["trace"])
+_cache_doc = result["cache"]
+_cache_proc = PAGE_CACHE.stats()
+_hits, _misses = _cache_doc["hits"], _cache_doc["misses"]
+with st.expander("Diagnóstico de extracción", expanded=False):
+    st.caption(
+        f"Caché de páginas (este documento): {_hits} acierto(s) / {_hits + _misses} consulta(s)"
+        f" · {(_hits / (_hits + _misses) * 100) if (_hits + _misses) else 0:.0f}%"
+    )
+    st.caption(
+        f"Caché de páginas (proceso): {_cache_proc['hits']} / {_cache_proc['hits'] + _cache_proc['misses']}"
+        f" · {_cache_proc['hit_rate'] * 100:.0f}% · {_cache_proc['pages']} página(s) en caché"
+        f" · {_cache_proc['bytes'] / 2**20:.1f} MB"
+    )
+    _stages, _jm = STAGES.stats(), JOBS.metrics()
+    st.caption(
+        f"Memo de etapas (proceso): {_stages['entries']} entrada(s) · {_stages['bytes'] / 2**20:.1f} MB"
+        f" · trabajos guardados: {_jm['trabajos']} · {_jm['bytes'] / 2**20:.1f} MB"
+    )
+    st.caption(
+        f"Memoria (este documento): movimientos {_mem_doc['movimientos'] / 2**20:.2f} MB"
+        f" · exportes {_mem_doc['exportes'] / 2**20:.2f} MB · total {_mem_doc['total'] / 2**20:.2f} MB"
+    )
+    st.caption(
+        f"Memoria (sesión): {_mem_session / 2**20:.2f} MB en {len(_frames)} cuenta(s)"
+        + (f" · proceso {_rss / 2**20:.0f} MB RSS" if _rss else "")
+    )
+    st.caption(
+        f"Etapas en esta corrida (✓ memo · ↻ recalculada): {trace_summary(_trace)}"
+        + (" · procesamiento: resultado ya calculado" if _job_reused else "")
+    )
+    _tpl = result.get("plantilla")
+    if _tpl:
+        st.caption(
+            f"Plantilla repetida por página (membrete, títulos, encabezados, pie): {_tpl['quitadas']} de "
+            f"{_tpl['lineas']} línea(s) quitadas antes del parsing ({_tpl['distintas']} distinta(s))"
+        )
+    _job = JOBS.get(_job_key)
+    st.caption(
+        (f"Este PDF: {_job.wait_seconds:.1f} s en cola · {_job.run_seconds:.1f} s procesando · " if _job else "")
+        + f"Cola del servidor ({_jm['workers']} a la vez): {_jm['en_curso']} en curso, {_jm['en_cola']} esperando"
+        + f" · espera promedio {_jm['espera_promedio']:.1f} s (p95 {_jm['espera_p95']:.1f} s)"
+        + f" vs procesamiento {_jm['proceso_promedio']:.1f} s (p95 {_jm['proceso_p95']:.1f} s)"
+        + f" en los últimos {min(_jm['terminados'], METRICS_WINDOW)} trabajo(s)"
+    )
+    if len(result["accounts"]) > 1:
+        st.caption(
+            f"Cálculo por cuenta (hasta {ACCOUNT_WORKERS} en paralelo): "
+            + " · ".join(f"{acc['nro']} {acc.get('segundos', 0) * 1000:.0f} ms" for acc in result["accounts"])
+        )
@@ -0,0 +1,255 @@
+"""
+Backends de extracción de líneas y perfiles de layout.
+
+Un perfil es un dict (ver DEFAULT_PROFILE) con:
+    backend       "pdfplumber" (pdfminer, layout completo) o "pdfium" (pypdfium2, más liviano)
+    modos         qué fuentes de líneas se combinan con pdfplumber: "text", "words", "chars"
+    x_tolerance / y_tolerance   tolerancias de pdfplumber para armar palabras y líneas
+    ytol          alto de la banda (pt) para agrupar palabras/caracteres en una línea
+    layout        extract_text(layout=True) (respeta columnas con espacios)
+Todos los bancos usan DEFAULT_PROFILE: un perfil propio se agrega cuando el bench lo valida sobre
+resúmenes reales de ese banco (mismos movimientos y conciliación).
+
+    python -m parsers.backends bench PDF [--bank ...] [--repeat N]
+compara backends/perfiles sobre el mismo PDF: tiempo, coincidencia de líneas contra el perfil por
+defecto y, más importante, movimientos leídos y conciliación por cuenta.
+"""
+import argparse, hashlib, io, mmap, os, sys, time
+
+import pdfplumber
+
+from .pagecache import PAGE_CACHE, page_fingerprint
+from .tokens import FECHA, IMPORTE, scan
+
+# Resúmenes de una sola columna: texto + palabras cubre los renglones partidos que extract_text junta
+DEFAULT_PROFILE = {
+    "backend": "pdfplumber",
+    "modos": ("text", "words"),
+    "x_tolerance": 3,
+    "y_tolerance": 3,
+    "ytol": 2.0,
+    "layout": False,
+}
+
+
+# ---------- armado de líneas (pdfplumber) ----------
+def lines_from_text(page, x_tolerance=3, y_tolerance=3, layout=False):
+    txt = page.extract_text(x_tolerance=x_tolerance, y_tolerance=y_tolerance, layout=layout) or ""
+    return [" ".join(l.split()) for l in txt.splitlines()]
+
+
+def _band_lines(items, ytol, joiner):
+    items.sort(key=lambda w: (round(w["top"] / ytol), w["x0"]))
+    lines, cur, band = [], [], None
+    for w in items:
+        b = round(w["top"] / ytol)
+        if band is None or b == band:
+            cur.append(w)
+        else:
+            # cerramos la línea anterior
+            lines.append(joiner(cur))
+            cur = [w]
+        band = b
+    if cur:
+        lines.append(joiner(cur))
+    return [" ".join(l.split()) for l in lines]
+
+
+def lines_from_words(page, ytol=2.0, x_tolerance=3, y_tolerance=3):
+    words = page.extract_words(x_tolerance=x_tolerance, y_tolerance=y_tolerance, extra_attrs=["x0", "top"])
+    if not words:
+        return []
+    return _band_lines(words, ytol, lambda ws: " ".join(x["text"] for x in ws))
+
+
+def lines_from_chars(page, ytol=2.0, x_tolerance=3):
+    """Líneas a partir de los caracteres sueltos (sin armar palabras): un espacio donde hay hueco."""
+    chars = list(page.chars)
+    if not any(c["text"].strip() for c in chars):
+        return []
+
+    def join(cs):
+        # los espacios del PDF se respetan; si no hay, se corta por hueco horizontal
+        out, prev = [], None
+        for c in cs:
+            if prev is not None and c["x0"] - prev["x1"] > x_tolerance:
+                out.append(" ")
+            out.append(c["text"])
+            prev = c
+        return "".join(out)
+
+    return _band_lines(chars, ytol, join)
+
+
+def _page_lines_pdfplumber(p, prof: dict) -> list[str]:
+    xt, yt = prof["x_tolerance"], prof["y_tolerance"]
+    sources = []
+    for modo in prof["modos"]:
+        if modo == "text":
+            sources.append(lines_from_text(p, xt, yt, prof["layout"]))
+        elif modo == "words":
+            sources.append(lines_from_words(p, prof["ytol"], xt, yt))
+        elif modo == "chars":
+            sources.append(lines_from_chars(p, prof["ytol"], xt))
+    # todas las de la primera fuente (con repetidas: dos movimientos iguales son dos líneas),
+    # y de cada fuente siguiente solo las que no aparecieron en las anteriores
+    seen, combined = set(), []
+    for src in sources:
+        combined.extend(l for l in src if l not in seen)
+        seen.update(src)
+    return [l for l in combined if l.strip()]
+
+
+def _profile_key(prof: dict) -> tuple:
+    return tuple(sorted((k, tuple(v) if isinstance(v, (list, tuple)) else v) for k, v in prof.items()))
+
+
+def _count(counts: dict | None, hit: bool):
+    # aciertos / fallos de PAGE_CACHE de esta llamada (los de PAGE_CACHE.stats() son de todo el proceso)
+    if counts is not None:
+        key = "hits" if hit else "misses"
+        counts[key] = counts.get(key, 0) + 1
+
+
+# ---------- backends ----------
+def extract_pdfplumber(file_like, prof: dict, progress=None, use_cache: bool = True, counts: dict | None = None) -> list:
+    """
+    [(página, línea)] con pdfplumber. Cada página se busca primero en PAGE_CACHE por la huella de su
+    contenido crudo + perfil; solo las páginas no vistas pasan por el análisis de layout.
+    `counts` acumula los aciertos / fallos de esta extracción.
+    """
+    out = []
+    with pdfplumber.open(file_like) as pdf:
+        n = len(pdf.pages)
+        for pi, p in enumerate(pdf.pages, start=1):
+            fp = page_fingerprint(p, *_profile_key(prof)) if use_cache else None
+            combined = PAGE_CACHE.get(fp) if use_cache else None
+            if use_cache:
+                _count(counts, combined is not None)
+            if combined is None:
+                combined = _page_lines_pdfplumber(p, prof)
+                if use_cache:
+                    PAGE_CACHE.put(fp, combined)
+            out.extend([(pi, l) for l in combined])
+            if progress:
+                progress("Extrayendo líneas", pi, n)
+    return out
+
+
+def extract_pdfium(file_like, prof: dict, progress=None, use_cache: bool = True, counts: dict | None = None) -> list:
+    """
+    [(página, línea)] con pypdfium2 (motor de PDFium, sin análisis de layout en Python). Las líneas
+    salen en el orden del content stream. La caché usa el hash del PDF entero + número de página.
+    """
+    import pypdfium2 as pdfium
+    if isinstance(file_like, (str, os.PathLike)):
+        # ruta (spool): se hashea sobre el mapeo y PDFium lee el archivo a demanda
+        with open(file_like, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            doc_hash = hashlib.blake2b(mm, digest_size=20).hexdigest()
+        data = os.fspath(file_like)
+    else:
+        data = file_like.getvalue() if hasattr(file_like, "getvalue") else file_like.read()
+        doc_hash = hashlib.blake2b(data, digest_size=20).hexdigest()
+    out = []
+    pdf = pdfium.PdfDocument(data)
+    try:
+        n = len(pdf)
+        for i in range(n):
+            key = ("pdfium", doc_hash, i) if use_cache else None
+            lines = PAGE_CACHE.get(key) if use_cache else None
+            if use_cache:
+                _count(counts, lines is not None)
+            if lines is None:
+                page = pdf[i]
+                tp = page.get_textpage()
+                try:
+                    txt = tp.get_text_range()
+                finally:
+                    tp.close()
+                    page.close()
+                lines = [l for l in (" ".join(x.split()) for x in txt.splitlines()) if l]
+                if use_cache:
+                    PAGE_CACHE.put(key, lines)
+            out.extend([(i + 1, l) for l in lines])
+            if progress:
+                progress("Extrayendo líneas", i + 1, n)
+    finally:
+        pdf.close()
+    return out
+
+
+BACKENDS = {"pdfplumber": extract_pdfplumber, "pdfium": extract_pdfium}
+
+
+def available_backends() -> list[str]:
+    out = ["pdfplumber"]
+    try:
+        import pypdfium2  # noqa: F401
+        out.append("pdfium")
+    except Exception:
+        pass
+    return out
+
+
+def extract_lines(file_like, profile: dict | None = None, progress=None, use_cache: bool = True,
+                  counts: dict | None = None) -> list:
+    prof = profile or DEFAULT_PROFILE
+    return BACKENDS[prof["backend"]](file_like, prof, progress=progress, use_cache=use_cache, counts=counts)
+
+
+# ---------- Benchmark ----------
+BENCH_VARIANTS = {
+    "perfil por defecto": {},
+    "pdfplumber texto": {"modos": ("text",)},
+    "pdfplumber palabras": {"modos": ("words",)},
+    "pdfplumber caracteres": {"modos": ("chars",)},
+    "pdfplumber layout": {"modos": ("text",), "layout": True},
+    "pdfium": {"backend": "pdfium"},
+}
+
+
+def cmd_bench(args) -> int:
+    from . import core
+    data = open(args.pdf, "rb").read()
+    bank = args.bank or core.detect_bank_from_text(core.read_statement_text(data))
+    slug = core.bank_slug(bank)
+    print(f"{args.pdf}: {bank} ({slug}), perfil {DEFAULT_PROFILE}")
+    ref = None
+    for name, over in BENCH_VARIANTS.items():
+        prof = {**DEFAULT_PROFILE, **over}
+        if prof["backend"] not in available_backends():
+            print(f"{name:<24} (no disponible)")
+            continue
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            pairs = extract_lines(io.BytesIO(data), prof, use_cache=False)
+            best = min(best, time.perf_counter() - t0)
+        lines = {l for _, l in pairs}
+        if ref is None:
+            ref = lines
+            ref_mov = {l for l in ref if {FECHA, IMPORTE} <= {t.kind for t in scan(l)}}
+        # coincidencia: líneas de la variante que el perfil por defecto también produce;
+        # cobertura: líneas con fecha e importe del perfil por defecto que la variante también produce
+        agree = len(lines & ref) / len(lines) if lines else 0.0
+        cover = len(ref_mov & lines) / len(ref_mov) if ref_mov else 1.0
+        _, accounts = core.split_statement(bank, pairs)
+        cuentas = core.compute_accounts(slug, accounts)
+        movs = sum(0 if a["report"]["empty"] else len(a["report"]["df"]) for a in cuentas)
+        cuadra = sum(bool(a["report"]["cuadra"]) for a in cuentas)
+        print(f"{name:<24} {best * 1000:8.1f} ms  {len(pairs):6d} líneas  coincidencia {agree:6.1%}  "
+              f"cobertura {cover:6.1%}  {len(cuentas)} cuenta(s), {movs} mov., {cuadra}/{len(cuentas)} conciliada(s)")
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m parsers.backends", description="Backends de extracción de líneas")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench"); b.add_argument("pdf"); b.add_argument("--bank"); b.add_argument("--repeat", type=int, default=3)
+    b.set_defaults(fn=cmd_bench)
+    args = ap.parse_args(argv)
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
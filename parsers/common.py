@@ -1,8 +1,12 @@
-import re, io
+import re
 import numpy as np
 import pandas as pd
 import pdfplumber
 
+from .pagecache import PAGE_CACHE, page_fingerprint
+from .core import parse_dates  # fechas vectorizadas, compartidas con el núcleo
+from .tokens import amounts, dates  # léxico de importes / fechas compartido con el núcleo
+
 # Regex
 DATE_RE  = re.compile(r"\b\d{1,2}/\d{2}/\d{2,4}\b")  # dd/mm/aa o dd/mm/aaaa
 MONEY_RE = re.compile(r'(?<!\S)-?(?:\d{1,3}(?:\.\d{3})*|\d+)\s?,\s?\d{2}-?(?!\S)')
@@ -25,9 +29,9 @@ def normalize_money(tok: str) -> float:
     tok = tok.lstrip("-").rstrip("-")
     if "," not in tok: return np.nan
     main, frac = tok.rsplit(",", 1)
-    main = main.replace(".", "").replace(" ", "")
+    main = "".join(main.split()).replace(".", "")
     try:
-        val = float(f"{main}.{frac}")
+        val = float(f"{main}.{frac.strip()}")
         return -val if neg else val
     except Exception:
         return np.nan
@@ -66,26 +70,30 @@ def extract_all_lines(file_like):
     out = []
     with pdfplumber.open(file_like) as pdf:
         for pi, p in enumerate(pdf.pages, start=1):
-            lt = lines_from_text(p)
-            lw = lines_from_words(p, ytol=2.0)
-            seen = set(lt)
-            combined = lt + [l for l in lw if l not in seen]
-            out.extend([(pi, l) for l in combined if l and l.strip()])
+            fp = page_fingerprint(p, "text+words", 2.0)
+            combined = PAGE_CACHE.get(fp)
+            if combined is None:
+                lt = lines_from_text(p)
+                lw = lines_from_words(p, ytol=2.0)
+                seen = set(lt)
+                combined = [l for l in lt + [l for l in lw if l not in seen] if l and l.strip()]
+                PAGE_CACHE.put(fp, combined)
+            out.extend([(pi, l) for l in combined])
     return out
 
 def _only_one_amount(line: str) -> bool:
-    return len(list(MONEY_RE.finditer(line))) == 1
+    return len(amounts(line)) == 1
 
 def _first_amount_value(line: str) -> float:
-    m = MONEY_RE.search(line)
-    return normalize_money(m.group(0)) if m else np.nan
+    am = amounts(line)
+    return am[0].value if am else np.nan
 
 def find_saldo_final_from_lines(lines):
     for ln in reversed(lines):
         if SALDO_FINAL_PREFIX.match(ln):
-            d = DATE_RE.search(ln)
+            d = dates(ln)
             if d and _only_one_amount(ln):
-                fecha = pd.to_datetime(d.group(0), dayfirst=True, errors="coerce")
+                fecha = parse_dates([d[0].text]).iloc[0]
                 saldo = _first_amount_value(ln)
                 if pd.notna(fecha) and not np.isnan(saldo): 
                     return fecha, saldo
@@ -99,7 +107,7 @@ def find_saldo_final_from_lines(lines):
 def find_saldo_anterior_from_lines(lines):
     for ln in lines:
         if SALDO_ANT_PREFIX.match(ln):
-            d = DATE_RE.search(ln)
+            d = dates(ln)
             if d and _only_one_amount(ln):
                 saldo = _first_amount_value(ln)
                 if not np.isnan(saldo): return saldo
@@ -111,7 +119,7 @@ def find_saldo_anterior_from_lines(lines):
     for ln in lines:
         U = upper_safe(ln)
         if "SALDO ULTIMO EXTRACTO" in U or "SALDO ÚLTIMO EXTRACTO" in U:
-            d = DATE_RE.search(ln)
+            d = dates(ln)
             if d and _only_one_amount(ln):
                 saldo = _first_amount_value(ln)
                 if not np.isnan(saldo): return saldo
@@ -138,31 +146,3 @@ def normalize_desc(desc: str) -> str:
     u = LONG_INT_RE.sub("", u)
     u = " ".join(u.split())
     return u
-
-# Clasificación (común)
-import re as _re
-RE_SIRCREB = _re.compile(r"\bSIRCREB\b|ING\.\s*BRUTOS.*S/?\s*CRED", _re.I)
-RE_LEY25413 = _re.compile(r"\b(?:IMP\.?\s*DEB\.?/CRE\.?\s*LEY\s*25\.?413|LEY\s*25\.?413|IMPDBCR\s*25413|N/?D\s*DBCR\s*25413|IMPTRANS|IMP\.?\s*S/CREDS)\b", _re.I)
-RE_PERCEP_IVA = _re.compile(r"(IVA\s*PERC|IVA\s*PERCEP|RG\.?\s*3337|RG\.?\s*2408|RETEN.*I\.?V\.?A)", _re.I)
-RE_IVA_21 = _re.compile(r"(I\.?V\.?A\.?\s*BASE|IVA\s*GRAL|DEBITO\s*FISCAL\s*IVA\s*BASICO)", _re.I)
-RE_IVA_105 = _re.compile(r"(IVA\s*10[,\.]5|IVA\s*REDUC|IVA\s*RINS)", _re.I)
-
-def clasificar(desc: str, desc_norm: str, deb: float, cre: float) -> str:
-    u = upper_safe(desc); n = upper_safe(desc_norm)
-    if "SALDO ANTERIOR" in u or "SALDO ANTERIOR" in n: return "SALDO ANTERIOR"
-    if RE_SIRCREB.search(u) or RE_SIRCREB.search(n):  return "SIRCREB"
-    if RE_LEY25413.search(u) or RE_LEY25413.search(n):return "LEY 25.413"
-    if RE_PERCEP_IVA.search(u) or RE_PERCEP_IVA.search(n): return "Percepciones de IVA"
-    if RE_IVA_105.search(u) or RE_IVA_105.search(n): return "IVA 10,5% (sobre comisiones)"
-    if RE_IVA_21.search(u) or RE_IVA_21.search(n):   return "IVA 21% (sobre comisiones)"
-
-    # Transferencias / préstamos / otros (resumen)
-    if ("TRANSFERENCIA DE TERCEROS" in u or "TRANSF RECIB" in n or "CR-TRSFE" in n or "TRANLINK" in n) and cre: return "Transferencia de terceros recibida"
-    if ("DB-TRSFE" in n or "TRSFE-ET" in n or "TRSFE-IT" in n) and deb: return "Transferencia a terceros realizada"
-    if ("DTNCTAPR" in n or "ENTRE CTA" in n or "CTA PROPIA" in n): return "Transferencia entre cuentas propias"
-    if ("CUOTA PRÉSTAMO" in u or "CUOTA PRESTAMO" in u or "DEB.CUOTA PRESTAMO" in n): return "Cuota de préstamo"
-    if ("CR.PREST" in n or "CREDITO PRESTAMOS" in n): return "Acreditación Préstamos"
-
-    if cre and cre != 0: return "Crédito"
-    if deb and deb != 0: return "Débito"
-    return "Otros"
@@ -0,0 +1,1579 @@
+# Núcleo de procesamiento de resúmenes (sin UI): extracción, segmentación, parsing,
+# clasificación, conciliación y exportes. Lo usa app.py y puede correr fuera del hilo de Streamlit.
+
+import io, itertools, math, multiprocessing, os, re, sys, threading, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+import pdfplumber
+
+from .spool import handle_path
+from .backends import extract_lines
+from .reglas import clasificar_df  # tabla de reglas en parsers/reglas_clasificacion.json
+from .tokens import HYPHENS, accounts, amounts, dates  # léxico de fechas / importes / cuentas
+
+# --- regex base ---
+# Las líneas se leen con parsers.tokens (mismos tramos, una pasada); las regex quedan como referencia del
+# fuzz de tokens y dentro de los patrones compuestos de abajo.
+DATE_RE  = re.compile(r"\b\d{1,2}/\d{2}/\d{2,4}\b")  # dd/mm/aa o dd/mm/aaaa
+
+# ACEPTA IMPORTES CON SIGNO ADELANTE O GUION ATRÁS (ej: -2.114.972,30 o 2.114.972,30-)
+MONEY_RE = re.compile(
+    r'(?<!\S)-?(?:\d{1,3}(?:\.\d{3})*|\d+)\s?,\s?\d{2}-?(?!\S)'
+)
+
+LONG_INT_RE = re.compile(r"\b\d{6,}\b")
+
+# ====== PATRONES ESPECÍFICOS ======
+# ---- Banco Macro ----
+HYPH = f"[{HYPHENS}]"  # guiones variantes
+ACCOUNT_TOKEN_RE = re.compile(rf"\b\d\s*{HYPH}\s*\d{{3}}\s*{HYPH}\s*\d{{10}}\s*{HYPH}\s*\d\b")
+SALDO_ANT_PREFIX   = re.compile(r"^SALDO\s+U?LTIMO\s+EXTRACTO\s+AL", re.IGNORECASE)
+SALDO_FINAL_PREFIX = re.compile(r"^SALDO\s+FINAL\s+AL\s+D[ÍI]A",     re.IGNORECASE)
+RE_HAS_NRO         = re.compile(r"\bN[ROº°\.]*\s*:?\b", re.IGNORECASE)
+RE_MACRO_ACC_NRO   = re.compile(rf"N[ROº°\.]*\s*:?\s*({ACCOUNT_TOKEN_RE.pattern})", re.IGNORECASE)
+PER_PAGE_TITLE_PAT = re.compile(rf"^CUENTA\s+.+N[ROº°\.]*\s*:?\s*({ACCOUNT_TOKEN_RE.pattern})", re.IGNORECASE)
+HEADER_ROW_PAT = re.compile(r"^(FECHA\s+DESCRIPC(?:I[ÓO]N|ION)|FECHA\s+CONCEPTO|FECHA\s+DETALLE).*(SALDO|D[ÉE]BITO|CR[ÉE]DITO)", re.IGNORECASE)
+NON_MOV_PAT    = re.compile(r"(INFORMACI[ÓO]N\s+DE\s+SU/S\s+CUENTA/S|TOTAL\s+RESUMEN\s+OPERATIVO|RESUMEN\s+DEL\s+PER[IÍ]ODO)", re.IGNORECASE)
+INFO_HEADER    = re.compile(r"INFORMACI[ÓO]N\s+DE\s+SU/S\s+CUENTA/S", re.IGNORECASE)
+
+# Páginas de encabezado por banco donde están los metadatos (tabla de cuentas, período, CBU).
+# Se leen primero; el resto del documento solo se mira si ahí no apareció lo buscado.
+META_HEADER_PAGES = {"nacion": 1}
+
+# ---- Banco de Santa Fe (Consolidado de cuentas) ----
+SF_ACC_LINE_RE = re.compile(
+    r"\b(Cuenta\s+Corriente\s+Pesos|Cuenta\s+Corriente\s+En\s+D[óo]lares|Caja\s+de\s+Ahorro\s+Pesos|Caja\s+de\s+Ahorro\s+En\s+D[óo]lares)\s+Nro\.?\s*([0-9][0-9./-]*)",
+    re.IGNORECASE
+)
+
+# ---- Banco Nación (BNA) ----
+BNA_NAME_HINT = "BANCO DE LA NACION ARGENTINA"
+BNA_PERIODO_RE = re.compile(r"PERIODO:\s*(\d{2}/\d{2}/\d{4})\s*AL\s*(\d{2}/\d{2}/\d{4})", re.IGNORECASE)
+BNA_CUENTA_CBU_RE = re.compile(
+    r"NRO\.\s*CUENTA\s+SUCURSAL\s+CLAVE\s+BANCARIA\s+UNIFORME\s+\(CBU\)\s*[\r\n]+(\d+)\s+\d+\s+(\d{22})",
+    re.IGNORECASE
+)
+# Captura número de cuenta luego de "NRO. CUENTA SUCURSAL" (variante sin CBU en la misma caja)
+BNA_ACC_ONLY_RE = re.compile(
+    r"NRO\.\s*CUENTA\s+SUCURSAL\s*[:\-]?\s*[\r\n ]+(\d{6,})",
+    re.IGNORECASE
+)
+# Bloque de gastos finales post “SALDO FINAL”
+BNA_GASTOS_RE = re.compile(
+    r"-\s*(INTERESES|COMISION|SELLADOS|I\.V\.A\.?\s*BASE|SEGURO\s+DE\s+VIDA)\s*\$\s*([0-9\.\s]+,\d{2})",
+    re.IGNORECASE
+)
+
+# ---- NUEVO: Santa Fe - "SALDO ULTIMO RESUMEN" sin fecha ----
+SF_SALDO_ULT_RE = re.compile(r"SALDO\s+U?LTIMO\s+RESUMEN", re.IGNORECASE)
+
+# --- utils ---
+def normalize_money(tok: str) -> float:
+    """
+    Normaliza importes argentinos, aceptando:
+    -2.114.972,30   ó   2.114.972,30-
+    """
+    if not tok:
+        return np.nan
+    tok = tok.strip().replace("−", "-")
+    neg = tok.endswith("-") or tok.startswith("-")
+    tok = tok.strip("-")
+    if "," not in tok:
+        return np.nan
+    main, frac = tok.rsplit(",", 1)
+    # MONEY_RE admite un espacio a cada lado de la coma ('1.234 ,56' / '1.234, 56')
+    main = "".join(main.split()).replace(".", "")
+    try:
+        val = float(f"{main}.{frac.strip()}")
+        return -val if neg else val
+    except Exception:
+        return np.nan
+
+
+def fmt_ar(n) -> str:
+    if n is None or (isinstance(n, float) and np.isnan(n)):
+        return "—"
+    return f"{n:,.2f}".replace(",", "§").replace(".", ",").replace("§", ".")
+
+
+def fmt_ar_series(values) -> pd.Series:
+    """
+    fmt_ar para una columna entera, vectorizado (mismo resultado que .map(fmt_ar)): centavos enteros, entero y
+    decimales a texto y los puntos de miles con una regex en tres pasadas (hasta 1e11 hay a lo sumo tres puntos);
+    con pyarrow las pasadas corren en Arrow. NaN / None -> '—'. ±inf, desde 1e11 y lo que cae a medio centavo
+    (ahí redondear v*100 puede diferir de printf) van por fmt_ar.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    nan = np.isnan(v)
+    finite = np.isfinite(v)
+    a = np.abs(np.where(finite, v, 0.0)) * 100
+    slow = ~nan & (~finite | (a >= 1e13) | (np.abs(a % 1 - 0.5) < 1e-6))
+    ent, frac = np.divmod(np.rint(np.where(slow, 0.0, a)).astype(np.int64), 100)
+
+    try:
+        import pyarrow  # noqa: F401
+        texto = "string[pyarrow]"
+    except ImportError:
+        texto = object
+    entero = pd.Series(ent.astype(str), dtype=texto)
+    for _ in range(3):
+        entero = entero.str.replace(r"^(\d+)(\d{3})", r"\1.\2", regex=True)
+    signo = pd.Series(np.where(np.signbit(v), "-", ""), dtype=texto)
+    centavos = pd.Series(np.char.mod("%02d", np.arange(100))[frac], dtype=texto)
+    out = (signo + entero + "," + centavos).to_numpy(dtype=object)
+    out[nan] = "—"
+    if slow.any():
+        out[slow] = [fmt_ar(x) for x in v[slow]]
+    return pd.Series(out, index=s.index, name=s.name)
+
+
+def normalize_desc(desc: str) -> str:
+    if not desc:
+        return ""
+    u = desc.upper()
+    for pref in ("SAN JUS ", "CASA RO ", "CENTRAL ", "GOBERNA ", "GOBERNADOR ", "SANTA FE ", "ROSARIO "):
+        if u.startswith(pref):
+            u = u[len(pref):]
+            break
+    u = LONG_INT_RE.sub("", u)
+    u = " ".join(u.split())
+    return u
+
+
+# ---------- Fechas ----------
+_DATE_PARTS_RE = r"^\s*(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\s*$"
+
+
+def parse_dates(values, periodo=None) -> pd.Series:
+    """
+    'dd/mm/aa', 'dd/mm/aaaa' o 'dd/mm' (sin año) -> datetime64, vectorizado: cada valor distinto se
+    convierte una sola vez y con formato explícito (%d/%m/%y, %d/%m/%Y), sin inferir por fila.
+    Sin año: se usa `periodo` = (desde, hasta) del resumen. Va el año de `hasta` (o de `desde`), corrido
+    uno si la fecha caería más de un mes fuera del período (resúmenes que cruzan fin de año).
+    Sin período: año en curso. Lo que no es fecha válida queda NaT.
+    """
+    s = pd.Series(values, dtype=object)
+    codes, uniq = pd.factorize(s, use_na_sentinel=True)
+    if not len(uniq):
+        return pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    u = pd.Series(uniq, dtype=object).astype(str)
+    parts = u.str.extract(_DATE_PARTS_RE)
+    day_month = parts[0].str.zfill(2) + "/" + parts[1].str.zfill(2)
+    out = pd.Series(pd.NaT, index=u.index, dtype="datetime64[ns]")
+    for n_year, fmt in ((4, "%d/%m/%Y"), (2, "%d/%m/%y")):
+        sel = parts[2].str.len() == n_year
+        if sel.any():
+            out[sel] = pd.to_datetime(day_month[sel] + "/" + parts[2][sel], format=fmt, errors="coerce")
+    sin_anio = parts[0].notna() & parts[2].isna()
+    if sin_anio.any():
+        desde, hasta = (periodo or (None, None))
+        desde = pd.Timestamp(desde) if desde is not None and pd.notna(desde) else None
+        hasta = pd.Timestamp(hasta) if hasta is not None and pd.notna(hasta) else None
+        ref = hasta if hasta is not None else desde
+        year = ref.year if ref is not None else pd.Timestamp.today().year
+        dm = day_month[sin_anio]
+        fechas = pd.to_datetime(dm + f"/{year}", format="%d/%m/%Y", errors="coerce")
+        if hasta is not None:
+            tarde = fechas > hasta + pd.Timedelta(days=31)
+            if tarde.any():
+                fechas[tarde] = pd.to_datetime(dm[tarde] + f"/{year - 1}", format="%d/%m/%Y", errors="coerce")
+        if desde is not None:
+            temprano = fechas < desde - pd.Timedelta(days=31)
+            if temprano.any():
+                fechas[temprano] = pd.to_datetime(dm[temprano] + f"/{year + 1}", format="%d/%m/%Y", errors="coerce")
+        out[sin_anio] = fechas
+    res = out.to_numpy()[codes]
+    res[codes < 0] = np.datetime64("NaT")
+    return pd.Series(res, index=s.index, dtype="datetime64[ns]")
+
+
+# ---------- Detección de banco (solo banner) ----------
+BANK_MACRO_HINTS    = ("BANCO MACRO","CUENTA CORRIENTE BANCARIA","SALDO ULTIMO EXTRACTO AL","DEBITO FISCAL IVA BASICO","N/D DBCR 25413")
+BANK_SANTAFE_HINTS  = ("BANCO DE SANTA FE","NUEVO BANCO DE SANTA FE","SALDO ANTERIOR","IMPTRANS","IVA GRAL")
+BANK_NACION_HINTS   = (BNA_NAME_HINT, "SALDO ANTERIOR", "SALDO FINAL", "I.V.A. BASE", "COMIS.")
+
+
+def pdf_source(src):
+    """
+    Lo que abren pdfplumber / pypdfium2 a partir de bytes, una ruta o un spool (parsers.spool):
+    los bytes van en un io.BytesIO, que comparte su buffer (no los copia); un spool o una ruta se abren
+    desde el archivo, sin traer el PDF entero al proceso.
+    """
+    path = handle_path(src)
+    return path if path is not None else io.BytesIO(src)
+
+
+def _iter_page_texts(file_like):
+    """Texto de cada página, leído recién cuando se pide (cortar la iteración no lee el resto)."""
+    try:
+        with pdfplumber.open(file_like) as pdf:
+            for p in pdf.pages:
+                yield p.extract_text() or ""
+    except Exception:
+        return
+
+
+def page_texts(pairs):
+    """Texto por página a partir de [(página, línea)], de a una página y sin recorrer las siguientes."""
+    for _, grp in itertools.groupby(pairs, key=lambda x: x[0]):
+        yield "\n".join(l for _, l in grp)
+
+
+def _text_from_pdf(file_like, progress=None) -> str:
+    """`progress(etapa, hecho, total)` (opcional) se llama después de cada página."""
+    try:
+        with pdfplumber.open(file_like) as pdf:
+            n = len(pdf.pages)
+            parts = []
+            for pi, p in enumerate(pdf.pages, start=1):
+                parts.append(p.extract_text() or "")
+                if progress:
+                    progress("Leyendo texto", pi, n)
+            return "\n".join(parts)
+    except Exception:
+        return ""
+
+
+# ---------- Pre-chequeo: PDF escaneado / mixto (sin extraer texto) ----------
+def preflight_pdf(data) -> dict:
+    """
+    Clasifica cada página como texto / imagen (escaneada) / vacía mirando solo qué tipo de objetos
+    tiene (pypdfium2, que ya viene con pdfplumber): no hay análisis de layout, ~0,1 ms por página.
+    Devuelve {'pages', 'image_pages', 'empty_pages', 'scanned', 'mixed', 'error', 'seconds'};
+    páginas numeradas desde 1. 'scanned' = ninguna página con texto y al menos una imagen.
+    Si el PDF no se puede inspeccionar no se rechaza: decide la extracción completa.
+    """
+    t0 = time.perf_counter()
+    out = {"pages": 0, "image_pages": [], "empty_pages": [], "scanned": False, "mixed": False, "error": None}
+    text_pages = 0
+    try:
+        import pypdfium2 as pdfium
+        import pypdfium2.raw as pdfium_c
+        path = handle_path(data)
+        pdf = pdfium.PdfDocument(path if path is not None else data)
+        try:
+            out["pages"] = len(pdf)
+            for i in range(len(pdf)):
+                page = pdf[i]
+                try:
+                    first = lambda kind: next(iter(page.get_objects(filter=[kind], max_depth=3)), None) is not None
+                    if first(pdfium_c.FPDF_PAGEOBJ_TEXT):
+                        text_pages += 1
+                    elif first(pdfium_c.FPDF_PAGEOBJ_IMAGE):
+                        out["image_pages"].append(i + 1)
+                    else:
+                        out["empty_pages"].append(i + 1)
+                finally:
+                    page.close()
+        finally:
+            pdf.close()
+    except Exception as e:
+        out["error"] = str(e)
+        text_pages = max(out["pages"], 1)
+    out["scanned"] = text_pages == 0 and bool(out["image_pages"])
+    out["mixed"] = text_pages > 0 and bool(out["image_pages"])
+    out["seconds"] = time.perf_counter() - t0
+    return out
+
+
+def detect_bank_from_text(txt: str) -> str:
+    U = (txt or "").upper()
+    score_macro = sum(1 for k in BANK_MACRO_HINTS   if k in U)
+    score_sf    = sum(1 for k in BANK_SANTAFE_HINTS if k in U)
+    score_bna   = sum(1 for k in BANK_NACION_HINTS  if k in U)
+    scores = [
+        ("Banco Macro",              score_macro),
+        ("Banco de Santa Fe",        score_sf),
+        ("Banco de la Nación Argentina", score_bna),
+    ]
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return scores[0][0] if scores[0][1] > 0 else "Banco no identificado"
+
+
+# ---------- extracción de líneas ----------
+def extract_all_lines(file_like, progress=None, profile=None, counts: dict | None = None):
+    """
+    Devuelve [(página, línea)] con el backend/perfil de `profile` (por defecto el de pdfplumber con
+    texto + palabras). Las páginas ya vistas salen de PAGE_CACHE sin análisis de layout; si se pasa
+    `counts` ({'hits', 'misses'}), se le suman los aciertos / fallos de esta llamada.
+    """
+    return extract_lines(file_like, profile, progress=progress, counts=counts)
+
+
+# ---------- Macro: segmentación por cuentas en una pasada (ID = número completo) ----------
+def _normalize_account_token(tok: str) -> str:
+    return re.sub(rf"\s*{HYPH}\s*", "-", tok)
+
+
+# Clasifica cada línea para la segmentación de Macro en un solo match:
+#   titulo  lo que sigue a "CUENTA " al inicio (el número, si está, se busca en esa línea aparte)
+#   tok     primer número de cuenta (antes se mira que haya un "-ddd-": descarta rápido los movimientos)
+# Hasta cerrar la tabla de cuentas se usa MACRO_HEADER_LINE_RE, que además trae:
+#   info    "Información de su/s Cuenta/s"
+_MACRO_BODY = (
+    rf"(?:CUENTA\s+(?P<titulo>.+)$"
+    rf"|(?=.*?{HYPH}\s*\d{{3}}\s*{HYPH})(?=.*?(?P<tok>{ACCOUNT_TOKEN_RE.pattern})))?"
+)
+MACRO_LINE_RE = re.compile("^" + _MACRO_BODY, re.IGNORECASE)
+MACRO_HEADER_LINE_RE = re.compile(
+    rf"^(?:(?=.*?(?P<info>{INFO_HEADER.pattern})))?" + _MACRO_BODY,
+    re.IGNORECASE,
+)
+MACRO_LOOKAHEAD_LINES = 12  # líneas en las que se espera el número después de un título "CUENTA ..."
+
+
+def _macro_tipo(u: str, last_tipo: str | None) -> str:
+    if "CORRIENTE" in u and "ESPECIAL" in u and ("DOLAR" in u or "DÓLAR" in u or "DOLARES" in u or "DÓLARES" in u):
+        return "CUENTA CORRIENTE ESPECIAL EN DOLARES"
+    if "CORRIENTE" in u and "ESPECIAL" in u:
+        return "CUENTA CORRIENTE ESPECIAL EN PESOS"
+    if "CUENTA CORRIENTE BANCARIA" in u:
+        return "CUENTA CORRIENTE BANCARIA"
+    return last_tipo or "CUENTA"
+
+
+def _normalize_title_from_pending(pending_title: str) -> str:
+    t = pending_title.upper()
+    if "CORRIENTE" in t and "ESPECIAL" in t and ("DOLAR" in t or "DÓLAR" in t): return "CUENTA CORRIENTE ESPECIAL EN DOLARES"
+    if "CORRIENTE" in t and "ESPECIAL" in t:                                   return "CUENTA CORRIENTE ESPECIAL EN PESOS"
+    if "CORRIENTE" in t:                                                       return "CUENTA CORRIENTE BANCARIA"
+    if "CAJA DE AHORRO" in t:                                                  return "CAJA DE AHORRO"
+    return "CUENTA"
+
+
+def macro_scan_segments(all_lines, whitelist: dict | None = None):
+    """
+    Máquina de estados de una pasada sobre [(página, línea)], un MACRO_LINE_RE.match por línea:
+      1. "Información de su/s Cuenta/s" arma la whitelist {nro: {'titulo'}} con cada número de cuenta
+         que aparece hasta la primera línea "CUENTA ... NRO" sin número (así cierra la tabla el
+         formato de Macro). Las líneas hasta ahí quedan en espera (con su match) porque se filtran
+         contra la whitelist completa; si la tabla no cierra, se procesan al final, y si no aparece,
+         el filtro no se aplica.
+      2. Títulos "CUENTA ..." (con el número en la misma línea o en las 12 siguientes) y números de
+         cuenta de la whitelist abren un tramo nuevo.
+    Genera cada tramo {'nro', 'titulo', 'page', 'lines', 'line_pages'} apenas se cierra (al abrirse el
+    siguiente o al terminar). Una cuenta puede tener varios tramos: macro_split_account_blocks los junta.
+    `whitelist` (dict opcional) se completa con la tabla leída.
+    """
+    white = {} if whitelist is None else whitelist
+    table = "buscando"  # buscando -> en_tabla -> cerrada
+    last_tipo = None
+    held = []  # (página, línea, match) en espera hasta cerrar la tabla
+    seg = None
+    pending_title, expect_token_in = None, 0
+
+    def open_seg(nro, pi, titulo_hint):
+        nonlocal seg
+        done = seg
+        titulo = (white.get(nro, {}) or {}).get("titulo") or (titulo_hint and _normalize_title_from_pending(titulo_hint)) or "CUENTA"
+        seg = {"nro": nro, "titulo": titulo, "page": pi, "lines": [], "line_pages": []}
+        return done
+
+    def step(pi, ln, m):
+        """Un paso del segmentador; devuelve el tramo que se cerró (o None)."""
+        nonlocal pending_title, expect_token_in
+        titulo = m.group("titulo")
+        if titulo is not None:
+            pending_title = "CUENTA " + titulo.strip()
+            expect_token_in = MACRO_LOOKAHEAD_LINES
+            mt = RE_MACRO_ACC_NRO.search(ln)
+            raw = mt.group(1) if mt else next((t.text for t in accounts(ln)), None)
+            if raw:
+                nro = _normalize_account_token(raw)
+                if (not white) or (nro in white):
+                    done = open_seg(nro, pi, pending_title)
+                    pending_title, expect_token_in = None, 0
+                    return done
+            return None
+
+        tok = m.group("tok")
+        if pending_title and expect_token_in > 0:
+            expect_token_in -= 1
+            if tok:
+                mn = RE_MACRO_ACC_NRO.search(ln)
+                nro = _normalize_account_token(mn.group(1) if mn else tok)
+                done = open_seg(nro, pi, pending_title) if (not white) or (nro in white) else None
+                pending_title, expect_token_in = None, 0
+                return done
+            if RE_HAS_NRO.search(ln):
+                expect_token_in = max(expect_token_in, MACRO_LOOKAHEAD_LINES)
+                return None
+
+        done = None
+        if (not pending_title) and white and tok:
+            nro = _normalize_account_token(tok)
+            if nro in white and (seg is None or seg["nro"] != nro):
+                done = open_seg(nro, pi, None)
+        if seg is not None:
+            seg["lines"].append(ln)
+            seg["line_pages"].append(pi)
+        return done
+
+    for pi, ln in all_lines:
+        if table == "cerrada":
+            m = MACRO_LINE_RE.match(ln)
+            if m.lastindex is None and not pending_title:
+                # camino común: un movimiento más de la cuenta actual
+                if seg is not None:
+                    seg["lines"].append(ln)
+                    seg["line_pages"].append(pi)
+                continue
+        else:
+            m = MACRO_HEADER_LINE_RE.match(ln)
+            tok = m.group("tok")
+            if tok is None and m.group("titulo") is not None:
+                tok = next((t.text for t in accounts(ln)), None)
+            if m.group("info") is not None:
+                table = "en_tabla"
+            elif table == "en_tabla":
+                if tok:
+                    last_tipo = _macro_tipo(ln.upper(), last_tipo)
+                    white[_normalize_account_token(tok)] = {"titulo": last_tipo}
+                elif ln.strip().startswith("CUENTA ") and "NRO" in ln.upper():
+                    table = "cerrada"
+            if table != "cerrada":
+                held.append((pi, ln, m))
+                continue
+            # tabla cerrada: se procesan las líneas en espera con la whitelist completa
+            for hpi, hln, hm in held:
+                done = step(hpi, hln, hm)
+                if done:
+                    yield done
+            held = []
+        done = step(pi, ln, m)
+        if done:
+            yield done
+
+    for hpi, hln, hm in held:  # la tabla nunca se cerró
+        done = step(hpi, hln, hm)
+        if done:
+            yield done
+    if seg is not None:
+        yield seg
+
+
+def macro_extract_account_whitelist(file_like, progress=None, all_lines=None) -> dict:
+    """Tabla "Información de su/s Cuenta/s" {nro: {'titulo'}}; `all_lines` evita volver a leer el PDF."""
+    if all_lines is None:
+        all_lines = extract_all_lines(file_like, progress=progress)
+    white = {}
+    for _ in macro_scan_segments(all_lines, white):
+        pass
+    return white
+
+
+def macro_split_account_blocks(file_like, progress=None, all_lines=None):
+    """Una cuenta por número, en orden de aparición, juntando sus tramos (macro_scan_segments)."""
+    if all_lines is None:
+        all_lines = extract_all_lines(file_like, progress=progress)
+    accounts = {}
+    for seg in macro_scan_segments(all_lines):
+        acc = accounts.get(seg["nro"])
+        if acc is None:
+            acc = accounts[seg["nro"]] = {"titulo": seg["titulo"], "nro": seg["nro"], "lines": [], "line_pages": [],
+                                          "pages": [seg["page"], seg["page"]], "acc_id": seg["nro"]}
+        else:
+            acc["pages"][1] = max(acc["pages"][1], seg["page"])
+            if acc["titulo"] == "CUENTA" and seg["titulo"] != "CUENTA":
+                acc["titulo"] = seg["titulo"]
+        acc["lines"].extend(seg["lines"])
+        acc["line_pages"].extend(seg["line_pages"])
+        if seg["line_pages"]:
+            acc["pages"][1] = max(acc["pages"][1], max(seg["line_pages"]))
+    for acc in accounts.values():
+        acc["pages"] = tuple(acc["pages"])
+    return list(accounts.values())
+
+
+# ---------- Plantilla repetida en cada página (membrete, títulos, encabezados, pie) ----------
+# Una línea que (sin dígitos: "Página 3 de 9", fechas de emisión) aparece en la mayoría de las páginas
+# es parte de la plantilla del banco. Se busca una vez por documento y se saca de las líneas de cada
+# cuenta con una búsqueda en un set, antes de parse_lines y de los saldos. No se sacan las que esas
+# etapas necesitan: con importe (movimientos, saldos), el SALDO ULTIMO RESUMEN de Santa Fe (el importe
+# viene en la línea siguiente) y el PERIODO.
+TEMPLATE_MIN_PAGES = 3
+TEMPLATE_MIN_SHARE = 0.6
+_NO_DIGITS = str.maketrans("", "", "0123456789")
+_TEMPLATE_KEEP_RE = re.compile(rf"{SF_SALDO_ULT_RE.pattern}|PER[IÍ]ODO", re.IGNORECASE)
+
+
+def template_key(ln: str) -> str:
+    return ln.upper().translate(_NO_DIGITS)
+
+
+def _keep_template_line(ln: str) -> bool:
+    return bool(_TEMPLATE_KEEP_RE.search(ln) or amounts(ln))
+
+
+def find_template_lines(pairs) -> tuple[frozenset, int]:
+    """
+    (claves de plantilla, líneas del documento que son plantilla) a partir de [(página, línea)].
+    Con menos de TEMPLATE_MIN_PAGES páginas no hay plantilla que detectar.
+    """
+    per_page, occurrences, variants, n_pages = Counter(), Counter(), {}, 0
+    for _, grp in itertools.groupby(pairs, key=lambda x: x[0]):
+        n_pages += 1
+        keys = set()
+        for _, ln in grp:
+            k = template_key(ln)
+            keys.add(k)
+            occurrences[k] += 1
+            variants.setdefault(k, set()).add(ln)
+        per_page.update(keys)
+    if n_pages < TEMPLATE_MIN_PAGES:
+        return frozenset(), 0
+    need = max(TEMPLATE_MIN_PAGES, math.ceil(TEMPLATE_MIN_SHARE * n_pages))
+    template = frozenset(
+        k for k, c in per_page.items()
+        if c >= need and k.strip() and not any(map(_keep_template_line, variants[k]))
+    )
+    return template, sum(occurrences[k] for k in template)
+
+
+def drop_template_lines(lines: list[str], pages: list[int] | None, template: frozenset):
+    """(lines, pages) sin las líneas de plantilla."""
+    keep = [i for i, ln in enumerate(lines) if template_key(ln) not in template]
+    if len(keep) == len(lines):
+        return lines, pages
+    return [lines[i] for i in keep], ([pages[i] for i in keep] if pages is not None else None)
+
+
+# ---------- Parsing movimientos (genérico: Macro/SF/BNA) ----------
+def parse_lines(lines, pages=None, periodo=None) -> pd.DataFrame:
+    """
+    `pages` (opcional, paralela a `lines`) completa la columna 'pagina'; 'linea' es el índice en `lines`.
+    Las fechas se juntan como texto y se convierten al final en una sola llamada (parse_dates con `periodo`).
+    Importes y fechas salen de parsers.tokens (una pasada, con el valor ya calculado); los patrones de
+    encabezado solo se prueban en las líneas que tienen fecha y dos importes.
+    """
+    rows = []
+    seq = 0  # preserva orden exacto de aparición
+    for li, ln in enumerate(lines):
+        am = amounts(ln)
+        if len(am) < 2:
+            continue
+        d = dates(ln)
+        if not d or d[0].end >= am[0].start:
+            continue
+        d = d[0]
+        if PER_PAGE_TITLE_PAT.search(ln) or HEADER_ROW_PAT.search(ln) or NON_MOV_PAT.search(ln):
+            continue
+        saldo   = am[-1].value
+        importe = am[-2].value
+        desc = ln[d.end: am[0].start].strip()
+        seq += 1
+        rows.append({
+            "fecha": d.text,
+            "descripcion": desc,
+            "desc_norm": normalize_desc(desc),
+            "debito": 0.0,
+            "credito": 0.0,
+            "importe": importe,      # informativo; conciliamos por Δ saldo
+            "saldo": saldo,
+            "pagina": pages[li] if pages is not None else 0,
+            "linea": li,
+            "orden": seq
+        })
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df["fecha"] = parse_dates(df["fecha"], periodo)
+    return df
+
+
+# ---------- Saldos ----------
+def _only_one_amount(line: str) -> bool:
+    return len(amounts(line)) == 1
+
+
+def _first_amount_value(line: str) -> float:
+    am = amounts(line)
+    return am[0].value if am else np.nan
+
+
+def find_saldo_final_from_lines(lines):
+    # 1) Macro/otros con formato expreso
+    for ln in reversed(lines):
+        if SALDO_FINAL_PREFIX.match(ln):
+            d = dates(ln)
+            if d and _only_one_amount(ln):
+                fecha = parse_dates([d[0].text]).iloc[0]
+                saldo = _first_amount_value(ln)
+                if pd.notna(fecha) and not np.isnan(saldo):
+                    return fecha, saldo
+    # 2) BNA: "SALDO FINAL" sin fecha
+    for ln in reversed(lines):
+        if "SALDO FINAL" in ln.upper() and _only_one_amount(ln):
+            saldo = _first_amount_value(ln)
+            if not np.isnan(saldo):
+                return pd.NaT, saldo
+    return pd.NaT, np.nan
+
+
+def statement_period(lines, fecha_cierre=None) -> tuple:
+    """
+    (desde, hasta) del resumen para fechas sin año: 'PERIODO: dd/mm/aaaa AL dd/mm/aaaa' en el encabezado
+    (se deja de buscar en el primer encabezado de movimientos) o, si no está, (None, fecha de cierre).
+    """
+    for ln in lines:
+        m = BNA_PERIODO_RE.search(ln)
+        if m:
+            desde, hasta = parse_dates([m.group(1), m.group(2)])
+            return desde, hasta
+        if HEADER_ROW_PAT.search(ln):
+            break
+    if fecha_cierre is None:
+        fecha_cierre, _ = find_saldo_final_from_lines(lines)
+    return None, fecha_cierre
+
+
+def find_saldo_anterior_from_lines(lines):
+    # 1) Macro (expreso con fecha)
+    for ln in lines:
+        if SALDO_ANT_PREFIX.match(ln):
+            d = dates(ln)
+            if d and _only_one_amount(ln):
+                saldo = _first_amount_value(ln)
+                if not np.isnan(saldo):
+                    return saldo
+    # 2) Genérico: "SALDO ANTERIOR"
+    for ln in lines:
+        U = ln.upper()
+        if "SALDO ANTERIOR" in U and _only_one_amount(ln):
+            saldo = _first_amount_value(ln)
+            if not np.isnan(saldo):
+                return saldo
+    # 3) Macro variantes
+    for ln in lines:
+        U = ln.upper()
+        if "SALDO ULTIMO EXTRACTO" in U or "SALDO ÚLTIMO EXTRACTO" in U:
+            d = dates(ln)
+            if d and _only_one_amount(ln):
+                saldo = _first_amount_value(ln)
+                if not np.isnan(saldo):
+                    return saldo
+    # 4) Santa Fe — "SALDO ULTIMO RESUMEN"
+    for i, ln in enumerate(lines):
+        if SF_SALDO_ULT_RE.search(ln):
+            if _only_one_amount(ln):
+                v = _first_amount_value(ln)
+                if not np.isnan(v):
+                    return v
+            for j in (i+1, i+2):
+                if 0 <= j < len(lines):
+                    ln2 = lines[j]
+                    if _only_one_amount(ln2):
+                        v2 = _first_amount_value(ln2)
+                        if not np.isnan(v2):
+                            return v2
+            break
+    return np.nan
+
+
+# ---------- Banco Santa Fe: extraer Nro de cuenta desde “Consolidado de cuentas” ----------
+def santafe_extract_accounts(file_like, progress=None, all_lines=None):
+    """
+    Busca líneas tipo: 'Cuenta Corriente Pesos Nro. 1646/00'
+    Devuelve lista de dicts [{'title': 'Cuenta Corriente Pesos', 'nro': '1646/00'}]
+    Se recorren todas las líneas: el título de cada cuenta se repite arriba de sus movimientos, y una
+    cuenta que no figura en el consolidado se toma de ahí.
+    """
+    items = []
+    if all_lines is None:
+        all_lines = extract_all_lines(file_like, progress=progress)
+    for _, ln in all_lines:
+        m = SF_ACC_LINE_RE.search(ln)
+        if m:
+            title = " ".join(m.group(1).split())
+            nro   = m.group(2).strip()
+            items.append({"title": title.title(), "nro": nro})
+    # quitar duplicados preservando orden
+    seen = set()
+    uniq = []
+    for it in items:
+        key = (it["title"], it["nro"])
+        if key not in seen:
+            seen.add(key)
+            uniq.append(it)
+    return uniq
+
+
+# ---------- Banco Nación: meta (Cuenta/CBU/Período) + gastos finales ----------
+def bna_extract_gastos_finales(txt: str) -> dict:
+    out = {}
+    for m in BNA_GASTOS_RE.finditer(txt or ""):
+        etiqueta = m.group(1).upper()
+        importe = normalize_money(m.group(2))
+        if "I.V.A" in etiqueta or "IVA" in etiqueta:
+            etiqueta = "I.V.A. BASE"
+        out[etiqueta] = float(importe) if importe is not None else np.nan
+    return out
+
+
+def bna_extract_meta(file_like, txt: str | None = None, pages=None):
+    """
+    Devuelve dict con:
+    {'account_number': str|None, 'cbu': str|None, 'period_start': str|None, 'period_end': str|None}
+    - Soporta caja larga (Cuenta+CBU) y variante corta de "NRO. CUENTA SUCURSAL"
+    Con `txt` busca en ese texto. Si no, lee página a página (`pages`: iterable de textos por página,
+    o las del PDF): las de encabezado primero y las siguientes solo si falta la cuenta o el período.
+    """
+    if txt is not None:
+        return _bna_meta_from_text(txt)
+    pages = iter(_iter_page_texts(file_like) if pages is None else pages)
+    seen, meta = [], None
+    try:
+        for i, page_txt in enumerate(pages, start=1):
+            seen.append(page_txt)
+            if i < META_HEADER_PAGES["nacion"]:
+                continue
+            meta = _bna_meta_from_text("\n".join(seen))
+            if meta["account_number"] and meta["period_start"]:
+                break
+    finally:
+        if hasattr(pages, "close"):
+            pages.close()
+    return meta or _bna_meta_from_text("\n".join(seen))
+
+
+def _bna_meta_from_text(txt: str) -> dict:
+    acc = cbu = pstart = pend = None
+
+    mper = BNA_PERIODO_RE.search(txt)
+    if mper:
+        pstart, pend = mper.group(1), mper.group(2)
+
+    macc = BNA_CUENTA_CBU_RE.search(txt)
+    if macc:
+        acc, cbu = macc.group(1), macc.group(2)
+    else:
+        monly = BNA_ACC_ONLY_RE.search(txt)
+        if monly:
+            acc = monly.group(1)
+
+    return {"account_number": acc, "cbu": cbu, "period_start": pstart, "period_end": pend}
+
+
+
+
+# ---------- Diagnóstico de conciliación ----------
+def reconciliation_breaks(df: pd.DataFrame, lines: list[str], tol: float = 0.01, max_breaks: int = 5) -> pd.DataFrame:
+    """
+    Primeras filas donde el saldo no se movió en el importe leído del PDF (la columna 'importe' de
+    parse_lines, antes de recalcularla por Δ saldo), con su página y línea de origen.
+    El PDF no trae signo confiable, así que se comparan magnitudes: diferencia = |Δ saldo| - importe.
+    Un importe con el saldo quieto es un quiebre; sin importe legible se acepta el Δ.
+    `df` debe venir ordenado y con las columnas saldo / importe / pagina / linea.
+    """
+    cols = ["fecha", "descripcion", "saldo_previo", "importe_pdf", "saldo", "delta_saldo", "diferencia",
+            "pagina", "linea_pdf"]
+    if len(df) < 2:
+        return pd.DataFrame(columns=cols)
+    saldo = df["saldo"].to_numpy(dtype=float)
+    monto = np.abs(df["importe"].to_numpy(dtype=float))
+    delta = np.diff(saldo, prepend=saldo[0])
+    residuo = np.where(np.isnan(monto), 0.0, np.abs(delta) - monto)
+    residuo[0] = 0.0
+    idx = np.flatnonzero(np.abs(residuo) > tol)[:max_breaks]
+    if not len(idx):
+        return pd.DataFrame(columns=cols)
+    linea = df["linea"].to_numpy()[idx]
+    return pd.DataFrame({
+        "fecha": df["fecha"].to_numpy()[idx],
+        "descripcion": df["descripcion"].to_numpy()[idx],
+        "saldo_previo": saldo[idx - 1],
+        "importe_pdf": monto[idx],
+        "saldo": saldo[idx],
+        "delta_saldo": delta[idx],
+        "diferencia": residuo[idx],
+        "pagina": df["pagina"].to_numpy()[idx],
+        "linea_pdf": [lines[i] if 0 <= i < len(lines) else "" for i in linea],
+    }, columns=cols)
+
+
+# ---------- Cálculo por cuenta (sin UI) ----------
+MONEY_COLS = ["debito", "credito", "importe", "saldo"]
+CREDIT_CLASSES = ["Cuota de préstamo", "Acreditación Préstamos"]
+RESUMEN_KEYS = ["net21", "iva21", "net105", "iva105", "percep_iva", "ley_25413", "sircreb"]
+RESUMEN_COLS = ["net21", "iva21", "bruto21", "net105", "iva105", "bruto105", "percep_iva", "ley_25413", "sircreb"]
+# Clasificación → (concepto del Resumen Operativo, columna que suma, signo)
+RESUMEN_CLASES = {
+    "IVA 21% (sobre comisiones)": [("iva21", "debito", 1)],
+    "IVA 10,5% (sobre comisiones)": [("iva105", "debito", 1)],
+    "Percepciones de IVA": [("percep_iva", "debito", 1)],
+    "LEY 25.413": [("ley_25413", "debito", 1), ("ley_25413", "credito", -1)],
+    "SIRCREB": [("sircreb", "debito", 1)],
+}
+
+
+def resumen_operativo(df: pd.DataFrame, by=()) -> pd.DataFrame:
+    """
+    Resumen Operativo (neto/IVA/bruto 21% y 10,5%, percepciones, Ley 25.413 neto, SIRCREB) por cada
+    combinación de las columnas `by`, con un solo groupby sobre (by…, Clasificación).
+    Sin `by` devuelve una sola fila con el total de `df`.
+    """
+    by = list(by)
+    grupos = by or [np.zeros(len(df), dtype=np.int8)]
+    sums = df.groupby([*grupos, "Clasificación"], observed=True, sort=False)[["debito", "credito"]].sum()
+    todos = sums.index.droplevel(-1).unique()
+    sums = sums[sums.index.get_level_values(-1).isin(list(RESUMEN_CLASES))]
+    wide = sums.unstack(-1, fill_value=0.0).reindex(todos, fill_value=0.0)  # columnas (debito|credito, clase)
+    out = pd.DataFrame(0.0, index=todos, columns=["iva21", "iva105", "percep_iva", "ley_25413", "sircreb"])
+    for clase, partes in RESUMEN_CLASES.items():
+        for concepto, col, signo in partes:
+            if (col, clase) in wide.columns:
+                out[concepto] += signo * wide[(col, clase)]
+    if not by:
+        out = out.reset_index(drop=True).reindex([0], fill_value=0.0)
+    # mismo redondeo que el cálculo por cuenta de siempre (round de Python sobre cada valor)
+    out["net21"] = [round(v / 0.21, 2) if v else 0.0 for v in out["iva21"]]
+    out["net105"] = [round(v / 0.105, 2) if v else 0.0 for v in out["iva105"]]
+    out["bruto21"] = out["net21"] + out["iva21"]
+    out["bruto105"] = out["net105"] + out["iva105"]
+    out = out[RESUMEN_COLS]
+    return out.reset_index() if by else out
+
+
+# ---------- Reclasificación manual (incremental) ----------
+def override_classes(df: pd.DataFrame, overrides: dict) -> pd.Series:
+    """Clasificación de `df` con las correcciones del usuario ({desc_norm: clase}) aplicadas."""
+    cls = df["Clasificación"].astype(object)
+    if not overrides:
+        return cls
+    forced = df["desc_norm"].map(overrides).astype(object)
+    return forced.where(forced.notna(), cls)
+
+
+def reclassify_report(rep: dict, target: pd.Series) -> dict:
+    """
+    `rep` (de account_summary) con la Clasificación de `target` (misma forma que rep['df']). Solo se miran
+    las filas que cambian: a Resumen Operativo y créditos se les resta lo que aportaban con la clase
+    anterior y se les suma lo que aportan con la nueva, sin reagregar el resto. Devuelve un dict nuevo
+    (el `rep` original puede estar compartido en la memo); los exportes quedan los de `rep`.
+    """
+    df = rep["df"]
+    actual = df["Clasificación"].astype(object)
+    changed = df.index[target.ne(actual).to_numpy()]
+    if changed.empty:
+        return rep
+    rows = df.loc[changed, ["debito", "credito"]]
+    old, new = actual.loc[changed], target.loc[changed].astype(object)
+
+    resumen = dict(rep["resumen"])
+    tocados = set()
+    for clases, signo in ((old, -1), (new, 1)):
+        for clase, grp in rows.groupby(clases.to_numpy(), sort=False):
+            for concepto, col, s in RESUMEN_CLASES.get(clase, ()):
+                resumen[concepto] += signo * s * float(grp[col].sum())
+                tocados.add(concepto)
+    for concepto in tocados:
+        resumen[concepto] = round(resumen[concepto], 2) + 0.0  # sin restos de float ni -0,00
+    resumen["net21"] = round(resumen["iva21"] / 0.21, 2) if resumen["iva21"] else 0.0
+    resumen["net105"] = round(resumen["iva105"] / 0.105, 2) if resumen["iva105"] else 0.0
+
+    cuota, acred = CREDIT_CLASSES
+    total_cuotas = rep["total_cuotas"] - rows["debito"][old.eq(cuota)].sum() + rows["debito"][new.eq(cuota)].sum()
+    total_acredit = rep["total_acredit"] - rows["credito"][old.eq(acred)].sum() + rows["credito"][new.eq(acred)].sum()
+    es_credito = new.isin(CREDIT_CLASSES).to_numpy()
+    creditos = rep["creditos"].difference(changed[~es_credito]).union(changed[es_credito])
+
+    col = df["Clasificación"]
+    faltan = [c for c in pd.unique(new) if c not in col.cat.categories]
+    if faltan:
+        col = col.cat.add_categories(faltan)
+    col = col.copy()
+    col.loc[changed] = new.to_numpy()
+    return {
+        **rep,
+        "df": df.assign(**{"Clasificación": col}),
+        "resumen": resumen,
+        "creditos": creditos,
+        "total_cuotas": round(float(total_cuotas), 2) + 0.0,
+        "total_acredit": round(float(total_acredit), 2) + 0.0,
+    }
+
+
+def corrected_report(prev: dict | None, rep: dict, overrides: dict) -> dict:
+    """
+    Un paso de la versión corregida de una cuenta: {'base', 'firma', 'rep'}, aplicando `overrides` sobre
+    `prev` (el paso anterior de la misma cuenta, si salió del mismo `rep`). Con filas cambiadas solo se
+    rehace el PDF del Resumen Operativo; los Excel se sacan del dict y se arman al pedirlos (account_xlsx).
+    """
+    if prev is None or prev["base"] is not rep:
+        prev = {"base": rep, "firma": (), "rep": rep}
+    firma = tuple(sorted(overrides.items()))
+    if prev["firma"] == firma:
+        return prev
+    nuevo = reclassify_report(prev["rep"], override_classes(rep["df"], overrides))
+    if nuevo is not prev["rep"]:
+        nuevo = {k: v for k, v in nuevo.items() if k not in ACCOUNT_XLSX}
+        nuevo["pdf_resumen"] = build_resumen_pdf(nuevo["resumen"])
+    return {"base": rep, "firma": firma, "rep": nuevo}
+
+
+# ---------- Memoria de los resultados ----------
+COMPACT_CATEGORIES = ["descripcion", "desc_norm", "Clasificación"]
+
+
+def compact_movements(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Frame de movimientos que queda en memoria: textos repetitivos como categóricas y página int32.
+    Los importes quedan en float64 (mismo ancho que centavos int64; los exportes ya escriben centavos).
+    """
+    return df.astype({
+        **{c: "category" for c in COMPACT_CATEGORIES if c in df.columns},
+        **({"pagina": np.int32} if "pagina" in df.columns else {}),
+    })
+
+
+def report_memory(rep: dict) -> dict:
+    """Bytes de una cuenta calculada: movimientos (deep), exportes ya generados y el resto."""
+    if rep.get("empty"):
+        return {"movimientos": 0, "exportes": 0, "otros": 0}
+    exports = sum(len(rep[k]) for k in ("xlsx", "xlsx_creditos", "pdf_resumen") if isinstance(rep.get(k), bytes))
+    otros = int(rep["quiebres"].memory_usage(deep=True).sum()) if rep.get("quiebres") is not None else 0
+    return {"movimientos": int(rep["df"].memory_usage(deep=True).sum()), "exportes": exports, "otros": otros}
+
+
+def result_memory(result: dict) -> dict:
+    """Suma de report_memory sobre las cuentas de un resultado de process_statement."""
+    tot = {"movimientos": 0, "exportes": 0, "otros": 0}
+    for acc in result.get("accounts", []):
+        for k, v in report_memory(acc["report"]).items():
+            tot[k] += v
+    tot["total"] = sum(tot.values())
+    return tot
+
+
+def value_memory(obj) -> int:
+    """
+    Bytes aproximados de una salida de etapa o de un trabajo (lo que acota STAGES y JOBS): DataFrames
+    y Series deep, bytes, str y contenedores recorridos. Un mismo objeto se cuenta una sola vez.
+    """
+    seen, total, stack = set(), 0, [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        if isinstance(o, pd.DataFrame):
+            total += int(o.memory_usage(deep=True).sum())
+        elif isinstance(o, (pd.Series, pd.Index)):
+            total += int(o.memory_usage(deep=True))
+        elif isinstance(o, (bytes, bytearray)):
+            total += len(o)
+        elif isinstance(o, dict):
+            total += sys.getsizeof(o)
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(o)
+            stack.extend(o)
+        else:
+            total += sys.getsizeof(o)
+    return total
+
+
+def process_rss() -> int | None:
+    """RSS actual del proceso en bytes (Linux: /proc; si no, el pico de resource); None si no se puede leer."""
+    try:
+        with open("/proc/self/status") as fh:
+            for ln in fh:
+                if ln.startswith("VmRSS:"):
+                    return int(ln.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+def account_movements(lines: list[str], pages: list[int] | None = None) -> dict:
+    """
+    Etapa movimientos: parse_lines + SALDO ANTERIOR + débito/crédito por delta de saldo (sin clasificar).
+    Devuelve {'df' (None si no hay movimientos), 'fecha_cierre', 'saldo_final_pdf', 'saldo_anterior', 'quiebres'}.
+    """
+    fecha_cierre, saldo_final_pdf = find_saldo_final_from_lines(lines)
+    df = parse_lines(lines, pages, periodo=statement_period(lines, fecha_cierre))
+    saldo_anterior = find_saldo_anterior_from_lines(lines)
+    out = {"df": None, "fecha_cierre": fecha_cierre, "saldo_final_pdf": saldo_final_pdf,
+           "saldo_anterior": saldo_anterior, "quiebres": None}
+    if df.empty:
+        return out
+
+    # Con movimientos: insertar SALDO ANTERIOR si existe
+    if not np.isnan(saldo_anterior):
+        first_date = df["fecha"].dropna().min()
+        fecha_apertura = (first_date - pd.Timedelta(days=1)).normalize() + pd.Timedelta(hours=23, minutes=59, seconds=59) if pd.notna(first_date) else pd.NaT
+        apertura = pd.DataFrame([{
+            "fecha": fecha_apertura,
+            "descripcion": "SALDO ANTERIOR",
+            "desc_norm": "SALDO ANTERIOR",
+            "debito": 0.0,
+            "credito": 0.0,
+            "importe": 0.0,
+            "saldo": float(saldo_anterior),
+            "pagina": 0,
+            "linea": -1,
+            "orden": 0
+        }])
+        df = pd.concat([apertura, df], ignore_index=True)
+
+    # Débito/Crédito por delta de saldo
+    df = df.sort_values(["fecha", "orden"]).reset_index(drop=True)
+    out["quiebres"] = reconciliation_breaks(df, lines)
+    df["delta_saldo"] = df["saldo"].diff()
+    df["debito"]  = np.where(df["delta_saldo"] < 0, -df["delta_saldo"], 0.0)
+    df["credito"] = np.where(df["delta_saldo"] > 0,  df["delta_saldo"], 0.0)
+    df["importe"] = df["debito"] - df["credito"]  # signo contable
+    out["df"] = df
+    return out
+
+
+def classify_movements(df: pd.DataFrame, banco_slug: str) -> pd.DataFrame:
+    """Etapa clasificación: agrega Clasificación y deja el frame compacto que queda en memoria."""
+    df = df.assign(**{"Clasificación": clasificar_df(df, banco_slug)})
+    return compact_movements(df.drop(columns=["orden", "linea"]).reset_index(drop=True))
+
+
+def account_summary(mov: dict, df_sorted: pd.DataFrame | None) -> dict:
+    """Etapa resúmenes: saldos, conciliación, Resumen Operativo y detalle de créditos (sin exportes)."""
+    saldo_anterior, saldo_final_pdf = mov["saldo_anterior"], mov["saldo_final_pdf"]
+
+    # Sin movimientos: solo saldos y conciliación
+    if df_sorted is None:
+        saldo_inicial = float(saldo_anterior) if not np.isnan(saldo_anterior) else 0.0
+        saldo_final_visto = float(saldo_final_pdf) if not np.isnan(saldo_final_pdf) else saldo_inicial
+        saldo_final_calculado = saldo_inicial
+        diferencia = saldo_final_calculado - saldo_final_visto
+        return {
+            "empty": True,
+            "fecha_cierre": mov["fecha_cierre"],
+            "saldo_inicial": saldo_inicial,
+            "total_debitos": 0.0,
+            "total_creditos": 0.0,
+            "saldo_final_visto": saldo_final_visto,
+            "saldo_final_calculado": saldo_final_calculado,
+            "diferencia": diferencia,
+            "cuadra": abs(diferencia) < 0.01,
+        }
+
+    # Totales / conciliación
+    saldo_inicial = float(df_sorted.loc[0, "saldo"])
+    total_debitos = float(df_sorted["debito"].sum())
+    total_creditos = float(df_sorted["credito"].sum())
+    saldo_final_visto = float(df_sorted["saldo"].iloc[-1]) if np.isnan(saldo_final_pdf) else float(saldo_final_pdf)
+    saldo_final_calculado = saldo_inicial + total_creditos - total_debitos
+    diferencia = saldo_final_calculado - saldo_final_visto
+
+    # ===== Resumen Operativo (IVA + Otros) =====
+    resumen = resumen_operativo(df_sorted).iloc[0][RESUMEN_KEYS].astype(float).to_dict()
+
+    # ===== Detalle de créditos (préstamos) =====
+    creditos = df_sorted.index[df_sorted["Clasificación"].isin(CREDIT_CLASSES)]
+    df_creditos = df_sorted.loc[creditos]
+    total_cuotas = float(df_creditos.loc[df_creditos["Clasificación"].eq("Cuota de préstamo"), "debito"].sum())
+    total_acredit = float(df_creditos.loc[df_creditos["Clasificación"].eq("Acreditación Préstamos"), "credito"].sum())
+
+    return {
+        "empty": False,
+        "fecha_cierre": mov["fecha_cierre"],
+        "df": df_sorted,
+        "saldo_inicial": saldo_inicial,
+        "total_debitos": total_debitos,
+        "total_creditos": total_creditos,
+        "saldo_final_visto": saldo_final_visto,
+        "saldo_final_calculado": saldo_final_calculado,
+        "diferencia": diferencia,
+        "cuadra": abs(diferencia) < 0.01,
+        "quiebres": mov["quiebres"],
+        "resumen": resumen,
+        "creditos": creditos,  # filas de `df` con cuotas/acreditaciones de préstamos
+        "total_cuotas": total_cuotas,
+        "total_acredit": total_acredit,
+    }
+
+
+ACCOUNT_XLSX = ("xlsx", "xlsx_creditos")
+
+
+def account_xlsx(summary: dict, kind: str):
+    """Excel 'xlsx' (movimientos) o 'xlsx_creditos' de una cuenta; None sin créditos o sin xlsxwriter."""
+    df = summary["df"]
+    if kind == "xlsx":
+        return build_xlsx(df, "Movimientos")
+    df_creditos = df.loc[summary["creditos"]]
+    return build_xlsx(df_creditos, "Creditos") if not df_creditos.empty else None
+
+
+def account_exports(summary: dict) -> dict:
+    """Etapa exportes: Excel de movimientos / créditos y PDF del Resumen Operativo."""
+    if summary["empty"]:
+        return {}
+    return {**{k: account_xlsx(summary, k) for k in ACCOUNT_XLSX}, "pdf_resumen": build_resumen_pdf(summary["resumen"])}
+
+
+def compute_account_report(banco_slug: str, lines: list[str], pages: list[int] | None = None) -> dict:
+    """
+    Todo lo que render_account_report muestra, calculado sin tocar Streamlit:
+    movimientos, conciliación, Resumen Operativo, detalle de créditos y exportes.
+    (Las mismas etapas que parsers.pipeline memoiza por separado.)
+    """
+    parts, _ = account_stages(banco_slug, lines, pages)
+    return {**parts["resumenes"], **parts["exportes"]}
+
+
+ACCOUNT_STAGES = ("movimientos", "clasificados", "resumenes", "exportes")
+
+
+def account_stages(banco_slug: str, lines: list[str], pages: list[int] | None = None, mov: dict | None = None):
+    """
+    Las cuatro etapas de una cuenta, cronometradas: ({etapa: salida}, {etapa: segundos}).
+    Si ya se tiene `mov` (movimientos memoizados) se arranca desde la clasificación.
+    Solo recibe y devuelve datos serializables: es lo que corre en el pool de cuentas.
+    """
+    parts, secs = {}, {}
+    t = time.perf_counter()
+    if mov is None:
+        mov = account_movements(lines, pages)
+        parts["movimientos"] = mov
+        secs["movimientos"], t = time.perf_counter() - t, time.perf_counter()
+    parts["clasificados"] = classify_movements(mov["df"], banco_slug) if mov["df"] is not None else None
+    secs["clasificados"], t = time.perf_counter() - t, time.perf_counter()
+    parts["resumenes"] = account_summary(mov, parts["clasificados"])
+    secs["resumenes"], t = time.perf_counter() - t, time.perf_counter()
+    parts["exportes"] = account_exports(parts["resumenes"])
+    secs["exportes"] = time.perf_counter() - t
+    return parts, secs
+
+
+# ---------- Consolidado (varias cuentas / períodos) ----------
+def consolidated_movements(items: list) -> pd.DataFrame:
+    """
+    Movimientos de varias cuentas (y de varios resúmenes) en un solo DataFrame: `items` = [(meta, df)]
+    con meta de account_meta. Agrega banco, cuenta, titulo y periodo (AAAA-MM de la fecha) como
+    categóricas; se descartan las filas de apertura (SALDO ANTERIOR), que no son movimientos.
+    """
+    frames = [
+        df.loc[df["Clasificación"].ne("SALDO ANTERIOR")].assign(banco=m["banco"], cuenta=m["cuenta"], titulo=m["titulo"])
+        for m, df in items if df is not None and not df.empty
+    ]
+    if not frames:
+        return pd.DataFrame(columns=["banco", "cuenta", "titulo", "periodo", "fecha", "descripcion", *MONEY_COLS, "Clasificación"])
+    mov = pd.concat(frames, ignore_index=True)
+    mov["periodo"] = mov["fecha"].dt.strftime("%Y-%m")
+    for c in ("banco", "cuenta", "titulo", "periodo", "Clasificación"):
+        mov[c] = mov[c].astype("category")
+    return mov
+
+
+def consolidated_resumen(mov: pd.DataFrame) -> pd.DataFrame:
+    """Resumen Operativo por cuenta y mes (un groupby) + fila TOTAL al final."""
+    by = ["banco", "cuenta", "periodo"]
+    if mov.empty:
+        return pd.DataFrame(columns=by + RESUMEN_COLS)
+    out = resumen_operativo(mov, by).sort_values(by, kind="stable")
+    for c in by:
+        out[c] = out[c].astype(str)
+    total = pd.DataFrame([{"banco": "TOTAL", "cuenta": "", "periodo": "", **out[RESUMEN_COLS].sum().to_dict()}])
+    return pd.concat([out, total], ignore_index=True)
+
+
+def filter_movements(df: pd.DataFrame, clases=None, desde=None, hasta=None) -> pd.Index:
+    """
+    Índices de `df` que pasan los filtros (Clasificación en `clases`, fecha entre `desde` y `hasta`,
+    ambos inclusive). No copia el DataFrame: la vista se arma después con df.loc[idx[a:b]].
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if clases:
+        mask &= df["Clasificación"].isin(clases).to_numpy()
+    if desde is not None:
+        mask &= (df["fecha"] >= pd.Timestamp(desde)).to_numpy()
+    if hasta is not None:
+        mask &= (df["fecha"] < pd.Timestamp(hasta) + pd.Timedelta(days=1)).to_numpy()
+    return df.index[mask]
+
+
+# ---------- Exportes ----------
+def formatted_money(df: pd.DataFrame, cols=MONEY_COLS) -> pd.DataFrame:
+    """Copia de `df` con las columnas de importe como texto es-AR (una pasada vectorizada por columna)."""
+    return df.assign(**{c: fmt_ar_series(df[c]) for c in cols if c in df.columns})
+
+
+CSV_CHUNK_ROWS = 50_000
+
+
+def write_csv(df: pd.DataFrame, fh, chunk_rows: int = CSV_CHUNK_ROWS, money_cols=MONEY_COLS):
+    """
+    Escribe `df` como CSV (utf-8 con BOM, importes es-AR) en el archivo binario `fh`, de a
+    `chunk_rows` filas: solo un bloque formateado está en memoria a la vez.
+    """
+    fh.write("\ufeff".encode("utf-8"))
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = formatted_money(df.iloc[start:start + chunk_rows], money_cols)
+        # formato de fecha fijo: si no, pandas lo elige por bloque según haya o no horas
+        fh.write(chunk.to_csv(index=False, header=(start == 0), date_format="%Y-%m-%d %H:%M:%S").encode("utf-8"))
+
+
+def build_csv(df: pd.DataFrame, money_cols=MONEY_COLS) -> bytes:
+    """CSV de respaldo (cuando no hay xlsxwriter) con importes en formato es-AR."""
+    buf = io.BytesIO()
+    write_csv(df, buf, money_cols=money_cols)
+    return buf.getvalue()
+
+
+def build_xlsx(df: pd.DataFrame, sheet_name: str, money_cols=MONEY_COLS):
+    """xlsx en memoria con formatos de importe/fecha; None si xlsxwriter no está disponible."""
+    try:
+        import xlsxwriter
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
+            wb  = writer.book
+            ws  = writer.sheets[sheet_name]
+            money_fmt = wb.add_format({"num_format": "#,##0.00"})
+            date_fmt  = wb.add_format({"num_format": "dd/mm/yyyy"})
+            for idx, col in enumerate(df.columns, start=0):
+                col_values = df[col].astype(str)
+                max_len = max(len(col), *(len(v) for v in col_values))
+                ws.set_column(idx, idx, min(max_len + 2, 40))
+            for c in money_cols:
+                if c in df.columns:
+                    j = df.columns.get_loc(c)
+                    ws.set_column(j, j, 16, money_fmt)
+            if "fecha" in df.columns:
+                j = df.columns.get_loc("fecha")
+                ws.set_column(j, j, 14, date_fmt)
+        return output.getvalue()
+    except Exception:
+        return None
+
+
+def build_resumen_pdf(resumen: dict):
+    """
+    PDF del “Resumen Operativo: Registración Módulo IVA”.
+    Devuelve bytes, None si reportlab no está instalado, o el str del error si falló la generación.
+    """
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib import colors
+    except Exception:
+        return None
+    try:
+        r = resumen
+        # las 10 celdas de importe se formatean juntas
+        (net21_s, iva21_s, bruto21_s, net105_s, iva105_s, bruto105_s,
+         percep_s, ley_s, sircreb_s, total_s) = fmt_ar_series([
+            r["net21"], r["iva21"], r["net21"] + r["iva21"],
+            r["net105"], r["iva105"], r["net105"] + r["iva105"],
+            r["percep_iva"], r["ley_25413"], r["sircreb"],
+            r["net21"] + r["iva21"] + r["net105"] + r["iva105"] + r["percep_iva"] + r["ley_25413"] + r["sircreb"],
+        ])
+        pdf_buf = io.BytesIO()
+        doc = SimpleDocTemplate(pdf_buf, pagesize=A4, title="Resumen Operativo - Registración Módulo IVA")
+        styles = getSampleStyleSheet()
+        elems = []
+        elems.append(Paragraph("Resumen Operativo: Registración Módulo IVA", styles["Title"]))
+        elems.append(Spacer(1, 8))
+        datos = [
+            ["Concepto", "Importe"],
+            ["Neto Comisiones 21%",  net21_s],
+            ["IVA 21%",               iva21_s],
+            ["Bruto 21%",             bruto21_s],
+            ["Neto Comisiones 10,5%", net105_s],
+            ["IVA 10,5%",             iva105_s],
+            ["Bruto 10,5%",           bruto105_s],
+            ["Percepciones de IVA (RG 3337 / RG 2408)", percep_s],
+            ["Ley 25.413",            ley_s],
+            ["SIRCREB",               sircreb_s],
+        ]
+        datos.append(["TOTAL", total_s])
+
+        tbl = Table(datos, colWidths=[300, 120])
+        tbl.setStyle(TableStyle([
+            ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
+            ("TEXTCOLOR",  (0,0), (-1,0), colors.black),
+            ("GRID",       (0,0), (-1,-1), 0.3, colors.grey),
+            ("ALIGN",      (1,1), (1,-1), "RIGHT"),
+            ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
+            ("FONTNAME",   (0,-1), (-1,-1), "Helvetica-Bold"),
+        ]))
+        elems.append(tbl)
+        elems.append(Spacer(1, 12))
+        elems.append(Paragraph("Herramienta para uso interno - AIE San Justo", styles["Normal"]))
+
+        doc.build(elems)
+        return pdf_buf.getvalue()
+    except Exception as e:
+        return str(e)
+
+
+# ---------- Exportes columnares (Parquet / Arrow IPC) ----------
+# Para cargar en el data warehouse: fechas como date32, importes como centavos (int64),
+# Clasificación como diccionario y los datos de la cuenta/período en columnas y en la metadata.
+SUMMARY_MONEY = ["saldo_inicial", "total_debitos", "total_creditos", "saldo_final_visto", "saldo_final_calculado", "diferencia"]
+
+
+def _cents(values):
+    import pyarrow as pa
+    v = np.asarray(values, dtype=float)
+    nan = np.isnan(v)
+    return pa.array(np.rint(np.where(nan, 0.0, v) * 100).astype(np.int64), mask=nan)
+
+
+def _date32(values):
+    import pyarrow as pa
+    return pa.array(pd.to_datetime(pd.Series(values)).dt.date, type=pa.date32())
+
+
+def account_meta(banco_slug: str, titulo: str, nro: str, rep: dict) -> dict:
+    """Banco, cuenta y período de una cuenta calculada (fechas ISO o None)."""
+    fechas = rep["df"]["fecha"] if not rep["empty"] else pd.Series([], dtype="datetime64[ns]")
+    iso = lambda d: d.strftime("%Y-%m-%d") if pd.notna(d) else None
+    cierre = rep["fecha_cierre"]
+    return {
+        "banco": banco_slug, "cuenta": str(nro), "titulo": str(titulo),
+        "periodo_desde": iso(fechas.min()) if len(fechas) else None,
+        "periodo_hasta": iso(cierre) if pd.notna(cierre) else (iso(fechas.max()) if len(fechas) else None),
+        "fecha_cierre": iso(cierre),
+    }
+
+
+def movements_table(df: pd.DataFrame, meta: dict):
+    """Movimientos de una cuenta como pyarrow.Table tipada (None si pyarrow no está disponible)."""
+    try:
+        import pyarrow as pa
+    except Exception:
+        return None
+    n = len(df)
+    const = lambda v: pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, dtype=np.int8)), pa.array([v], pa.string()))
+    clases = df["Clasificación"].astype("category")
+    table = pa.table({
+        "banco": const(meta["banco"]),
+        "cuenta": const(meta["cuenta"]),
+        "fecha": _date32(df["fecha"]),
+        "descripcion": pa.array(df["descripcion"].astype(str), pa.string()),
+        "desc_norm": pa.array(df["desc_norm"].astype(str), pa.string()),
+        **{f"{c}_centavos": _cents(df[c]) for c in MONEY_COLS},
+        "clasificacion": pa.DictionaryArray.from_arrays(
+            pa.array(clases.cat.codes.to_numpy(np.int16)), pa.array(list(clases.cat.categories), pa.string())),
+        "pagina": pa.array(df["pagina"].to_numpy(np.int32)),
+    })
+    return table.replace_schema_metadata({k: v or "" for k, v in {**meta, "importes": "centavos ARS"}.items()})
+
+
+def summary_table(rows: list):
+    """
+    Una fila por cuenta: `rows` = [(meta, rep)]. Saldos, totales, conciliación y Resumen Operativo
+    en centavos (nulos para las cuentas sin movimientos). None si pyarrow no está disponible.
+    """
+    try:
+        import pyarrow as pa
+    except Exception:
+        return None
+    col = lambda k: [m[k] for m, _ in rows]
+    resumen = lambda k: [rep["resumen"][k] if not rep["empty"] else np.nan for _, rep in rows]
+    return pa.table({
+        "banco": pa.array(col("banco"), pa.string()).dictionary_encode(),
+        "cuenta": pa.array(col("cuenta"), pa.string()),
+        "titulo": pa.array(col("titulo"), pa.string()),
+        "periodo_desde": _date32(col("periodo_desde")),
+        "periodo_hasta": _date32(col("periodo_hasta")),
+        "fecha_cierre": _date32(col("fecha_cierre")),
+        "movimientos": pa.array([0 if rep["empty"] else len(rep["df"]) for _, rep in rows], pa.int32()),
+        **{f"{k}_centavos": _cents([rep[k] for _, rep in rows]) for k in SUMMARY_MONEY},
+        "cuadra": pa.array([bool(rep["cuadra"]) for _, rep in rows], pa.bool_()),
+        **{f"{k}_centavos": _cents(resumen(k)) for k in RESUMEN_KEYS},
+    }).replace_schema_metadata({"importes": "centavos ARS"})
+
+
+def resumen_table(resumen: pd.DataFrame):
+    """Resumen consolidado (consolidated_resumen) como pyarrow.Table, importes en centavos."""
+    try:
+        import pyarrow as pa
+    except Exception:
+        return None
+    return pa.table({
+        **{c: pa.array(resumen[c].astype(str), pa.string()) for c in resumen.columns if c not in RESUMEN_COLS},
+        **{f"{c}_centavos": _cents(resumen[c]) for c in RESUMEN_COLS},
+    }).replace_schema_metadata({"importes": "centavos ARS"})
+
+
+def build_parquet(table):
+    """Parquet en memoria (zstd); None si no hay tabla o pyarrow."""
+    if table is None:
+        return None
+    try:
+        import pyarrow.parquet as pq
+        buf = io.BytesIO()
+        pq.write_table(table, buf, compression="zstd")
+        return buf.getvalue()
+    except Exception:
+        return None
+
+
+def build_arrow(table):
+    """Arrow IPC (formato archivo, .arrow) en memoria; None si no hay tabla o pyarrow."""
+    if table is None:
+        return None
+    try:
+        import pyarrow as pa
+        buf = io.BytesIO()
+        with pa.ipc.new_file(buf, table.schema) as writer:
+            writer.write_table(table)
+        return buf.getvalue()
+    except Exception:
+        return None
+
+
+# ---------- Pipeline completo (PDF → cuentas calculadas) ----------
+BANK_SLUGS = {
+    "Banco Macro": "macro",
+    "Banco de Santa Fe": "santafe",
+    "Banco de la Nación Argentina": "nacion",
+}
+
+
+def bank_slug(bank_name: str) -> str:
+    return BANK_SLUGS.get(bank_name, "generico")
+
+
+def read_statement_text(data, progress=None) -> str:
+    """Texto completo del PDF (vacío si es escaneado / solo imagen). `data`: bytes, ruta o spool."""
+    return _text_from_pdf(pdf_source(data), progress=progress).strip()
+
+
+def split_statement(bank_name: str, pairs: list, txt: str = "") -> tuple[dict, list]:
+    """
+    Segmentación por banco a partir de las líneas ya extraídas ([(página, línea)]).
+    Devuelve (info, cuentas): info = {'notice', 'caption', 'meta', 'plantilla'} y cada cuenta es
+    (titulo, nro, acc_id, lines, pages), ya sin las líneas de plantilla ('plantilla' dice cuántas se quitaron). No lee el PDF: sirve igual para un PDF o para un volcado de líneas.
+    """
+    info = {"notice": None, "caption": None, "meta": None}
+    accounts = []
+    all_lines, all_pages = [l for _, l in pairs], [p for p, _ in pairs]
+
+    if bank_name == "Banco Macro":
+        blocks = macro_split_account_blocks(None, all_lines=pairs)
+        if not blocks:
+            info["notice"] = "No se detectaron encabezados de cuenta en Macro. Se intentará procesar todo el PDF (podría mezclar cuentas)."
+            accounts.append(("CUENTA (PDF completo)", "s/n", "macro-pdf-completo", all_lines, all_pages))
+        else:
+            info["caption"] = f"Información de su/s Cuenta/s: {len(blocks)} cuenta(s) detectada(s)."
+            for b in blocks:
+                accounts.append((b["titulo"], b["nro"], b["acc_id"], b["lines"], b["line_pages"]))
+
+    elif bank_name == "Banco de Santa Fe":
+        sf_accounts = santafe_extract_accounts(None, all_lines=pairs)
+        if sf_accounts:
+            info["caption"] = f"Consolidado de cuentas: {len(sf_accounts)} detectada(s)."
+            for acc in sf_accounts:
+                nro = acc["nro"]
+                acc_id = f"santafe-{re.sub(r'[^0-9A-Za-z]+', '_', nro)}"
+                accounts.append((acc["title"], nro, acc_id, all_lines, all_pages))
+        else:
+            accounts.append(("CUENTA", "s/n", "generica-unica", all_lines, all_pages))
+
+    elif bank_name == "Banco de la Nación Argentina":
+        meta = bna_extract_meta(None, pages=page_texts(pairs))
+        txt = txt or "\n".join(all_lines)
+        nro = meta.get("account_number") or "s/n"
+        acc_id = f"bna-{re.sub(r'[^0-9A-Za-z]+', '_', nro)}"
+        # Extras BNA -> integrados al Resumen Operativo (por ahora solo se leen)
+        meta["gastos_finales"] = bna_extract_gastos_finales(txt)
+        info["meta"] = meta
+        accounts.append(("CUENTA (BNA)", nro, acc_id, all_lines, all_pages))
+
+    else:
+        # Desconocido: procesar genérico
+        accounts.append(("CUENTA", "s/n", "generica-unica", all_lines, all_pages))
+
+    # la segmentación y los metadatos usan títulos / encabezados como delimitadores: la plantilla se saca después
+    template, removed = find_template_lines(pairs)
+    if template:
+        accounts = [(t, n, a, *drop_template_lines(lines, pages, template)) for t, n, a, lines, pages in accounts]
+    info["plantilla"] = {"lineas": len(pairs), "quitadas": removed, "distintas": len(template)}
+    return info, accounts
+
+
+# Las cuentas son independientes: con varias (Macro trae hasta ~15) se calculan en un pool de procesos
+# y se devuelven en el orden original. Por debajo de PARALLEL_MIN_LINES el costo de mandar las líneas
+# y traer los DataFrames supera lo que se gana.
+ACCOUNT_WORKERS = min(4, os.cpu_count() or 1)
+PARALLEL_MIN_LINES = 2000
+
+_account_pool = None
+_account_pool_lock = threading.Lock()
+
+
+def account_pool(workers: int = ACCOUNT_WORKERS) -> ProcessPoolExecutor:
+    """Pool de procesos para las cuentas, compartido por todo el proceso (se crea al primer uso)."""
+    global _account_pool
+    with _account_pool_lock:
+        if _account_pool is None:
+            # spawn: Streamlit corre con hilos y fork copiaría locks tomados
+            _account_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _account_pool
+
+
+def map_accounts(slug: str, items: list, workers: int | None = None, progress=None) -> list:
+    """
+    account_stages sobre cada (lines, pages, mov) de `items`, en paralelo si conviene.
+    Devuelve [(partes, segundos)] en el mismo orden que `items`.
+    """
+    global _account_pool
+    workers = ACCOUNT_WORKERS if workers is None else workers
+    n = len(items)
+    if workers > 1 and n > 1 and sum(len(it[0]) for it in items) >= PARALLEL_MIN_LINES:
+        # las más largas primero: el tiempo total queda cerca del de la cuenta más grande
+        order = sorted(range(n), key=lambda i: -len(items[i][0]))
+        out = [None] * n
+        try:
+            pool = account_pool(workers)
+            futures = {pool.submit(account_stages, slug, *items[i]): i for i in order}
+            for done, fut in enumerate(as_completed(futures), start=1):
+                out[futures[fut]] = fut.result()
+                if progress:
+                    progress("Calculando cuentas", done, n)
+            return out
+        except BrokenProcessPool:
+            # un worker murió (memoria, señal): se descarta el pool y esta corrida sigue en serie
+            with _account_pool_lock:
+                _account_pool = None
+    out = []
+    for i, (lines, pages, mov) in enumerate(items, start=1):
+        out.append(account_stages(slug, lines, pages, mov))
+        if progress:
+            progress("Calculando cuentas", i, n)
+    return out
+
+
+def compute_accounts(slug: str, accounts: list, progress=None, workers: int | None = None) -> list:
+    """Cada cuenta calculada ({titulo, nro, acc_id, report, segundos}), en el orden de `accounts`."""
+    results = map_accounts(slug, [(lines, pages, None) for _, _, _, lines, pages in accounts], workers, progress)
+    return [
+        {"titulo": titulo, "nro": nro, "acc_id": acc_id,
+         "report": {**parts["resumenes"], **parts["exportes"]}, "segundos": sum(secs.values())}
+        for (titulo, nro, acc_id, _, _), (parts, secs) in zip(accounts, results)
+    ]
+
+
+def process_statement(data, bank_name: str, txt: str = "", progress=None, workers: int | None = None) -> dict:
+    """
+    Extrae las líneas del PDF una sola vez, segmenta en cuentas según el banco y calcula cada una.
+    Devuelve {'bank_slug', 'notice', 'caption', 'meta', 'accounts': [{titulo, nro, acc_id, report}], 'cache'}.
+    `workers` va a compute_accounts: 1 calcula en proceso (lo que corre dentro de otro pool, como el servicio).
+    """
+    slug = bank_slug(bank_name)
+    counts = {"hits": 0, "misses": 0}
+    pairs = extract_all_lines(pdf_source(data), progress=progress, counts=counts)
+    info, accounts = split_statement(bank_name, pairs, txt)
+    return {"bank_slug": slug, **info, "accounts": compute_accounts(slug, accounts, progress=progress, workers=workers),
+            "cache": counts}
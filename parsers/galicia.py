@@ -1,6 +1,7 @@
 
 import re
 from .utils import ar_to_float, normalize_whitespace, concilia, build_df
+from .core import parse_dates, statement_period
 
 def parse_galicia(pages_text: list[str]):
     # Galicia: débitos como negativos a la izquierda en el propio extracto
@@ -40,6 +41,8 @@ def parse_galicia(pages_text: list[str]):
 
     ok, calculado, diff = concilia(saldo_inicial, total_creditos, total_debitos, saldo_pdf)
     df = build_df(rows)
+    # "dd/mm" sin año: el año sale del período / cierre del resumen
+    df["fecha"] = parse_dates(df["fecha"], statement_period(full.splitlines()))
     resumen = {
         "saldo_inicial": saldo_inicial,
         "total_creditos": total_creditos,
@@ -1,9 +1,12 @@
 import pandas as pd
 import numpy as np
 from .common import (
-    MONEY_RE, DATE_RE, extract_all_lines, normalize_money, normalize_desc,
-    find_saldo_final_from_lines, find_saldo_anterior_from_lines, clasificar
+    extract_all_lines, normalize_desc,
+    find_saldo_final_from_lines, find_saldo_anterior_from_lines,
 )
+from .core import parse_dates, statement_period
+from .reglas import clasificar  # misma tabla de reglas que usa la app
+from .tokens import amounts, dates
 
 def santander_cut_before_detalle(all_lines: list[str]) -> list[str]:
     cut = len(all_lines)
@@ -13,7 +16,7 @@ def santander_cut_before_detalle(all_lines: list[str]) -> list[str]:
             break
     return all_lines[:cut]
 
-def parse_lines_generic(lines) -> pd.DataFrame:
+def parse_lines_generic(lines, periodo=None) -> pd.DataFrame:
     rows = []; seq = 0
     for ln in lines:
         s = (ln or "").strip()
@@ -22,26 +25,30 @@ def parse_lines_generic(lines) -> pd.DataFrame:
         # Excluir headers comunes
         if ("FECHA" in s.upper() and ("SALDO" in s.upper() or "DÉBITO" in s.upper() or "DEBITO" in s.upper())):
             pass  # no return; dejar pasar si tiene montos
-        am = list(MONEY_RE.finditer(s))
+        am = amounts(s)
         if len(am) < 2:
             continue
-        d = DATE_RE.search(s)
-        if not d or d.end() >= am[0].start():
+        d = dates(s)
+        if not d or d[0].end >= am[0].start:
             continue
+        d = d[0]
 
-        saldo = normalize_money(am[-1].group(0))
-        monto = normalize_money(am[-2].group(0))
-        desc  = s[d.end(): am[0].start()].strip()
+        saldo = am[-1].value
+        monto = am[-2].value
+        desc  = s[d.end: am[0].start].strip()
         seq += 1
         rows.append({
-            "fecha": pd.to_datetime(d.group(0), dayfirst=True, errors="coerce"),
+            "fecha": d.text,  # se convierten todas juntas al final
             "descripcion": desc,
             "origen": None,
             "desc_norm": normalize_desc(desc),
             "debito": 0.0, "credito": 0.0,
             "importe": 0.0, "monto_pdf": monto, "saldo": saldo, "orden": seq
         })
-    return pd.DataFrame(rows)
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df["fecha"] = parse_dates(df["fecha"], periodo)
+    return df
 
 def parse_pdf_generico(bank_name: str, file_like, maybe_lines: list[str] | None = None):
     if maybe_lines is None:
@@ -49,7 +56,7 @@ def parse_pdf_generico(bank_name: str, file_like, maybe_lines: list[str] | None
     else:
         lines = maybe_lines
 
-    df = parse_lines_generic(lines).sort_values(["fecha","orden"]).reset_index(drop=True)
+    df = parse_lines_generic(lines, statement_period(lines)).sort_values(["fecha","orden"]).reset_index(drop=True)
 
     # saldo final e inicial
     fecha_cierre, saldo_final_pdf = find_saldo_final_from_lines(lines)
@@ -0,0 +1,203 @@
+"""
+Corpus dorado: volcados de líneas anonimizados por banco + resultados esperados + presupuesto de tiempo/memoria.
+
+    python -m parsers.golden run [DIR]                              # corre todos los casos (exit 1 si alguno falla)
+    python -m parsers.golden record PDF --case NOMBRE [--bank ...]  # crea un caso desde un PDF (anonimizado)
+    python -m parsers.golden update [DIR] [--case NOMBRE]           # acepta los resultados actuales como esperados
+
+Cada caso es un DIR/<nombre>.json.gz con {case, bank, lines: [[página, línea]], budget, expected}.
+Se comparan segmentación, movimientos (digest), clasificación, saldos, conciliación y Resumen Operativo.
+"""
+import argparse, gzip, hashlib, io, json, re, sys, time, tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import core
+
+GOLDEN_DIR = Path(__file__).resolve().parent.parent / "golden"
+
+# Presupuestos por banco (segundos de reloj / MB de pico de memoria Python) si el caso no trae uno propio
+BANK_BUDGETS = {
+    "Banco Macro": {"seconds": 3.0, "mem_mb": 96},
+    "Banco de Santa Fe": {"seconds": 3.0, "mem_mb": 96},
+    "Banco de la Nación Argentina": {"seconds": 2.0, "mem_mb": 64},
+}
+DEFAULT_BUDGET = {"seconds": 3.0, "mem_mb": 96}
+
+# corridas de dígitos largas (cuentas, CBU, CUIT, comprobantes) que no sean la parte entera de un importe
+_LONG_DIGITS_RE = re.compile(r"\d{6,}(?!\s?,\s?\d{2}(?!\d))")
+
+
+# ---------- anonimización ----------
+def anonymize_line(ln: str, salt: str = "") -> str:
+    """Reemplaza cada corrida de 6+ dígitos por otra del mismo largo, determinística (mismo número -> mismo reemplazo)."""
+    def repl(m):
+        digest = hashlib.sha256((salt + m.group(0)).encode()).hexdigest()
+        digits = "".join(str(int(c, 16) % 10) for c in digest)
+        return (digits * (len(m.group(0)) // len(digits) + 1))[:len(m.group(0))]
+    return _LONG_DIGITS_RE.sub(repl, ln)
+
+
+# ---------- corrida ----------
+def run_pipeline(bank: str, pairs: list, workers: int = 1) -> dict:
+    """
+    split_statement + compute_accounts. Por defecto las cuentas se calculan en este proceso: el tiempo
+    no incluye levantar el pool y tracemalloc ve toda la memoria (en los workers no mide nada).
+    """
+    slug = core.bank_slug(bank)
+    info, accounts = core.split_statement(bank, pairs)
+    return {"bank_slug": slug, **info, "accounts": core.compute_accounts(slug, accounts, workers=workers)}
+
+
+def _r(x):
+    return None if x is None or (isinstance(x, float) and np.isnan(x)) else round(float(x), 2)
+
+
+def movements_digest(df: pd.DataFrame) -> str:
+    cols = ["fecha", "descripcion", "debito", "credito", "saldo", "Clasificación"]
+    t = df[cols].copy()
+    t["fecha"] = t["fecha"].dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+    for c in ("debito", "credito", "saldo"):
+        t[c] = t[c].round(2).map("{:.2f}".format)
+    return hashlib.sha256(t.to_csv(index=False).encode()).hexdigest()[:16]
+
+
+def summarize(result: dict) -> dict:
+    """Lo que se compara contra el resultado dorado (números redondeados al centavo)."""
+    out = {"notice": result["notice"], "meta": result["meta"], "accounts": []}
+    for acc in result["accounts"]:
+        rep = acc["report"]
+        s = {
+            "titulo": acc["titulo"], "nro": acc["nro"],
+            "saldo_inicial": _r(rep["saldo_inicial"]),
+            "total_debitos": _r(rep["total_debitos"]),
+            "total_creditos": _r(rep["total_creditos"]),
+            "saldo_final_visto": _r(rep["saldo_final_visto"]),
+            "diferencia": _r(rep["diferencia"]),
+            "cuadra": bool(rep["cuadra"]),
+            "fecha_cierre": rep["fecha_cierre"].strftime("%d/%m/%Y") if pd.notna(rep["fecha_cierre"]) else None,
+        }
+        if not rep["empty"]:
+            df = rep["df"]
+            s["movimientos"] = int(len(df))
+            s["digest"] = movements_digest(df)
+            g = df.groupby("Clasificación", sort=True, observed=True)
+            s["clasificacion"] = {k: [int(n), _r(d), _r(c)] for k, n, d, c in zip(
+                g.size().index, g.size(), g["debito"].sum(), g["credito"].sum())}
+            s["resumen"] = {k: _r(v) for k, v in rep["resumen"].items()}
+            s["quiebres"] = int(len(rep["quiebres"]))
+        out["accounts"].append(s)
+    return out
+
+
+def measure(bank: str, pairs: list) -> tuple[dict, float, float]:
+    """Corre el pipeline dos veces: una para el tiempo, otra bajo tracemalloc para el pico de memoria."""
+    t0 = time.perf_counter()
+    result = run_pipeline(bank, pairs)
+    seconds = time.perf_counter() - t0
+    tracemalloc.start()
+    try:
+        run_pipeline(bank, pairs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return summarize(result), seconds, peak / 2**20
+
+
+def _diff(expected, actual, path="") -> list[str]:
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        out = []
+        for k in sorted(set(expected) | set(actual), key=str):
+            out += _diff(expected.get(k), actual.get(k), f"{path}.{k}" if path else str(k))
+        return out
+    if isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        out = []
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            out += _diff(e, a, f"{path}[{i}]")
+        return out
+    return [] if expected == actual else [f"{path}: esperado {expected!r}, obtenido {actual!r}"]
+
+
+# ---------- casos ----------
+def load_case(path: Path) -> dict:
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_case(path: Path, case: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        json.dump(case, fh, ensure_ascii=False, separators=(",", ":"))
+
+
+def case_paths(directory: Path, name: str | None = None) -> list[Path]:
+    return sorted(directory.glob(f"{name or '*'}.json.gz"))
+
+
+def run_case(case: dict) -> list[str]:
+    """Lista de fallas (vacía si el caso pasa)."""
+    pairs = [tuple(p) for p in case["lines"]]
+    actual, seconds, mem_mb = measure(case["bank"], pairs)
+    budget = case.get("budget") or BANK_BUDGETS.get(case["bank"], DEFAULT_BUDGET)
+    fails = _diff(case["expected"], actual)
+    if seconds > budget["seconds"]:
+        fails.append(f"tiempo {seconds:.2f}s > presupuesto {budget['seconds']}s")
+    if mem_mb > budget["mem_mb"]:
+        fails.append(f"memoria {mem_mb:.1f} MB > presupuesto {budget['mem_mb']} MB")
+    print(f"{'OK  ' if not fails else 'FALLA'} {case['case']:<32} {case['bank']:<30} {seconds:6.2f}s {mem_mb:7.1f} MB")
+    return fails
+
+
+def cmd_run(args) -> int:
+    paths = case_paths(Path(args.dir), args.case)
+    if not paths:
+        print(f"No hay casos en {args.dir}")
+        return 1
+    failed = 0
+    for p in paths:
+        fails = run_case(load_case(p))
+        for f in fails[:20]:
+            print(f"      {f}")
+        failed += bool(fails)
+    print(f"{len(paths) - failed}/{len(paths)} caso(s) OK")
+    return 1 if failed else 0
+
+
+def cmd_record(args) -> int:
+    data = Path(args.pdf).read_bytes()
+    bank = args.bank or core.detect_bank_from_text(core.read_statement_text(data))
+    pairs = [(p, anonymize_line(l, args.salt)) for p, l in core.extract_all_lines(io.BytesIO(data))]
+    expected, seconds, mem_mb = measure(bank, pairs)
+    case = {"case": args.case, "bank": bank, "lines": [list(p) for p in pairs], "budget": None, "expected": expected}
+    save_case(Path(args.dir) / f"{args.case}.json.gz", case)
+    print(f"Caso {args.case} ({bank}): {len(pairs)} línea(s), {len(expected['accounts'])} cuenta(s), {seconds:.2f}s, {mem_mb:.1f} MB")
+    return 0
+
+
+def cmd_update(args) -> int:
+    for p in case_paths(Path(args.dir), args.case):
+        case = load_case(p)
+        case["expected"], _, _ = measure(case["bank"], [tuple(x) for x in case["lines"]])
+        save_case(p, case)
+        print(f"Actualizado {case['case']}")
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m parsers.golden", description="Corpus dorado de resúmenes bancarios")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run"); r.add_argument("dir", nargs="?", default=str(GOLDEN_DIR)); r.add_argument("--case")
+    r.set_defaults(fn=cmd_run)
+    rec = sub.add_parser("record"); rec.add_argument("pdf"); rec.add_argument("--case", required=True)
+    rec.add_argument("--bank"); rec.add_argument("--dir", default=str(GOLDEN_DIR)); rec.add_argument("--salt", default="")
+    rec.set_defaults(fn=cmd_record)
+    u = sub.add_parser("update"); u.add_argument("dir", nargs="?", default=str(GOLDEN_DIR)); u.add_argument("--case")
+    u.set_defaults(fn=cmd_update)
+    args = ap.parse_args(argv)
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
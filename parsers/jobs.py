@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from .core import value_memory
+
+# Trabajos en segundo plano para PDFs largos: el script de Streamlit solo consulta el avance,
+# así un rerun (o cualquier interacción) no corta ni reinicia el procesamiento.
+# JOBS es uno por proceso y lo comparten todas las sesiones: como mucho MAX_WORKERS extracciones
+# pesadas corren a la vez y el resto espera en cola. Sale primero el PDF con menos páginas; la espera
+# lo va adelantando (AGING_S_PER_PAGE) para que uno grande no quede esperando para siempre.
+MAX_WORKERS = 2
+MAX_JOBS = 32
+MAX_BYTES = 256 * 2**20  # resultados de trabajos terminados (core.value_memory)
+AGING_S_PER_PAGE = 0.2   # cada 0,2 s en cola cuenta como una página menos
+METRICS_WINDOW = 200     # trabajos terminados que entran en las métricas de espera / proceso
+
+
+class Job:
+    """Un trabajo en cola, en curso o terminado; `progress` lo actualiza el worker página a página."""
+
+    def __init__(self, key, pages: int = 0):
+        self.key = key
+        self.pages = pages
+        self.stage = "En cola"
+        self.done_steps = 0
+        self.total_steps = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self.position = 0  # lugar en la cola (1 = el próximo); 0 si ya arrancó
+        self.bytes = 0     # tamaño del resultado, una vez terminado
+
+    def progress(self, stage: str, done: int, total: int):
+        self.stage, self.done_steps, self.total_steps = stage, done, total
+
+    @property
+    def fraction(self) -> float:
+        return min(self.done_steps / self.total_steps, 1.0) if self.total_steps else 0.0
+
+    @property
+    def wait_seconds(self) -> float:
+        return (self.started or time.time()) - self.created
+
+    @property
+    def run_seconds(self) -> float:
+        return ((self.finished or time.time()) - self.started) if self.started else 0.0
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+def _pct(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class JobManager:
+    """
+    Cola con prioridad + MAX_WORKERS hilos + registro de trabajos por clave (reusa el trabajo si ya
+    existe). La prioridad es la cantidad de páginas menos lo esperado (ver AGING_S_PER_PAGE).
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_jobs: int = MAX_JOBS, max_bytes: int = MAX_BYTES):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._jobs = OrderedDict()
+        self._pending = []
+        self._running = 0
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._finished = deque(maxlen=METRICS_WINDOW)  # (segundos en cola, segundos de proceso)
+        self._completed = 0
+
+    def submit(self, key, fn, *args, pages: int = 0, **kwargs) -> Job:
+        """
+        Encola `fn(*args, progress=job.progress, **kwargs)` salvo que ya exista un trabajo con
+        esa clave (en cola, en curso o terminado), en cuyo caso devuelve ese. `pages` ordena la cola.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not (job.done() and job.future.exception() is not None):
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(key, pages)
+            job.future = Future()
+            job._call = (fn, args, kwargs)
+            self._pending.append(job)
+            self._jobs[key] = job
+            self._reorder()
+            if len(self._threads) < self.max_workers:
+                t = threading.Thread(target=self._worker, daemon=True, name=f"resumen-job-{len(self._threads)}")
+                self._threads.append(t)
+                t.start()
+            self._wake.notify()
+            self._evict()
+            return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def position(self, job: Job) -> int:
+        """Lugar actual de `job` en la cola (1 = el próximo en arrancar); 0 si ya arrancó o terminó."""
+        with self._lock:
+            if job.position:
+                self._reorder()
+            return job.position
+
+    def metrics(self) -> dict:
+        """Cola y tiempos de los últimos METRICS_WINDOW trabajos: espera en cola vs procesamiento."""
+        with self._lock:
+            waits = [w for w, _ in self._finished]
+            runs = [r for _, r in self._finished]
+            oldest = min((j.created for j in self._pending), default=None)
+            return {
+                "en_cola": len(self._pending),
+                "en_curso": self._running,
+                "workers": self.max_workers,
+                "terminados": self._completed,
+                "trabajos": len(self._jobs),
+                "bytes": self.bytes,
+                "espera_max_actual": time.time() - oldest if oldest else 0.0,
+                "espera_promedio": sum(waits) / len(waits) if waits else 0.0,
+                "espera_p95": _pct(waits, 0.95),
+                "proceso_promedio": sum(runs) / len(runs) if runs else 0.0,
+                "proceso_p95": _pct(runs, 0.95),
+            }
+
+    # ---------- internos (con self._lock tomado) ----------
+    def _reorder(self):
+        now = time.time()
+        self._pending.sort(key=lambda j: (j.pages - (now - j.created) / AGING_S_PER_PAGE, j.created))
+        for i, j in enumerate(self._pending, start=1):
+            j.position = i
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wake.wait()
+                self._reorder()
+                job = self._pending.pop(0)
+                job.position = 0
+                self._reorder()
+                self._running += 1
+            if job.future.set_running_or_notify_cancel():
+                fn, args, kwargs = job._call
+                job.started = time.time()
+                result = error = None
+                try:
+                    result = fn(*args, progress=job.progress, **kwargs)
+                except BaseException as e:
+                    error = e
+                if error is None:
+                    size = value_memory(result)
+                    with self._lock:  # antes de set_result: _evict solo descarta trabajos terminados
+                        job.bytes = size
+                        if self._jobs.get(job.key) is job:
+                            self.bytes += size
+                job.finished = time.time()
+                job._call = None
+                if error is not None:
+                    job.future.set_exception(error)
+                else:
+                    job.future.set_result(result)
+            with self._lock:
+                self._running -= 1
+                if job.started:
+                    self._finished.append((job.started - job.created, job.finished - job.started))
+                    self._completed += 1
+                self._evict(keep=job)
+
+    def _evict(self, keep: Job | None = None):
+        # se descartan primero los trabajos terminados más viejos; `keep` (el que recién terminó) queda
+        # aunque solo pase de max_bytes, así la sesión que lo espera lo encuentra en el próximo rerun
+        for k in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs and self.bytes <= self.max_bytes:
+                break
+            job = self._jobs[k]
+            if job is not keep and job.done():
+                self.bytes -= job.bytes
+                del self._jobs[k]
+
+
+JOBS = JobManager()
@@ -0,0 +1,129 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+from pdfminer.pdftypes import PDFStream, resolve1
+from pdfminer.psparser import PSLiteral
+
+# Caché de líneas por página, compartida por todo el proceso (sobrevive a los reruns de Streamlit).
+# La clave es la huella del contenido crudo de la página: si el mismo extracto se vuelve a subir
+# (o se sube con una página agregada) solo se analizan las páginas nuevas.
+MAX_PAGES = 20000
+
+
+def _stream_bytes(obj) -> bytes:
+    obj = resolve1(obj)
+    if not isinstance(obj, PDFStream):
+        return b""
+    # rawdata = bytes tal como están en el PDF (sin descomprimir); si ya se decodificó, usamos data
+    if obj.rawdata is not None:
+        return obj.rawdata
+    return obj.data or b""
+
+
+def _hash_resources(h, resources, depth: int = 0):
+    """
+    El texto extraído depende también de las fuentes (ToUnicode / Encoding): dos PDFs distintos
+    pueden usar los mismos códigos de glifo con otro mapeo. Se incluyen en la huella, y los
+    Form XObjects (que pueden dibujar texto) se recorren con profundidad acotada.
+    """
+    resources = resolve1(resources)
+    if not isinstance(resources, dict) or depth > 3:
+        return
+    fonts = resolve1(resources.get("Font")) or {}
+    if isinstance(fonts, dict):
+        for name in sorted(fonts, key=str):
+            font = resolve1(fonts[name])
+            if not isinstance(font, dict):
+                continue
+            h.update(str(name).encode())
+            base = resolve1(font.get("BaseFont"))
+            h.update((base.name if isinstance(base, PSLiteral) else str(base)).encode("utf-8", "replace"))
+            enc = resolve1(font.get("Encoding"))
+            if isinstance(enc, dict):
+                h.update(repr(resolve1(enc.get("Differences"))).encode("utf-8", "replace"))
+            elif enc is not None:
+                h.update(str(enc).encode("utf-8", "replace"))
+            h.update(_stream_bytes(font.get("ToUnicode")))
+    xobjs = resolve1(resources.get("XObject")) or {}
+    if isinstance(xobjs, dict):
+        for name in sorted(xobjs, key=str):
+            xo = resolve1(xobjs[name])
+            if isinstance(xo, PDFStream) and getattr(resolve1(xo.attrs.get("Subtype")), "name", None) == "Form":
+                h.update(str(name).encode())
+                h.update(_stream_bytes(xo))
+                _hash_resources(h, xo.attrs.get("Resources"), depth + 1)
+
+
+def page_fingerprint(page, *params) -> str:
+    """
+    Huella de una página de pdfplumber a partir de su content stream crudo, sus fuentes,
+    su geometría y los parámetros de extracción (`params`). No hace análisis de layout.
+    """
+    po = page.page_obj
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((tuple(po.mediabox), tuple(po.cropbox), po.rotate, params)).encode())
+    for ref in po.contents:
+        h.update(_stream_bytes(ref))
+    _hash_resources(h, po.resources)
+    return h.hexdigest()
+
+
+class PageLinesCache:
+    """LRU acotado huella → tupla de líneas, seguro entre hilos, con contadores de aciertos."""
+
+    def __init__(self, max_pages: int = MAX_PAGES):
+        self.max_pages = max_pages
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0  # aproximado: str + tupla de cada página guardada
+
+    @staticmethod
+    def _size(lines: tuple) -> int:
+        return sys.getsizeof(lines) + sum(sys.getsizeof(l) for l in lines)
+
+    def get(self, key):
+        with self._lock:
+            lines = self._data.get(key)
+            if lines is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return lines
+
+    def put(self, key, lines):
+        with self._lock:
+            lines = tuple(lines)
+            old = self._data.get(key)
+            if old is not None:
+                self.bytes -= self._size(old)
+            self._data[key] = lines
+            self.bytes += self._size(lines)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_pages:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= self._size(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "pages": len(self._data),
+                "bytes": self.bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+            self.bytes = 0
+
+
+PAGE_CACHE = PageLinesCache()
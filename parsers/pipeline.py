@@ -0,0 +1,216 @@
+"""
+Pipeline por etapas con memoización: cada etapa guarda su salida por la clave de sus entradas, así que
+cambiar una opción solo recalcula las etapas que dependen de ella.
+
+    bytes → páginas → líneas → cuentas → (por cuenta) movimientos → clasificados → resúmenes → exportes
+
+Claves:
+    páginas / texto      hash del PDF
+    líneas               hash del PDF + perfil de extracción (backends.DEFAULT_PROFILE)
+    cuentas              clave de las líneas + banco
+    movimientos          hash del contenido del bloque de la cuenta (líneas + páginas)
+    clasificados         movimientos + slug del banco + versión de la tabla de reglas
+    resúmenes / exportes clasificados
+
+Las claves por contenido hacen que forzar otro banco que segmenta igual, o volver al banco anterior,
+reutilice todo lo de abajo. run_statement devuelve lo mismo que core.process_statement más 'trace':
+una fila por etapa con 'recalculada' y los segundos. Las cuentas que hay que recalcular se calculan
+juntas en el pool de core.map_accounts; cada cuenta devuelta trae además 'segundos' (lo que tardó).
+"""
+import hashlib, threading, time
+from collections import OrderedDict
+
+from . import core
+from .backends import DEFAULT_PROFILE, _profile_key
+from .reglas import RULES
+
+MAX_ENTRIES = 512
+MAX_BYTES = 256 * 2**20  # aproximado (core.value_memory): lo que se pase se descarta del más viejo
+
+
+def content_key(*parts) -> str:
+    """Huella corta de líneas / páginas / parámetros (lo que identifica la entrada de una etapa)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (list, tuple)):
+            h.update("\n".join(map(str, part)).encode("utf-8", "surrogatepass"))
+        else:
+            h.update(str(part).encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class StageCache:
+    """LRU acotado (etapa, clave) → salida, compartido por todas las sesiones del proceso."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, self._data[key]
+
+    def put(self, key, value):
+        size = core.value_memory(value)  # fuera del lock: recorre DataFrames
+        with self._lock:
+            self.bytes += size - self._sizes.get(key, 0)
+            self._data[key] = value
+            self._sizes[key] = size
+            self._data.move_to_end(key)
+            # la entrada recién guardada queda aunque sola pase de max_bytes
+            while len(self._data) > self.max_entries or (self.bytes > self.max_bytes and len(self._data) > 1):
+                evicted, _ = self._data.popitem(last=False)
+                self.bytes -= self._sizes.pop(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._data), "bytes": self.bytes}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.hits = self.misses = self.bytes = 0
+
+
+STAGES = StageCache()
+
+
+class Run:
+    """Una corrida del pipeline: memoiza cada etapa en `cache` y anota en `trace` qué se recalculó."""
+
+    def __init__(self, cache: StageCache = STAGES):
+        self.cache = cache
+        self.trace = []
+
+    def stage(self, name: str, key: str, fn, *args, cuenta: str | None = None, **kwargs):
+        hit, value = self.cache.get((name, key))
+        t0 = time.perf_counter()
+        if not hit:
+            value = fn(*args, **kwargs)
+            self.cache.put((name, key), value)
+        self.trace.append({
+            "etapa": name, "cuenta": cuenta, "clave": key[:10],
+            "recalculada": not hit, "segundos": time.perf_counter() - t0,
+        })
+        return value
+
+
+# ---------- Etapas ----------
+def statement_pages(run: Run, data, doc_key: str) -> dict:
+    """Páginas: pre-chequeo de texto / imagen por página (core.preflight_pdf)."""
+    return run.stage("paginas", doc_key, core.preflight_pdf, data)
+
+
+def statement_text(run: Run, data, doc_key: str, progress=None) -> str:
+    return run.stage("texto", doc_key, core.read_statement_text, data, progress=progress)
+
+
+def run_text(data, doc_key: str, progress=None, cache: StageCache = STAGES) -> dict:
+    """
+    La etapa texto en una corrida propia: {'texto', 'trace'}. Es lo que se encola en JOBS (que sobrevive
+    a los reruns y lo comparten las sesiones), así el trabajo no retiene la Run de quien lo pidió.
+    """
+    run = Run(cache)
+    return {"texto": statement_text(run, data, doc_key, progress=progress), "trace": run.trace}
+
+
+def account_keys(slug: str, lines: list[str], pages: list[int] | None) -> dict:
+    """Clave de cada etapa por cuenta (ver el encabezado del módulo)."""
+    k_mov = content_key(lines, pages or ())
+    k_cls = content_key(k_mov, slug, RULES.version)
+    return {"movimientos": k_mov, "clasificados": k_cls, "resumenes": k_cls, "exportes": k_cls}
+
+
+def run_accounts(run: Run, slug: str, accounts: list, progress=None, workers: int | None = None) -> list:
+    """
+    Las etapas por cuenta: primero se buscan en la memo y las cuentas con etapas faltantes se calculan
+    juntas con core.map_accounts (en paralelo si conviene). Si solo cambió la tabla de reglas, los
+    movimientos memoizados viajan al worker y se arranca desde la clasificación.
+    Devuelve las cuentas en el orden original, con el dict de core.compute_account_report y los segundos.
+    """
+    plans = []
+    for titulo, nro, acc_id, lines, pages in accounts:
+        keys, memo = account_keys(slug, lines, pages), {}
+        for name in core.ACCOUNT_STAGES:
+            hit, value = run.cache.get((name, keys[name]))
+            if not hit:
+                break
+            memo[name] = value
+        plans.append((keys, memo))
+    todo = [i for i, (_, memo) in enumerate(plans) if len(memo) < len(core.ACCOUNT_STAGES)]
+    computed = dict(zip(todo, core.map_accounts(
+        slug, [(accounts[i][3], accounts[i][4], plans[i][1].get("movimientos")) for i in todo], workers, progress)))
+
+    out = []
+    for i, ((titulo, nro, acc_id, _, _), (keys, memo)) in enumerate(zip(accounts, plans)):
+        parts, secs = computed.get(i, ({}, {}))
+        for name in core.ACCOUNT_STAGES:
+            recalc = name in parts
+            if recalc:
+                run.cache.put((name, keys[name]), parts[name])
+            run.trace.append({
+                "etapa": name, "cuenta": nro, "clave": keys[name][:10],
+                "recalculada": recalc, "segundos": secs.get(name, 0.0),
+            })
+        parts = {**memo, **parts}
+        out.append({
+            "titulo": titulo, "nro": nro, "acc_id": acc_id,
+            "report": {**parts["resumenes"], **parts["exportes"]}, "segundos": sum(secs.values()),
+        })
+    return out
+
+
+def run_statement(data, bank_name: str, txt: str = "", progress=None, doc_key: str | None = None,
+                  cache: StageCache = STAGES) -> dict:
+    """
+    Igual que core.process_statement, por etapas memoizadas. `data`: bytes o un parsers.spool.SpoolHandle
+    (su `key` es el hash). `doc_key` (hash del PDF) evita volver a hashear los bytes si el llamador ya lo tiene.
+    """
+    run = Run(cache)
+    doc_key = doc_key or getattr(data, "key", None) or hashlib.sha1(data).hexdigest()
+    slug = core.bank_slug(bank_name)
+    counts = {"hits": 0, "misses": 0}  # de esta corrida; 0/0 si las líneas salen de la memo
+
+    prof = DEFAULT_PROFILE
+    k_lines = content_key(doc_key, _profile_key(prof))
+    pairs = run.stage("lineas", k_lines, core.extract_all_lines, core.pdf_source(data), progress=progress,
+                      profile=prof, counts=counts)
+    info, accounts = run.stage("cuentas", content_key(k_lines, bank_name), core.split_statement, bank_name, pairs, txt)
+
+    out_accounts = run_accounts(run, slug, accounts, progress=progress)
+
+    return {"bank_slug": slug, **info, "accounts": out_accounts, "cache": counts, "trace": run.trace}
+
+
+def trace_summary(trace: list) -> str:
+    """'líneas ✓ · cuentas ↻ 3 ms · ...': ✓ = memo, ↻ = recalculada (las etapas por cuenta se agrupan)."""
+    order, agg = [], {}
+    for t in trace:
+        if t["etapa"] not in agg:
+            order.append(t["etapa"])
+            agg[t["etapa"]] = [0, 0, 0.0]
+        a = agg[t["etapa"]]
+        a[0] += 1
+        a[1] += t["recalculada"]
+        a[2] += t["segundos"]
+    parts = []
+    for name in order:
+        n, recalc, secs = agg[name]
+        if not recalc:
+            parts.append(f"{name} ✓")
+        else:
+            parts.append(f"{name} ↻{f' {recalc}/{n}' if n > 1 else ''} {secs * 1000:.0f} ms")
+    return " · ".join(parts)
@@ -0,0 +1,443 @@
+"""
+Clasificación de movimientos por tabla de reglas (parsers/reglas_clasificacion.json).
+
+Cada regla es un dict con:
+    clase       la Clasificación que asigna
+    prioridad   mayor gana; a igual prioridad, gana la que aparece antes en el archivo
+    lado        opcional: "debito" o "credito" (el movimiento tiene que tener importe de ese lado)
+    banco       opcional: slug del banco ("macro", "santafe", "nacion", ...)
+    texto       patrón que tiene que aparecer en la descripción o en la descripción normalizada
+    desc        patrón sobre la descripción tal como vino del PDF
+    norm        patrón sobre la descripción normalizada
+    previo      patrón sobre la descripción normalizada del movimiento anterior
+Los patrones son regex sobre el texto en mayúsculas; una lista de patrones exige que estén todos.
+Todas las condiciones presentes tienen que cumplirse. Una regla sin patrones es un valor por defecto.
+
+Las reglas se agrupan por contexto (banco, lado). Cada una trae un literal obligatorio sacado de sus
+patrones: se buscan los literales en la fila (`in`, sin regex) y solo las reglas cuyo literal aparece,
+más las que no tienen ninguno, se confirman con su regex, en orden de prioridad. El archivo se relee
+solo si cambió (se revisa a lo sumo una vez por segundo).
+
+    python -m parsers.reglas check          # valida la tabla
+    python -m parsers.reglas bench [--rows N]  # compara contra la cadena de if original (por fila y por df)
+"""
+import argparse, json, re, sys, threading, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RULES_PATH = Path(__file__).resolve().parent / "reglas_clasificacion.json"
+RELOAD_INTERVAL = 1.0
+LADOS = ("debito", "credito")
+
+# El texto que se evalúa es DESC, NORM y PREVIO separados por "\n\0": ni `.` (no toma \n)
+# ni `\s` (no toma \0) pueden hacer que un patrón cruce de un campo a otro
+SEP = "\n\0"
+_CAMPOS = {
+    "desc":   r"[^\n]*?(?:{})",
+    "norm":   r"[^\n]*\n\0[^\n]*?(?:{})",
+    "previo": r"[^\n]*\n\0[^\n]*\n\0[^\n]*?(?:{})",
+    "texto":  r"(?:[^\n]*?(?:{0})|[^\n]*\n\0[^\n]*?(?:{0}))",
+}
+
+
+def _as_list(v) -> list:
+    return v if isinstance(v, list) else [v]
+
+
+def _literales(pat: str) -> tuple[tuple | None, bool]:
+    """
+    Un literal por alternativa de primer nivel del patrón: alguno tiene que estar en el texto para que
+    el patrón matchee (None si no se puede asegurar: grupos, o una alternativa sin literal). El segundo
+    valor dice si el patrón es exactamente esa alternativa de literales (encontrar uno alcanza).
+    """
+    if "(" in pat or ")" in pat:
+        return None, False
+    ramas, cur, i, en_clase = [], [], 0, False
+    while i < len(pat):
+        c = pat[i]
+        if c == "\\" and i + 1 < len(pat):
+            cur.append(pat[i:i + 2]); i += 2; continue
+        if c == "[":
+            en_clase = True
+        elif c == "]":
+            en_clase = False
+        elif c == "|" and not en_clase:
+            ramas.append(cur); cur = []; i += 1; continue
+        cur.append(c); i += 1
+    ramas.append(cur)
+    out, exacto = [], True
+    for toks in ramas:
+        best, run, en_clase, en_llave = "", [], False, False
+        for t in toks:
+            if en_clase or en_llave:
+                en_clase = en_clase and t != "]"
+                en_llave = en_llave and t != "}"
+                continue
+            if t in "?*{":
+                run = run[:-1]  # el átomo anterior puede no estar
+            elif t.startswith("\\") and not t[1].isalnum():
+                run.append(t[1]); continue
+            elif t not in ".^$+[" and not t.startswith("\\"):
+                run.append(t); continue
+            best = max(best, "".join(run), key=len)
+            run, en_clase, en_llave, exacto = [], t == "[", t == "{", False
+        best = max(best, "".join(run), key=len)
+        if not best:
+            return None, False
+        out.append(best)
+    return tuple(out), exacto
+
+
+def load_rules(path: Path) -> list[dict]:
+    """Lee y valida la tabla; devuelve las reglas ordenadas por prioridad (estable)."""
+    with open(path, encoding="utf-8") as fh:
+        rules = json.load(fh)
+    if not isinstance(rules, list):
+        raise ValueError("la tabla de reglas tiene que ser una lista")
+    for i, r in enumerate(rules):
+        if not r.get("clase"):
+            raise ValueError(f"regla {i}: falta 'clase'")
+        if r.get("lado") not in (None, *LADOS):
+            raise ValueError(f"regla {i}: lado inválido {r.get('lado')!r}")
+        unknown = set(r) - {"clase", "prioridad", "lado", "banco", *_CAMPOS}
+        if unknown:
+            raise ValueError(f"regla {i}: campos desconocidos {sorted(unknown)}")
+        for campo in _CAMPOS:
+            for pat in _as_list(r.get(campo, [])):
+                try:
+                    re.compile(pat)
+                except re.error as e:
+                    raise ValueError(f"regla {i} ({r['clase']}): patrón {pat!r} inválido: {e}") from None
+    return sorted(rules, key=lambda r: -float(r.get("prioridad", 0)))
+
+
+def _trie_re(palabras) -> str:
+    """Alternativa de literales armada como trie: en cada posición prueba un carácter por rama y da el más largo."""
+    raiz = {}
+    for w in palabras:
+        nodo = raiz
+        for c in w:
+            nodo = nodo.setdefault(c, {})
+        nodo[""] = {}
+
+    def emitir(nodo):
+        alts = [re.escape(c) + emitir(sub) for c, sub in sorted(nodo.items()) if c]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in nodo else body
+
+    return emitir(raiz)
+
+
+class Matcher:
+    """
+    Las reglas aplicables a un contexto (banco, lados presentes), en orden de prioridad. Cada regla
+    es una regex de condiciones (lookaheads desde el inicio del texto) y, si se puede, un literal
+    obligatorio: el de la condición más selectiva (el literal más corto de sus alternativas, el más largo).
+    Una pasada de una regex con todos los literales da las reglas candidatas (cada búsqueda sigue desde
+    la posición siguiente al inicio del último hallazgo, así no se pierden literales solapados; en cada
+    posición sale el más largo y los que son prefijo suyo también están); la prioridad se resuelve
+    después, confirmando solo esas.
+    """
+
+    def __init__(self, rules: list[dict]):
+        self.clases = [r["clase"] for r in rules]
+        self.uses_prev = any("previo" in r for r in rules)
+        self._res, self._exactas, siempre, gates = [], set(), [], {}
+        for i, r in enumerate(rules):
+            conds = [(campo, pat) for campo in _CAMPOS for pat in _as_list(r.get(campo, []))]
+            self._res.append(re.compile("".join("(?=" + _CAMPOS[c].format(p) + ")" for c, p in conds)))
+            lits = [(c, *_literales(p)) for c, p in conds]
+            lits = [(c, ls, exacto) for c, ls, exacto in lits if ls]
+            if not lits:
+                siempre.append(i)
+                continue
+            if len(conds) == 1 and lits[0][2]:
+                self._exactas.add(i)  # una sola condición y es la lista de literales: no hace falta la regex
+            campo, ls, _ = max(lits, key=lambda x: min(map(len, x[1])))
+            for lit in ls:
+                gates.setdefault(lit, set()).add((i, campo))
+        self._siempre = siempre
+        # literal encontrado -> reglas de él y de los literales que son prefijo suyo
+        self._gates = {
+            lit: tuple(x for pre, rs in gates.items() if lit.startswith(pre) for x in rs) for lit in gates
+        }
+        self._scan = re.compile(_trie_re(gates)) if gates else None
+
+    def clase(self, u: str, n: str, prev: str = "") -> str:
+        prev = prev if self.uses_prev else ""
+        t = SEP.join((u, n, prev))
+        cands, hits = self._siempre, set()
+        if self._scan is not None:
+            fin_desc = len(u)
+            fin_norm = fin_desc + len(SEP) + len(n)
+            m = self._scan.search(t)
+            while m is not None:
+                pos = m.start()
+                en = "desc" if pos < fin_desc else "norm" if pos < fin_norm else "previo"
+                for i, campo in self._gates[m.group()]:
+                    if campo == en or (campo == "texto" and en != "previo"):
+                        hits.add(i)
+                m = self._scan.search(t, pos + 1)
+            if hits:
+                cands = sorted(hits.union(cands))
+        for i in cands:
+            if (i in hits and i in self._exactas) or self._res[i].match(t):
+                return self.clases[i]
+        return "Otros"
+
+
+class RuleTable:
+    """Tabla de reglas con recarga en caliente y un Matcher compilado por contexto."""
+
+    def __init__(self, path: Path = RULES_PATH):
+        self.path = Path(path)
+        self.rules = []
+        self.error = None
+        self._mtime = None
+        self._checked = 0.0
+        self._matchers = {}
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Recompila si el archivo cambió; si la tabla nueva es inválida se sigue usando la anterior."""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                mtime = self.path.stat().st_mtime_ns
+                if mtime == self._mtime:
+                    return
+                rules = load_rules(self.path)
+            except (OSError, ValueError) as e:
+                self.error = str(e)
+                return
+            self.rules, self._mtime, self.error = rules, mtime, None
+            self._matchers = {}
+
+    @property
+    def version(self):
+        """Cambia con cada tabla nueva cargada (clave para memoizar clasificaciones)."""
+        if time.monotonic() - self._checked > RELOAD_INTERVAL:
+            self.reload()
+        return self._mtime
+
+    def classes(self) -> list[str]:
+        """Clases que puede asignar la tabla, más 'Otros' (el valor por defecto)."""
+        if time.monotonic() - self._checked > RELOAD_INTERVAL:
+            self.reload()
+        return sorted({r["clase"] for r in self.rules} | {"Otros"})
+
+    def matcher(self, banco=None, deb: bool = False, cre: bool = False) -> Matcher:
+        if time.monotonic() - self._checked > RELOAD_INTERVAL:
+            self.reload()
+        key = (banco, deb, cre)
+        m = self._matchers.get(key)
+        if m is None:
+            rules = [
+                r for r in self.rules
+                if r.get("banco") in (None, banco)
+                and (r.get("lado") is None or (deb if r["lado"] == "debito" else cre))
+            ]
+            m = self._matchers[key] = Matcher(rules)
+        return m
+
+
+RULES = RuleTable()
+
+
+def clasificar(desc: str, desc_norm: str, deb: float, cre: float, banco=None, previo: str = "") -> str:
+    m = RULES.matcher(banco, bool(deb and deb != 0), bool(cre and cre != 0))
+    return m.clase((desc or "").upper(), (desc_norm or "").upper(), (previo or "").upper())
+
+
+def clasificar_df(df: pd.DataFrame, banco=None) -> pd.Series:
+    """
+    Clasificación de todos los movimientos (en el orden del df: 'previo' es la fila anterior).
+    Cada combinación distinta de descripción/contexto se evalúa una sola vez.
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    u = df["descripcion"].astype(str).str.upper().tolist()
+    n = df["desc_norm"].astype(str).str.upper().tolist()
+    prev = [""] + n[:-1]
+    deb = (df["debito"].fillna(1) != 0).tolist()
+    cre = (df["credito"].fillna(1) != 0).tolist()
+    memo, out = {}, []
+    for key in zip(u, n, prev, deb, cre):
+        c = memo.get(key)
+        if c is None:
+            m = RULES.matcher(banco, key[3], key[4])
+            if not m.uses_prev:
+                k2 = key[:2] + ("",) + key[3:]
+                c = memo.get(k2)
+                if c is None:
+                    c = memo[k2] = m.clase(key[0], key[1])
+            else:
+                c = m.clase(key[0], key[1], key[2])
+            memo[key] = c
+        out.append(c)
+    return pd.Series(out, index=df.index, dtype=object)
+
+
+# ---------- Benchmark ----------
+# Cadena de if que reemplaza la tabla (copia fiel, con el ajuste de Macro por fila anterior);
+# se usa solo como referencia de equivalencia y velocidad.
+_RE_PERCEP_RG2408 = re.compile(r"PERCEPCI[ÓO]N\s+IVA\s+RG\.?\s*2408", re.IGNORECASE)
+
+
+def _cadena_original(desc, desc_norm, deb, cre):
+    u = (desc or "").upper()
+    n = (desc_norm or "").upper()
+    if "SALDO ANTERIOR" in u or "SALDO ANTERIOR" in n:
+        return "SALDO ANTERIOR"
+    if any(k in u or k in n for k in ("LEY 25413", "IMPTRANS", "IMP.S/CREDS", "IMPDBCR 25413", "N/D DBCR 25413")):
+        return "LEY 25.413"
+    if "SIRCREB" in u or "SIRCREB" in n:
+        return "SIRCREB"
+    if _RE_PERCEP_RG2408.search(u) or _RE_PERCEP_RG2408.search(n):
+        return "Percepciones de IVA"
+    for s in (u, n):
+        if ("IVA PERC" in s) or ("IVA PERCEP" in s) or ("RG3337" in s) or \
+           (("RETEN" in s) and ("I.V.A" in s or "IVA" in s) and ("RG.2408" in s or "RG 2408" in s or "RG2408" in s)):
+            return "Percepciones de IVA"
+    for s in (u, n):
+        if "RETEN" in s and "IVA" in s and "PERC" in s:
+            return "Percepciones de IVA"
+    if "IVA RINS" in u or "IVA RINS" in n or "IVA REDUC" in u or "IVA REDUC" in n:
+        return "IVA 10,5% (sobre comisiones)"
+    if any(k in u or k in n for k in ("I.V.A. BASE", "IVA GRAL", "DEBITO FISCAL IVA BASICO")) \
+       or ("I.V.A" in u and "DÉBITO FISCAL" in u) or ("I.V.A" in n and "DEBITO FISCAL" in n):
+        if "10,5" in u or "10,5" in n or "10.5" in u or "10.5" in n:
+            return "IVA 10,5% (sobre comisiones)"
+        return "IVA 21% (sobre comisiones)"
+    if any(k in u or k in n for k in ("PLAZO FIJO", "P.FIJO", "P FIJO", "PFIJO")):
+        if cre and cre != 0:
+            return "Acreditación Plazo Fijo"
+        if deb and deb != 0:
+            return "Débito Plazo Fijo"
+        return "Plazo Fijo"
+    if any(k in u or k in n for k in ("COMIS.TRANSF", "COMIS TRANSF", "COMIS.COMPENSACION", "COMIS COMPENSACION")):
+        return "Gastos por comisiones"
+    if ("MANTENIMIENTO MENSUAL PAQUETE" in u) or ("MANTENIMIENTO MENSUAL PAQUETE" in n) or \
+       any(k in n for k in ("COMOPREM", "COMVCAUT", "COMTRSIT", "COM.NEGO", "CO.EXCESO", "COM.")):
+        return "Gastos por comisiones"
+    if any(k in n for k in ("DB-SNP", "DEB.AUT", "DEB.AUTOM", "SEGUROS", "GTOS SEG")):
+        return "Débito automático"
+    if ("DEBITO INMEDIATO" in u) or ("DEBIN" in u):
+        return "Débito automático"
+    if "DYC" in n: return "DyC"
+    if ("AFIP" in n or "ARCA" in n) and deb and deb != 0: return "Débitos ARCA"
+    if "API" in n: return "API"
+    if "DEB.CUOTA PRESTAMO" in n or ("PRESTAMO" in n and "DEB." in n): return "Cuota de préstamo"
+    if ("CR.PREST" in n) or ("CREDITO PRESTAMOS" in n) or ("CRÉDITO PRÉSTAMOS" in n): return "Acreditación Préstamos"
+    if "CH 48 HS" in n or "CH.48 HS" in n: return "Cheques 48 hs"
+    if any(k in n for k in ("PAGO COMERC", "CR-CABAL", "CR CABAL", "CR TARJ")):
+        return "Acreditaciones Tarjetas de Crédito/Débito"
+    if any(k in n for k in ("CR-DEPEF", "CR DEPEF", "DEPOSITO EFECTIVO", "DEP.EFECTIVO", "DEP EFECTIVO")):
+        return "Depósito en Efectivo"
+    if (any(k in n for k in ("CR-TRSFE", "TRANSF RECIB", "TRANLINK")) or ("TRANSFERENCIAS RECIBIDAS" in u)) and cre and cre != 0:
+        return "Transferencia de terceros recibida"
+    if any(k in n for k in ("DB-TRSFE", "TRSFE-ET", "TRSFE-IT")) and deb and deb != 0:
+        return "Transferencia a terceros realizada"
+    if any(k in n for k in ("DTNCTAPR", "ENTRE CTA", "CTA PROPIA")):
+        return "Transferencia entre cuentas propias"
+    if ("NEG.CONT" in n) or ("NEGOCIADOS" in n):
+        return "Acreditación de valores"
+    if cre and cre != 0: return "Crédito"
+    if deb and deb != 0: return "Débito"
+    return "Otros"
+
+
+def _cadena_original_df(df: pd.DataFrame, banco=None) -> pd.Series:
+    out = df.apply(lambda r: _cadena_original(str(r["descripcion"]), str(r["desc_norm"]), r["debito"], r["credito"]), axis=1)
+    if banco == "macro":
+        n = df["desc_norm"].astype(str).str.upper()
+        for i in range(len(df) - 1):
+            if "INTER.ADEL.CC" in n.iloc[i] and "C/ACUERD" in n.iloc[i] and "DEBITO FISCAL IVA BASICO" in n.iloc[i + 1]:
+                out.iloc[i + 1] = "IVA 10,5% (sobre comisiones)"
+    return out
+
+
+# descripciones típicas de los tres bancos + ruido, para armar un lote de prueba
+_MUESTRA = [
+    "SALDO ANTERIOR", "IMPTRANS LEY 25413 S/DEB", "N/D DBCR 25413 S/CR TASA GRAL", "SIRCREB RG 3/2023",
+    "PERCEPCION IVA RG 2408", "RETENCION IVA PERCEPCION", "RETEN I.V.A. RG.2408", "IVA PERC RG3337",
+    "IVA RINS IVA REDUC.R.I.", "I.V.A. BASE", "I.V.A. BASE 10,5", "DEBITO FISCAL IVA BASICO", "IVA GRAL 21",
+    "N/D INTER.ADEL.CC C/ACUERD", "DÉBITO FISCAL I.V.A.", "CONSTITUCION PLAZO FIJO", "P.FIJO VTO",
+    "COMIS.TRANSF HB", "MANTENIMIENTO MENSUAL PAQUETE", "COM. MOVIMIENTOS", "DB-SNP SEGUROS", "DEBIN 00012",
+    "DEBITO INMEDIATO", "DYC IMPUESTOS", "AFIP VEP 3344", "ARCA F.931", "API SANTA FE", "DEB.CUOTA PRESTAMO 12",
+    "CR.PREST PERSONAL", "CH 48 HS CAMARA", "PAGO COMERC VISA", "CR-CABAL 0012", "CR-DEPEF SUC 10",
+    "DEPOSITO EFECTIVO", "CR-TRSFE 2033445566", "TRANSFERENCIAS RECIBIDAS", "DB-TRSFE 2055", "TRSFE-IT HB",
+    "DTNCTAPR 1234", "TRANSF ENTRE CTA PROPIA", "NEG.CONT CHEQUES", "PAGO DE SERVICIOS", "COMPRA CON DEBITO",
+    "ACREDITACION HABERES", "CHEQUE 4432 CAMARA", "PERCEPCIÓN IVA RG 2408",
+]
+
+
+def sample_frame(rows: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    desc = rng.choice(_MUESTRA, rows)
+    suf = rng.integers(0, 50, rows).astype(str)
+    desc = np.where(rng.random(rows) < 0.3, np.char.add(np.char.add(desc.astype(str), " "), suf), desc)
+    imp = np.round(rng.random(rows) * 10000, 2)
+    side = rng.random(rows)
+    return pd.DataFrame({
+        "descripcion": desc,
+        "desc_norm": pd.Series(desc).str.replace(r"\s+\d+$", "", regex=True),
+        "debito": np.where(side < 0.5, imp, 0.0),
+        "credito": np.where(side >= 0.5, imp, 0.0),
+    })
+
+
+def cmd_check(args) -> int:
+    rules = load_rules(Path(args.path))
+    print(f"{len(rules)} regla(s) OK en {args.path}")
+    return 0
+
+
+def _mejor(fn, repeat: int) -> tuple:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def cmd_bench(args) -> int:
+    df = sample_frame(args.rows)
+    filas = list(zip(df["descripcion"], df["desc_norm"], df["debito"], df["credito"]))
+    for banco in (None, "macro"):
+        # por fila: un llamado por movimiento, sin df.apply (la cadena no tiene el ajuste por fila anterior)
+        t_ref, ref_fila = _mejor(lambda: [_cadena_original(u, n, d, c) for u, n, d, c in filas], args.repeat)
+        t_fila, fila = _mejor(lambda: [clasificar(u, n, d, c, banco) for u, n, d, c in filas], args.repeat)
+        t_ref_df, ref = _mejor(lambda: _cadena_original_df(df, banco), args.repeat)
+        t_tab, tab = _mejor(lambda: clasificar_df(df, banco), args.repeat)
+        diff = int((ref != tab).sum())
+        if banco is None:
+            diff += sum(a != b for a, b in zip(ref_fila, fila))
+        us = 1e6 / len(filas)
+        print(f"banco={banco or '-':<6} filas={len(df)}  por fila: cadena {t_ref * us:5.2f} µs  tabla {t_fila * us:5.2f} µs   "
+              f"por df: cadena {t_ref_df * 1000:7.1f} ms  tabla {t_tab * 1000:7.1f} ms   diferencias={diff}")
+        if diff:
+            bad = df[ref != tab].assign(esperado=ref[ref != tab], obtenido=tab[ref != tab])
+            print(bad.head(10).to_string())
+            return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m parsers.reglas", description="Tabla de reglas de clasificación")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("check"); c.add_argument("path", nargs="?", default=str(RULES_PATH)); c.set_defaults(fn=cmd_check)
+    b = sub.add_parser("bench"); b.add_argument("--rows", type=int, default=20000); b.add_argument("--repeat", type=int, default=5)
+    b.set_defaults(fn=cmd_bench)
+    args = ap.parse_args(argv)
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
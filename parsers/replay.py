@@ -0,0 +1,146 @@
+"""
+Volcados de líneas reproducibles: la salida de extract_all_lines guardada una vez por PDF, para volver
+a correr segmentación, parse_lines, clasificación y conciliación sin pdfplumber.
+
+    python -m parsers.replay dump PDF... [--dir DIR] [--bank ...] [--anonymize]
+    python -m parsers.replay run [DIR] [--workers N] [--save BASE.jsonl] [--compare BASE.jsonl]
+
+Cada volcado es DIR/<sha256[:16]>.json.gz con el mismo formato que los casos de parsers.golden
+({case, bank, lines: [[página, línea]]}) más source_sha256, perfil y páginas; `run` acepta también
+el directorio del corpus dorado (si un caso trae `expected`, se compara contra eso).
+`--save` guarda el resumen de cada volcado (golden.summarize) y `--compare` muestra qué resúmenes
+cambiaron respecto de una corrida anterior: así se revisa todo el archivo contra un cambio de parser.
+"""
+import argparse, hashlib, io, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import core
+from .backends import DEFAULT_PROFILE
+from .golden import _diff, anonymize_line, case_paths, load_case, run_pipeline, save_case, summarize
+
+DUMP_DIR = Path(__file__).resolve().parent.parent / "volcados"
+DUMP_FORMAT = "lineas/1"
+
+
+# ---------- volcado ----------
+def dump_statement(data: bytes, bank: str | None = None, anonymize: bool = False) -> dict:
+    """Extrae las líneas del PDF (como process_statement) y arma el volcado."""
+    sha = hashlib.sha256(data).hexdigest()
+    bank = bank or core.detect_bank_from_text(core.read_statement_text(data))
+    prof = DEFAULT_PROFILE
+    pairs = core.extract_all_lines(io.BytesIO(data), profile=prof)
+    if anonymize:
+        pairs = [(p, anonymize_line(l)) for p, l in pairs]
+    return {
+        "format": DUMP_FORMAT, "case": sha[:16], "bank": bank, "source_sha256": sha,
+        "perfil": {k: list(v) if isinstance(v, tuple) else v for k, v in prof.items()},
+        "pages": max((p for p, _ in pairs), default=0),
+        "lines": [list(p) for p in pairs],
+    }
+
+
+def _pdf_paths(paths: list[str]) -> list[Path]:
+    out = []
+    for p in map(Path, paths):
+        out.extend(sorted(p.rglob("*.pdf")) if p.is_dir() else [p])
+    return out
+
+
+def cmd_dump(args) -> int:
+    directory = Path(args.dir)
+    for path in _pdf_paths(args.pdf):
+        data = path.read_bytes()
+        target = directory / f"{hashlib.sha256(data).hexdigest()[:16]}.json.gz"
+        if target.exists() and not args.force:
+            print(f"=    {path} (ya volcado: {target.name})")
+            continue
+        t0 = time.perf_counter()
+        dump = dump_statement(data, args.bank, args.anonymize)
+        save_case(target, dump)
+        print(f"+    {path} -> {target.name}: {dump['bank']}, {dump['pages']} pág., {len(dump['lines'])} líneas, "
+              f"{target.stat().st_size / 1024:.0f} KB, {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+# ---------- replay ----------
+def replay_file(path: str) -> dict:
+    """Corre el pipeline sobre un volcado. Pensado para el pool: devuelve solo datos serializables."""
+    t0 = time.perf_counter()
+    try:
+        dump = load_case(Path(path))
+        pairs = [tuple(p) for p in dump["lines"]]
+        summary = summarize(run_pipeline(dump["bank"], pairs))
+        fails = _diff(dump["expected"], summary) if "expected" in dump else []
+        return {"case": dump["case"], "bank": dump["bank"], "source_sha256": dump.get("source_sha256"),
+                "summary": summary, "fails": fails, "error": None, "seconds": time.perf_counter() - t0}
+    except Exception as e:
+        return {"case": Path(path).name, "bank": None, "source_sha256": None, "summary": None, "fails": [],
+                "error": f"{type(e).__name__}: {e}", "seconds": time.perf_counter() - t0}
+
+
+def replay_dir(directory: Path, workers: int = 1):
+    """Itera los resultados de replay_file en orden de archivo (en paralelo si workers > 1)."""
+    paths = [str(p) for p in case_paths(directory)]
+    if workers <= 1:
+        yield from map(replay_file, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(replay_file, paths, chunksize=max(1, len(paths) // (workers * 8)))
+
+
+def _load_baseline(path: str) -> dict:
+    with open(path, encoding="utf-8") as fh:
+        return {r["case"]: r["summary"] for r in map(json.loads, fh)}
+
+
+def cmd_run(args) -> int:
+    baseline = _load_baseline(args.compare) if args.compare else None
+    save = open(args.save, "w", encoding="utf-8") if args.save else None
+    t0 = time.perf_counter()
+    n = errors = changed = accounts = 0
+    try:
+        for r in replay_dir(Path(args.dir), args.workers):
+            n += 1
+            if save and r["summary"] is not None:
+                save.write(json.dumps({"case": r["case"], "summary": r["summary"]}, ensure_ascii=False) + "\n")
+            if r["error"]:
+                errors += 1
+                print(f"ERROR {r['case']}: {r['error']}")
+                continue
+            accounts += len(r["summary"]["accounts"])
+            diffs = list(r["fails"])
+            if baseline is not None:
+                diffs += _diff(baseline[r["case"]], r["summary"]) if r["case"] in baseline else ["(nuevo: no está en la base)"]
+            if diffs:
+                changed += 1
+                print(f"CAMBIO {r['case']:<18} {r['bank']}")
+                for d in diffs[:args.max_diffs]:
+                    print(f"      {d}")
+            elif args.verbose:
+                print(f"OK    {r['case']:<18} {r['bank']:<30} {r['seconds']:.2f}s")
+    finally:
+        if save:
+            save.close()
+    secs = time.perf_counter() - t0
+    print(f"{n} volcado(s), {accounts} cuenta(s) en {secs:.2f}s · {changed} con cambios · {errors} con error")
+    return 1 if (changed or errors) else 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m parsers.replay", description="Volcados de líneas y replay del pipeline")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("dump"); d.add_argument("pdf", nargs="+"); d.add_argument("--dir", default=str(DUMP_DIR))
+    d.add_argument("--bank"); d.add_argument("--anonymize", action="store_true"); d.add_argument("--force", action="store_true")
+    d.set_defaults(fn=cmd_dump)
+    r = sub.add_parser("run"); r.add_argument("dir", nargs="?", default=str(DUMP_DIR))
+    r.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    r.add_argument("--save"); r.add_argument("--compare"); r.add_argument("--max-diffs", type=int, default=10)
+    r.add_argument("-v", "--verbose", action="store_true")
+    r.set_defaults(fn=cmd_run)
+    args = ap.parse_args(argv)
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+Servicio HTTP local para procesar resúmenes desde otras herramientas (sin pasar por la UI).
+
+    python -m parsers.service [--host 127.0.0.1] [--port 8765] [--workers 2] [--max-queue 8]
+
+    POST /parse?banco=...&formato=json|parquet&tabla=movimientos|resumen   (cuerpo = bytes del PDF)
+    GET  /health
+    GET  /metrics
+
+`banco` es opcional (si falta se detecta). JSON devuelve banco, cuentas, movimientos, conciliación y
+Resumen Operativo; Parquet devuelve la tabla pedida (movimientos de todas las cuentas o una fila por
+cuenta). Cada PDF se procesa en un pool de procesos acotado; si ya hay `max_queue` pedidos en curso
+o esperando, se responde 503 con Retry-After en lugar de encolar sin límite; si el PDF no termina en
+REQUEST_TIMEOUT segundos se responde 504 (el lugar en la cola y el spool se liberan recién cuando el
+worker termina). El cuerpo se escribe una
+vez a un spool (parsers.spool) y al worker viaja solo su ruta, no los bytes del PDF.
+
+Service.handle() no depende de HTTP: se puede probar en el mismo proceso (con un ThreadPoolExecutor
+como executor), o con serve_in_thread() sobre 127.0.0.1 y un puerto libre.
+"""
+import argparse, json, multiprocessing, sys, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from . import core
+from .spool import PDFSpool
+
+MAX_WORKERS = 2
+MAX_QUEUE = 8
+MAX_BODY_MB = 50
+REQUEST_TIMEOUT = 300
+
+
+class ParseError(Exception):
+    """Error del PDF (no del servicio): se responde 422."""
+
+
+# ---------- Trabajo (corre en el proceso worker) ----------
+def _num(x):
+    return None if x is None or (isinstance(x, float) and np.isnan(x)) else round(float(x), 2)
+
+
+def _movements_records(df: pd.DataFrame) -> list[dict]:
+    out = pd.DataFrame({
+        "fecha": df["fecha"].dt.strftime("%Y-%m-%d"),
+        "descripcion": df["descripcion"].astype(str),
+        **{c: df[c].round(2) for c in core.MONEY_COLS},
+        "clasificacion": df["Clasificación"],
+        "pagina": df["pagina"].astype(int),
+    })
+    out = out.astype(object).where(out.notna(), None)
+    return out.to_dict(orient="records")
+
+
+def statement_payload(result: dict, bank_name: str) -> dict:
+    """Resultado de core.process_statement como dict serializable a JSON."""
+    accounts = []
+    for acc in result["accounts"]:
+        rep = acc["report"]
+        accounts.append({
+            **core.account_meta(result["bank_slug"], acc["titulo"], acc["nro"], rep),
+            "conciliacion": {
+                k: _num(rep[k]) for k in ("saldo_inicial", "total_debitos", "total_creditos",
+                                          "saldo_final_visto", "saldo_final_calculado", "diferencia")
+            } | {"cuadra": bool(rep["cuadra"])},
+            "resumen": None if rep["empty"] else {k: _num(v) for k, v in rep["resumen"].items()},
+            "movimientos": [] if rep["empty"] else _movements_records(rep["df"]),
+        })
+    return {
+        "banco": bank_name, "banco_slug": result["bank_slug"],
+        "aviso": result["notice"], "meta": result["meta"], "cuentas": accounts,
+    }
+
+
+def _parquet_payload(result: dict, tabla: str) -> bytes:
+    import pyarrow as pa
+    pairs = [
+        (core.account_meta(result["bank_slug"], acc["titulo"], acc["nro"], acc["report"]), acc["report"])
+        for acc in result["accounts"]
+    ]
+    if tabla == "resumen":
+        table = core.summary_table(pairs)
+    else:
+        tables = [core.movements_table(rep["df"], meta).replace_schema_metadata(None)
+                  for meta, rep in pairs if not rep["empty"]]
+        if not tables:
+            raise ParseError("el resumen no tiene movimientos")
+        table = pa.concat_tables(tables).unify_dictionaries()
+    return core.build_parquet(table)
+
+
+def parse_pdf(data, bank_name: str | None = None, formato: str = "json", tabla: str = "movimientos"):
+    """
+    Procesa un PDF completo (bytes o SpoolHandle) y devuelve (content_type, bytes). Pensado para correr
+    en el pool: las cuentas se calculan en el mismo worker (sin el pool de cuentas de core), así el
+    servicio no pasa de `max_workers` procesos.
+    """
+    txt = core.read_statement_text(data)
+    if not txt:
+        raise ParseError("el PDF no tiene texto (¿escaneado?)")
+    bank_name = bank_name or core.detect_bank_from_text(txt)
+    result = core.process_statement(data, bank_name, txt, workers=1)
+    if formato == "parquet":
+        return "application/vnd.apache.parquet", _parquet_payload(result, tabla)
+    body = json.dumps(statement_payload(result, bank_name), ensure_ascii=False, default=str)
+    return "application/json; charset=utf-8", body.encode("utf-8")
+
+
+# ---------- Servicio ----------
+class Service:
+    """Ruteo + pool acotado + métricas. `handle` devuelve (status, headers, body)."""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE, executor=None,
+                 timeout: float = REQUEST_TIMEOUT):
+        # spawn: los workers arrancan con el primer submit, desde un hilo del servidor HTTP; fork copiaría
+        # los locks de RULES / PAGE_CACHE que otro hilo tenga tomados en ese momento
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.counters = {"requests": 0, "ok": 0, "rechazados": 0, "errores_pdf": 0, "errores": 0, "vencidos": 0}
+        self.seconds_total = 0.0
+        self.bytes_in = 0
+
+    def _json(self, status: int, obj, headers=None):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        return status, {"Content-Type": "application/json; charset=utf-8", **(headers or {})}, body
+
+    def metrics(self) -> dict:
+        with self._lock:
+            ok = self.counters["ok"]
+            return {
+                **self.counters,
+                "en_curso": self.in_flight,
+                "max_cola": self.max_queue,
+                "workers": self.max_workers,
+                "segundos_promedio": round(self.seconds_total / ok, 3) if ok else 0.0,
+                "mb_recibidos": round(self.bytes_in / 2**20, 2),
+                "uptime_s": round(time.time() - self.started, 1),
+            }
+
+    def handle(self, method: str, path: str, body: bytes = b""):
+        url = urlsplit(path)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        with self._lock:
+            self.counters["requests"] += 1
+        if method == "GET" and url.path == "/health":
+            return self._json(200, {"status": "ok", "en_curso": self.in_flight, "max_cola": self.max_queue})
+        if method == "GET" and url.path == "/metrics":
+            return self._json(200, self.metrics())
+        if url.path != "/parse":
+            return self._json(404, {"error": f"ruta desconocida: {url.path}"})
+        if method != "POST":
+            return self._json(405, {"error": "usar POST con el PDF en el cuerpo"}, {"Allow": "POST"})
+        return self._parse(body, q)
+
+    def _parse(self, body: bytes, q: dict):
+        formato = q.get("formato", "json")
+        tabla = q.get("tabla", "movimientos")
+        if formato not in ("json", "parquet") or tabla not in ("movimientos", "resumen"):
+            return self._json(400, {"error": "formato debe ser json|parquet y tabla movimientos|resumen"})
+        if not body.startswith(b"%PDF"):
+            return self._json(400, {"error": "el cuerpo no es un PDF"})
+        pre = core.preflight_pdf(body)
+        if pre["scanned"]:
+            with self._lock:
+                self.counters["errores_pdf"] += 1
+            return self._json(422, {"error": "el PDF no tiene texto (¿escaneado?)", "paginas": pre["pages"]})
+        with self._lock:
+            if self.in_flight >= self.max_queue:
+                self.counters["rechazados"] += 1
+                return self._json(503, {"error": "cola llena, reintentar"}, {"Retry-After": "5"})
+            self.in_flight += 1
+            self.bytes_in += len(body)
+        t0 = time.perf_counter()
+        spool = None
+        try:
+            spool = PDFSpool(body)
+            future = self.executor.submit(parse_pdf, spool.handle, q.get("banco"), formato, tabla)
+        except Exception as e:
+            self._releaser(spool)()
+            with self._lock:
+                self.counters["errores"] += 1
+            return self._json(500, {"error": f"{type(e).__name__}: {e}"})
+        # el lugar en la cola y el spool son del trabajo, no del pedido: si se responde antes (504)
+        # se sueltan cuando el worker termina
+        release = self._releaser(spool)
+        future.add_done_callback(release)
+        try:
+            ctype, payload = future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()  # si todavía no arrancó, no llega a correr
+            with self._lock:
+                self.counters["vencidos"] += 1
+            return self._json(504, {"error": f"el PDF no terminó en {self.timeout:g} s"})
+        except ParseError as e:
+            with self._lock:
+                self.counters["errores_pdf"] += 1
+            return self._json(422, {"error": str(e)})
+        except Exception as e:
+            with self._lock:
+                self.counters["errores"] += 1
+            return self._json(500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            if future.done():
+                release()  # sin esperar al callback, que corre después de despertar a result()
+        with self._lock:
+            self.counters["ok"] += 1
+            self.seconds_total += time.perf_counter() - t0
+        return 200, {"Content-Type": ctype}, payload
+
+    def _releaser(self, spool):
+        """Función que suelta el lugar en la cola y el spool una sola vez (la llama quien llegue primero)."""
+        pending = [True]
+
+        def release(_future=None):
+            with self._lock:
+                if not pending:
+                    return
+                pending.clear()
+                self.in_flight -= 1
+            if spool is not None:
+                spool.close()
+
+        return release
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------- HTTP ----------
+def _handler_for(service: Service):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "iabancos/1"
+
+        def _respond(self, status, headers, body):
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._respond(*service.handle("GET", self.path))
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self._respond(*service._json(400, {"error": "Content-Length inválido"}))
+                self.close_connection = True
+                return
+            if length > MAX_BODY_MB * 2**20:
+                self._respond(*service._json(413, {"error": f"PDF de más de {MAX_BODY_MB} MB"}))
+                self.close_connection = True
+                return
+            self._respond(*service.handle("POST", self.path, self.rfile.read(length)))
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def make_server(service: Service, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _handler_for(service))
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(service: Service, host: str = "127.0.0.1", port: int = 0):
+    """Levanta el servidor en un hilo (port=0: puerto libre). Devuelve (server, url_base)."""
+    server = make_server(service, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True, name="parsers-service").start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m parsers.service", description="Servicio HTTP local de resúmenes bancarios")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=MAX_WORKERS)
+    ap.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    args = ap.parse_args(argv)
+    service = Service(args.workers, args.max_queue)
+    server = make_server(service, args.host, args.port)
+    print(f"Escuchando en http://{args.host}:{server.server_address[1]} ({args.workers} worker(s), cola {args.max_queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
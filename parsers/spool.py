@@ -0,0 +1,187 @@
+"""
+PDF subido escrito una sola vez a un archivo temporal (en /dev/shm si existe) y mapeado en memoria,
+para pasarlo a otros procesos por su ruta en lugar de serializar los bytes en cada pedido.
+
+    with PDFSpool(data) as spool:
+        pool.submit(parse_pdf, spool.handle)      # viajan ~100 bytes, no el PDF
+
+En el worker, core.pdf_source(handle) devuelve la ruta: pdfplumber / pypdfium2 abren el archivo y leen
+solo los objetos de las páginas que recorren (del page cache del sistema, sin copia en el heap de Python).
+Dentro de un mismo proceso no hace falta: io.BytesIO(data) comparte el buffer de `data` (copy-on-write).
+
+Limpieza: close() / el `with` borran el archivo; si el objeto se pierde sin cerrar, weakref.finalize lo
+borra al recolectarlo o al salir el intérprete; y los archivos de procesos que ya no existen (kill -9)
+se barren al crear el primer spool del proceso. Los workers que aún tengan el archivo abierto siguen
+leyéndolo después del borrado (POSIX).
+
+    python -m parsers.spool bench PDF [--workers N] [--tasks N]
+compara bytes enviados al pool, pico de memoria del padre y RSS de los workers entre pasar los bytes
+y pasar el spool.
+"""
+import argparse, hashlib, mmap, os, pickle, sys, tempfile, threading, time, tracemalloc, weakref
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+PREFIX = "iabancos-spool"
+SPOOL_DIR = Path("/dev/shm") if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else Path(tempfile.gettempdir())
+
+_swept = False
+_swept_lock = threading.Lock()
+
+
+class SpoolHandle(NamedTuple):
+    """Lo que se manda a otro proceso: ruta, tamaño y sha1 del PDF (la misma clave que usa la app)."""
+    path: str
+    size: int
+    key: str
+
+
+def _remove(mm, path: str):
+    try:
+        if mm is not None:
+            mm.close()
+    except (BufferError, ValueError):
+        pass  # quedó un memoryview vivo: el mapeo se libera con él
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_stale(directory: Path = SPOOL_DIR) -> int:
+    """Borra los spools de procesos que ya no existen. Devuelve cuántos borró."""
+    removed = 0
+    for p in directory.glob(f"{PREFIX}-*.pdf"):
+        try:
+            pid = int(p.name.split("-")[2])
+        except (IndexError, ValueError):
+            continue
+        if pid != os.getpid() and not _pid_alive(pid):
+            try:
+                p.unlink()
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+class PDFSpool:
+    """Los bytes del PDF en un archivo temporal mapeado (solo lectura); `handle` es lo que viaja."""
+
+    def __init__(self, data: bytes, key: str | None = None, directory: Path | None = None):
+        global _swept
+        directory = Path(directory or SPOOL_DIR)
+        with _swept_lock:
+            if not _swept:
+                sweep_stale(directory)
+                _swept = True
+        fd, path = tempfile.mkstemp(prefix=f"{PREFIX}-{os.getpid()}-", suffix=".pdf", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            with open(path, "rb") as fh:
+                self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if data else None
+        except BaseException:
+            os.unlink(path)
+            raise
+        self.handle = SpoolHandle(path, len(data), key or hashlib.sha1(data).hexdigest())
+        self._finalizer = weakref.finalize(self, _remove, self._mm, path)
+
+    @property
+    def path(self) -> str:
+        return self.handle.path
+
+    def view(self) -> memoryview:
+        """Los bytes mapeados, sin copia (para hashear o inspeccionar en el proceso dueño)."""
+        return memoryview(self._mm) if self._mm is not None else memoryview(b"")
+
+    @property
+    def closed(self) -> bool:
+        return not self._finalizer.alive
+
+    def close(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def handle_path(src):
+    """Ruta del PDF si `src` es un SpoolHandle / PDFSpool / ruta; None si son bytes."""
+    if isinstance(src, (str, os.PathLike)):
+        return os.fspath(src)
+    # por atributo y no por clase: el handle puede venir de `python -m parsers.spool` (__main__.SpoolHandle)
+    path = getattr(src, "path", None)
+    return path if isinstance(path, str) else None
+
+
+# ---------- Comparación de memoria ----------
+def _probe(src) -> dict:
+    """Corre en el worker: extracción completa y RSS del worker al terminar (incluye lo que llegó por el pool)."""
+    from . import core
+    t0 = time.perf_counter()
+    core.read_statement_text(src)
+    return {"rss": core.process_rss(), "segundos": time.perf_counter() - t0}
+
+
+def _warm() -> int:
+    from . import core
+    return core.process_rss()
+
+
+def _bench_mode(src, workers: int, tasks: int) -> dict:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        base = min(pool.submit(_warm).result() for _ in range(workers))
+        tracemalloc.start()
+        try:
+            probes = [f.result() for f in [pool.submit(_probe, src) for _ in range(tasks)]]
+            _, parent_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        "enviado": len(pickle.dumps(src)) * tasks,
+        "pico_padre": parent_peak,
+        "rss_worker": max(p["rss"] for p in probes) - base,
+        "segundos": sum(p["segundos"] for p in probes) / tasks,
+    }
+
+
+def cmd_bench(args) -> int:
+    data = Path(args.pdf).read_bytes()
+    print(f"{args.pdf}: {len(data) / 2**20:.2f} MB, {args.tasks} tarea(s) en {args.workers} worker(s), spool en {SPOOL_DIR}")
+    rows = {"bytes": _bench_mode(data, args.workers, args.tasks)}
+    with PDFSpool(data) as spool:
+        rows["spool"] = _bench_mode(spool.handle, args.workers, args.tasks)
+    mb = lambda x: f"{x / 2**20:8.2f} MB"
+    print(f"{'':8} {'enviado al pool':>16} {'pico padre':>12} {'+RSS worker':>12} {'extracción':>11}")
+    for name, r in rows.items():
+        print(f"{name:8} {mb(r['enviado']):>16} {mb(r['pico_padre']):>12} {mb(r['rss_worker']):>12} {r['segundos']:9.2f} s")
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m parsers.spool", description="PDF subido compartido con los workers por archivo mapeado")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench"); b.add_argument("pdf"); b.add_argument("--workers", type=int, default=2)
+    b.add_argument("--tasks", type=int, default=4)
+    b.set_defaults(fn=cmd_bench)
+    args = ap.parse_args(argv)
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Léxico de una línea del resumen en una sola pasada: fechas, importes y números de cuenta, con su posición
+y (los importes) el valor en centavos. Reemplaza correr MONEY_RE / DATE_RE / ACCOUNT_TOKEN_RE de core por
+separado (y varias veces por línea) y después normalize_money sobre cada importe.
+
+    scan(ln)      -> (Token, ...) de los tres tipos, por posición
+    amounts(ln)   -> solo importes;  dates(ln) -> solo fechas;  accounts(ln) -> solo cuentas
+
+Reconoce exactamente lo mismo que las regex (mismos tramos, mismo orden, sin solapamientos dentro de cada
+tipo), pero sin retroceso: cada token se ancla en su signo obligatorio y se lee hacia los costados. Un
+importe tiene una sola coma, una fecha empieza en su primera '/' y una cuenta en su primer guion; las
+líneas sin ',' / '/' / guiones no se recorren. Costo lineal en el largo de la línea.
+
+    python -m parsers.tokens fuzz [--lines N] [--seed S] [DIR]   equivalencia contra las regex de core
+    python -m parsers.tokens bench [DIR] [--repeat N]            regex vs léxico
+
+DIR: volcados de parsers.replay o casos de parsers.golden (sus líneas son la semilla del fuzz y entran al
+bench; sin DIR se usan solo líneas generadas).
+"""
+import argparse, random, sys, time
+from pathlib import Path
+from typing import NamedTuple
+
+FECHA, IMPORTE, CUENTA = "fecha", "importe", "cuenta"
+TODOS = frozenset((FECHA, IMPORTE, CUENTA))
+HYPHENS = "-\u2010\u2011\u2012\u2013\u2014\u2212"  # guiones variantes (core.HYPH se arma con esto)
+
+
+class Token(NamedTuple):
+    kind: str
+    start: int
+    end: int
+    text: str
+    cents: int | None = None  # importes: valor con signo en centavos; fechas y cuentas: None
+
+    @property
+    def value(self) -> float:
+        """El importe como float (igual a core.normalize_money(text))."""
+        return self.cents / 100
+
+
+def _is_word(ch: str) -> bool:  # \w de re
+    return ch.isalnum() or ch == "_"
+
+
+def _int_part(s: str) -> bool:
+    """'1234' o '1.234.567' (\\d{1,3}(?:\\.\\d{3})*|\\d+)."""
+    if s.isdecimal():
+        return True
+    parts = s.split(".")
+    return (len(parts) > 1 and 0 < len(parts[0]) <= 3 and parts[0].isdecimal()
+            and all(len(p) == 3 and p.isdecimal() for p in parts[1:]))
+
+
+def _find_all(line, ch):
+    q = line.find(ch)
+    while q >= 0:
+        yield q
+        q = line.find(ch, q + 1)
+
+
+# ---------- Reconocedores ----------
+def _amounts(line, out):
+    """
+    Importes (MONEY_RE): '-'? entero '\\s?,\\s?' dos decimales '-'?, con espacio o borde a los dos lados.
+    Desde cada coma: a la derecha un espacio opcional, dos cifras y el '-' (lo que más descarta, primero);
+    a la izquierda un espacio opcional, las cifras y puntos del entero y el '-'.
+    """
+    n, done, prev = len(line), 0, -1
+    for c in _find_all(line, ","):
+        lo, prev = prev, c
+        q = c + 1
+        if q < n and line[q].isspace():
+            q += 1
+        frac = line[q:q + 2]
+        q += 2
+        if len(frac) != 2 or not frac.isdecimal() or (q < n and not line[q].isspace() and line[q] != "-"):
+            continue
+        neg = q < n and line[q] == "-"
+        if neg:
+            q += 1
+            if q < n and not line[q].isspace():
+                continue
+        e = c - 1
+        if e >= 0 and line[e].isspace():
+            e -= 1
+        # el entero no cruza la coma anterior: cada tramo se mira una vez
+        s = lo + len(line[lo + 1:e + 1].rstrip("0123456789."))
+        while s > lo and (line[s].isdecimal() or line[s] == "."):  # cifras no ASCII
+            s -= 1
+        ent = line[s + 1:e + 1]
+        if not _int_part(ent):
+            continue
+        if s >= 0 and line[s] == "-":
+            neg, s = True, s - 1
+        if (s >= 0 and not line[s].isspace()) or s + 1 < done:
+            continue
+        cents = int(ent.replace(".", "")) * 100 + int(frac)
+        out.append(Token(IMPORTE, s + 1, q, line[s + 1:q], -cents if neg else cents))
+        done = q
+
+
+def _dates(line, out):
+    """Fechas (DATE_RE, \\b\\d{1,2}/\\d{2}/\\d{2,4}\\b) desde su primera '/'."""
+    n, done = len(line), 0
+    for c in _find_all(line, "/"):
+        p = c - 1
+        if p < done or not line[p].isdecimal():
+            continue
+        if p > 0 and line[p - 1].isdecimal():
+            p -= 1
+        mes = line[c + 1:c + 3]
+        if (p > 0 and _is_word(line[p - 1])) or line[c + 3:c + 4] != "/" or len(mes) != 2 or not mes.isdecimal():
+            continue
+        e = c + 4
+        while e < n and line[e].isdecimal() and e - c - 4 < 4:
+            e += 1
+        if 2 <= e - c - 4 and (e == n or not _is_word(line[e])):
+            out.append(Token(FECHA, p, e, line[p:e]))
+            done = e
+
+
+def _skip_space(line, q, n):
+    while q < n and line[q].isspace():
+        q += 1
+    return q
+
+
+def _accounts(line, out):
+    """Cuentas (ACCOUNT_TOKEN_RE, d-ddd-dddddddddd-d con espacios y guiones variantes) desde su primer guion."""
+    hyph = sorted(q for h in HYPHENS if h in line for q in _find_all(line, h))
+    n, done = len(line), 0
+    for h1 in hyph:
+        if h1 < done:
+            continue
+        p = h1 - 1
+        while p >= 0 and line[p].isspace():
+            p -= 1
+        if p < done or p < 0 or not line[p].isdecimal() or (p > 0 and _is_word(line[p - 1])):
+            continue
+        q = h1 + 1
+        for size in (3, 10):
+            q = _skip_space(line, q, n)
+            if not line[q:q + size].isdecimal() or q + size > n:
+                break
+            q = _skip_space(line, q + size, n)
+            if q >= n or line[q] not in HYPHENS:
+                break
+            q += 1
+        else:
+            q = _skip_space(line, q, n)
+            if q < n and line[q].isdecimal() and (q + 1 == n or not _is_word(line[q + 1])):
+                out.append(Token(CUENTA, p, q + 1, line[p:q + 1]))
+                done = q + 1
+
+
+def scan(line: str, kinds=TODOS) -> tuple:
+    """Los tokens de `kinds` de la línea, ordenados por posición."""
+    out = []
+    if IMPORTE in kinds and "," in line:
+        _amounts(line, out)
+    if FECHA in kinds and "/" in line:
+        _dates(line, out)
+    if CUENTA in kinds and any(h in line for h in HYPHENS):
+        _accounts(line, out)
+    if len(kinds) > 1 and out:
+        out.sort(key=lambda t: (t.start, t.end))
+    return tuple(out)
+
+
+def amounts(line: str) -> tuple:
+    out = []
+    if "," in line:
+        _amounts(line, out)
+    return tuple(out)
+
+
+def dates(line: str) -> tuple:
+    out = []
+    if "/" in line:
+        _dates(line, out)
+    return tuple(out)
+
+
+def accounts(line: str) -> tuple:
+    out = []
+    if any(h in line for h in HYPHENS):
+        _accounts(line, out)
+    return tuple(out)
+
+
+# ---------- Fuzz: equivalencia contra las regex ----------
+_ALPHABET = "0123456789" * 6 + ".,,-/ " * 4 + "  \t\xa0\x1c" + "–−" + "ABCxyzÑ_:$()" + "٣²"
+
+
+def _corpus(directory) -> list[str]:
+    if not directory:
+        return []
+    from .golden import case_paths, load_case
+    return [l for p in case_paths(Path(directory)) for _, l in load_case(p)["lines"]]
+
+
+def _mutate(rng: random.Random, ln: str) -> str:
+    s = list(ln)
+    for _ in range(rng.randint(1, 4)):
+        op = rng.random()
+        at = rng.randint(0, len(s))
+        if op < 0.4 or not s:
+            s[at:at] = rng.choice(_ALPHABET)
+        elif op < 0.7:
+            del s[min(at, len(s) - 1)]
+        else:
+            s[min(at, len(s) - 1)] = rng.choice(_ALPHABET)
+    return "".join(s)
+
+
+def _random_line(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 12)):
+        r = rng.random()
+        if r < 0.25:
+            g = [str(rng.randint(0, 999))] + [f"{rng.randint(0, 999):03d}" for _ in range(rng.randint(0, 3))]
+            coma = rng.choice([",", " ,", ", ", " , ", ",,", "  ,", ",\t", " ,  ", "\t, "])
+            parts.append(rng.choice(["", "-"]) + ".".join(g) + coma + f"{rng.randint(0, 99):02d}"
+                         + rng.choice(["", "", "-", "0"]))
+        elif r < 0.4:
+            parts.append(f"{rng.randint(0, 39)}/{rng.randint(0, 19):02d}/{rng.randint(0, 99999)}")
+        elif r < 0.5:
+            parts.append(rng.choice(HYPHENS).join([str(rng.randint(0, 9)), f"{rng.randint(0, 999):03d}",
+                                                   f"{rng.randint(0, 10**10 - 1):010d}", str(rng.randint(0, 19))]))
+        else:
+            parts.append("".join(rng.choice(_ALPHABET) for _ in range(rng.randint(1, 8))))
+    return "".join(p + rng.choice([" ", " ", "", "  ", "\t"]) for p in parts)
+
+
+def check_line(line: str) -> list[str]:
+    """Diferencias entre scan() y las regex de core (vacío si coinciden)."""
+    from .core import ACCOUNT_TOKEN_RE, DATE_RE, MONEY_RE, normalize_money
+    toks = scan(line)
+    errs = []
+    for kind, rx in ((IMPORTE, MONEY_RE), (FECHA, DATE_RE), (CUENTA, ACCOUNT_TOKEN_RE)):
+        want = [(m.start(), m.end()) for m in rx.finditer(line)]
+        got = [(t.start, t.end) for t in toks if t.kind == kind]
+        if want != got:
+            errs.append(f"{kind}: regex {want} léxico {got}")
+    for t in toks:
+        if t.kind == IMPORTE and t.value != normalize_money(t.text):
+            errs.append(f"valor {t.text!r}: {t.value} vs normalize_money {normalize_money(t.text)}")
+    return errs
+
+
+def cmd_fuzz(args) -> int:
+    rng = random.Random(args.seed)
+    seeds = _corpus(args.dir)
+    fails = checked = 0
+    t0 = time.perf_counter()
+    for ln in seeds:
+        checked += 1
+        fails += bool(check_line(ln))
+    for _ in range(args.lines):
+        ln = _mutate(rng, rng.choice(seeds)) if seeds and rng.random() < 0.5 else _random_line(rng)
+        checked += 1
+        errs = check_line(ln)
+        if errs:
+            fails += 1
+            if fails <= args.max_diffs:
+                print(f"DIFERENCIA {ln!r}")
+                for e in errs:
+                    print(f"      {e}")
+    print(f"{checked} línea(s) ({len(seeds)} del corpus) en {time.perf_counter() - t0:.1f}s · {fails} con diferencias")
+    return 1 if fails else 0
+
+
+# ---------- Micro-benchmark ----------
+def _regex_way(line):
+    """Lo que hacían parse_lines y los saldos por línea: finditer de importes, fecha y los dos importes."""
+    from .core import DATE_RE, MONEY_RE, normalize_money
+    am = list(MONEY_RE.finditer(line))
+    d = DATE_RE.search(line)
+    vals = [normalize_money(m.group(0)) for m in am[-2:]]
+    return len(am), d, vals
+
+
+def _lexer_way(line):
+    am = amounts(line)
+    d = dates(line)
+    vals = [t.value for t in am[-2:]]
+    return len(am), d, vals
+
+
+def _time(fn, lines, repeat) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for ln in lines:
+            fn(ln)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def cmd_bench(args) -> int:
+    rng = random.Random(0)
+    sets = {}
+    corpus = _corpus(args.dir)
+    if corpus:
+        sets["corpus"] = corpus
+    sets["generadas"] = [_random_line(rng) for _ in range(5000)]
+    desc = "TRANSF " + " ".join(f"{rng.randint(0, 999)}.{rng.randint(0, 999):03d}" for _ in range(60))
+    sets["descripción larga"] = [f"01/02/2024 {desc} 1.234,56 -98.765,43"] * 200
+    sets["cifras pegadas"] = ["REF " + "1.234" * 400 + ",5 " + "9" * 2000] * 50
+    print(f"{'':20} {'líneas':>7} {'regex':>10} {'léxico':>10} {'µs/línea':>17}")
+    for name, lines in sets.items():
+        r = _time(_regex_way, lines, args.repeat)
+        x = _time(_lexer_way, lines, args.repeat)
+        print(f"{name:20} {len(lines):7d} {r * 1000:8.1f}ms {x * 1000:8.1f}ms "
+              f"{r / len(lines) * 1e6:7.2f} → {x / len(lines) * 1e6:.2f}")
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m parsers.tokens", description="Léxico de fechas, importes y cuentas")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    f = sub.add_parser("fuzz"); f.add_argument("dir", nargs="?")
+    f.add_argument("--lines", type=int, default=200_000); f.add_argument("--seed", type=int, default=0)
+    f.add_argument("--max-diffs", type=int, default=10)
+    f.set_defaults(fn=cmd_fuzz)
+    b = sub.add_parser("bench"); b.add_argument("dir", nargs="?"); b.add_argument("--repeat", type=int, default=5)
+    b.set_defaults(fn=cmd_bench)
+    args = ap.parse_args(argv)
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import json
+import time
+
+import pandas as pd
+import pytest
+
+from parsers import core, golden
+
+
+@pytest.fixture
+def cuentas():
+    case = golden.load_case(golden.GOLDEN_DIR / "macro-multicuenta.json.gz")
+    info, accounts = core.split_statement(case["bank"], [tuple(p) for p in case["lines"]])
+    assert len(accounts) > 1
+    return accounts
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # el caso es chico: se baja el umbral para que map_accounts use el pool igual
+    monkeypatch.setattr(core, "PARALLEL_MIN_LINES", 0)
+    yield
+    if core._account_pool is not None:
+        core._account_pool.shutdown()
+        core._account_pool = None
+
+
+def test_pool_igual_que_en_proceso(cuentas, pool):
+    avance = []
+    local = core.compute_accounts("macro", cuentas, workers=1)
+    t0 = time.perf_counter()
+    remoto = core.compute_accounts("macro", cuentas, workers=2, progress=lambda *a: avance.append(a))
+    wall = time.perf_counter() - t0
+    assert core._account_pool is not None, "la corrida tenía que pasar por el pool"
+    assert len(avance) == len(cuentas)
+
+    assert [(r["titulo"], r["nro"], r["acc_id"]) for r in remoto] == [(t, n, a) for t, n, a, _, _ in cuentas]
+    assert golden.summarize({"notice": None, "meta": None, "accounts": remoto}) == \
+        golden.summarize({"notice": None, "meta": None, "accounts": local})
+    for a, b in zip(local, remoto):
+        pd.testing.assert_frame_equal(a["report"]["df"], b["report"]["df"])
+        # el tiempo de cada cuenta se mide dentro del worker: no incluye levantar el pool ni el transporte
+        assert 0 < b["segundos"] < wall
+
+
+def test_etapas_cronometradas_iguales(cuentas, pool):
+    items = [(lines, pages, None) for _, _, _, lines, pages in cuentas]
+    local = core.map_accounts("macro", items, workers=1)
+    remoto = core.map_accounts("macro", items, workers=2)
+    for (p1, s1), (p2, s2) in zip(local, remoto):
+        assert list(s1) == list(s2) == ["movimientos", "clasificados", "resumenes", "exportes"]
+        assert all(v >= 0 for v in s2.values())
+        assert p1["resumenes"]["saldo_inicial"] == p2["resumenes"]["saldo_inicial"]
+        pd.testing.assert_frame_equal(p1["movimientos"]["df"], p2["movimientos"]["df"])
+
+
+def test_golden_mide_en_proceso(monkeypatch):
+    case = golden.load_case(golden.GOLDEN_DIR / "macro-multicuenta.json.gz")
+    monkeypatch.setattr(core, "PARALLEL_MIN_LINES", 0)
+    monkeypatch.setattr(core, "account_pool", lambda *a: pytest.fail("golden no debe usar el pool de cuentas"))
+    assert golden.run_case(case) == []
+
+
+MACRO = [
+    "BANCO MACRO S.A.",
+    "INFORMACION DE SU/S CUENTA/S",
+    "CUENTA CORRIENTE BANCARIA 3-100-0000481516-2 $ 1.000,00",
+    "CUENTA CORRIENTE ESPECIAL EN PESOS 4-100-0000234200-7 $ 500,00",
+    "CUENTA CORRIENTE BANCARIA NRO.:",
+    "3-100-0000481516-2",
+    "SALDO ULTIMO EXTRACTO AL 31/12/2024 1.000,00",
+    "FECHA DESCRIPCION REFERENCIA DEBITOS CREDITOS SALDO",
+    "02/01/25 COMIS.TRANSF 123456 10,00 990,00",
+    "03/01/25 CR-DEPEF 123457 110,00 1.100,00",
+    "SALDO FINAL AL DIA 31/01/2025 1.100,00",
+    "CUENTA CORRIENTE ESPECIAL EN PESOS NRO.:",
+    "4-100-0000234200-7",
+    "SALDO ULTIMO EXTRACTO AL 31/12/2024 500,00",
+    "FECHA DESCRIPCION REFERENCIA DEBITOS CREDITOS SALDO",
+    "05/01/25 SIRCREB ING BRUTOS 123458 5,00 495,00",
+    "SALDO FINAL AL DIA 31/01/2025 495,00",
+]
+
+
+def test_servicio_calcula_en_proceso(monkeypatch):
+    from parsers import service
+    from test_service import _pdf
+
+    data = _pdf(MACRO)
+    monkeypatch.setattr(core, "ACCOUNT_WORKERS", 2)
+    monkeypatch.setattr(core, "PARALLEL_MIN_LINES", 0)
+    monkeypatch.setattr(core, "account_pool", lambda *a: pytest.fail("el servicio no debe usar el pool de cuentas"))
+    _, body = service.parse_pdf(data, "Banco Macro")
+    assert len(json.loads(body)["cuentas"]) == 2
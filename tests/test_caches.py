@@ -0,0 +1,64 @@
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from parsers import core, jobs, pipeline
+
+
+def _frame(filas: int) -> pd.DataFrame:
+    return pd.DataFrame({"descripcion": [f"MOVIMIENTO {i}" for i in range(filas)], "saldo": range(filas)})
+
+
+def test_core_no_cambia_opciones_de_pandas():
+    # copy-on-write es una opción de la app (app.py), no un efecto de importar parsers.core
+    out = subprocess.run([sys.executable, "-c", "import pandas as pd, parsers.core; print(pd.get_option('mode.copy_on_write'))"],
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_value_memory_cuenta_frames_una_vez():
+    df = _frame(1000)
+    solo = core.value_memory(df)
+    assert solo == int(df.memory_usage(deep=True).sum())
+    assert core.value_memory({"a": df, "b": [df, b"x" * 100]}) < 2 * solo
+
+
+def test_stage_cache_acotado_por_bytes():
+    df = _frame(2000)
+    cache = pipeline.StageCache(max_entries=100, max_bytes=int(core.value_memory(df) * 2.5))
+    for i in range(5):
+        cache.put(("movimientos", str(i)), _frame(2000))
+    st = cache.stats()
+    assert st["entries"] == 2 and st["bytes"] <= cache.max_bytes
+    assert cache.get(("movimientos", "0"))[0] is False and cache.get(("movimientos", "4"))[0] is True
+
+    # una entrada que sola pasa del límite queda igual (la última guardada)
+    cache.put(("texto", "grande"), _frame(20000))
+    assert cache.stats()["entries"] == 1
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "entries": 0, "bytes": 0}
+
+
+def _espera(cond, segundos=10):
+    # el worker descarta después de completar el future
+    fin = time.time() + segundos
+    while not cond() and time.time() < fin:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_jobs_descarta_terminados_por_bytes():
+    tam = core.value_memory(_frame(2000))
+    jm = jobs.JobManager(max_workers=1, max_jobs=100, max_bytes=int(tam * 2.5))
+    for i in range(5):
+        jm.submit(i, lambda progress=None: _frame(2000)).future.result(10)
+    assert _espera(lambda: jm.metrics()["trabajos"] == 2)
+    assert jm.metrics()["bytes"] <= jm.max_bytes
+    assert jm.get(0) is None and jm.get(4).done()
+
+    # el que recién terminó queda aunque solo pase del límite
+    jm.submit("grande", lambda progress=None: _frame(20000)).future.result(10)
+    assert _espera(lambda: jm.metrics()["trabajos"] == 1)
+    assert jm.get("grande") is not None
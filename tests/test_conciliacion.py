@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from parsers.core import reconciliation_breaks
+
+
+def _df(saldo, importe):
+    n = len(saldo)
+    return pd.DataFrame({
+        "fecha": pd.date_range("2025-01-01", periods=n), "descripcion": [f"MOV {i}" for i in range(n)],
+        "saldo": saldo, "importe": importe, "pagina": [1] * n, "linea": list(range(n)),
+    })
+
+
+LINEAS = [f"linea {i}" for i in range(10)]
+
+
+def test_saldo_quieto_con_importe_es_quiebre():
+    q = reconciliation_breaks(_df([100, 150, 150, 100], [0, 50, 80, 50]), LINEAS)
+    assert q["linea_pdf"].tolist() == ["linea 2"]
+    assert q[["delta_saldo", "diferencia"]].values.tolist() == [[0.0, -80.0]]
+
+
+def test_importe_de_otro_tamano_es_quiebre():
+    # débitos y créditos: el signo sale del saldo, solo se compara la magnitud
+    q = reconciliation_breaks(_df([100, 150, 70, 100, 90], [0, 50, 80, 3, 10]), LINEAS)
+    assert q["linea_pdf"].tolist() == ["linea 3"]
+    assert q["diferencia"].tolist() == [27.0]
+
+
+def test_sin_importe_se_acepta_el_delta():
+    assert reconciliation_breaks(_df([100, 150, 150, 40], [0, np.nan, np.nan, 110]), LINEAS).empty
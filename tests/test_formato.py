@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from parsers.core import fmt_ar, fmt_ar_series
+
+
+@pytest.mark.filterwarnings("error")
+@pytest.mark.parametrize("valores", [
+    [np.inf, -np.inf, np.nan, None],
+    [-0.0, 0.0, -0.001, 0.005, 0.015, 1.005, 999.995, 99_999_999_999.995],
+    [1e11, 1e13 / 100, 1e13, -1e13, 1e15 + 0.5, -3e16, 1e300],
+])
+def test_igual_que_fmt_ar_en_los_bordes(valores):
+    esperado = [fmt_ar(float("nan") if v is None else v) for v in valores]
+    assert fmt_ar_series(pd.Series(valores, dtype=object)).tolist() == esperado
+    assert fmt_ar_series(np.array(valores, dtype=float)).tolist() == esperado
+
+
+def test_igual_que_fmt_ar_al_azar():
+    rng = np.random.default_rng(0)
+    vals = np.concatenate([rng.normal(0, 1e6, 5000), rng.uniform(-1000, 1000, 5000).round(3),
+                           rng.integers(-10**12, 10**12, 5000) / 100])
+    s = pd.Series(vals, index=np.arange(len(vals)) * 2, name="saldo")
+    out = fmt_ar_series(s)
+    assert out.index.equals(s.index) and out.name == "saldo"
+    assert out.tolist() == s.map(fmt_ar).tolist()
@@ -0,0 +1,36 @@
+import shutil
+
+import pytest
+
+from parsers import golden
+
+CASES = golden.case_paths(golden.GOLDEN_DIR)
+
+
+def test_hay_un_caso_por_banco():
+    bancos = {golden.load_case(p)["bank"] for p in CASES}
+    assert {"Banco Macro", "Banco de Santa Fe", "Banco de la Nación Argentina"} <= bancos
+    assert {p.name.split(".")[0] for p in CASES} >= {
+        "macro-multicuenta", "macro-dos-lineas", "santafe-consolidado", "bna-gastos", "galicia", "santander-detalle-impositivo"}
+
+
+@pytest.mark.parametrize("path", CASES, ids=[p.name.split(".")[0] for p in CASES])
+def test_caso_dorado(path):
+    case = golden.load_case(path)
+    assert case["budget"], "cada caso trae su presupuesto"
+    assert golden.run_case(case) == []
+
+
+def test_run_falla_con_una_diferencia(tmp_path):
+    src = golden.GOLDEN_DIR / "bna-gastos.json.gz"
+    dst = tmp_path / src.name
+    shutil.copy(src, dst)
+    assert golden.main(["run", str(tmp_path)]) == 0
+    case = golden.load_case(dst)
+    case["expected"]["meta"]["gastos_finales"]["COMISION"] += 0.01
+    golden.save_case(dst, case)
+    assert golden.main(["run", str(tmp_path)]) == 1
+
+
+def test_run_sin_casos_falla(tmp_path):
+    assert golden.main(["run", str(tmp_path)]) == 1
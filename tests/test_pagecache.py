@@ -0,0 +1,38 @@
+import threading
+import uuid
+
+from parsers import core, pipeline
+from parsers.pagecache import PAGE_CACHE
+
+from test_service import BNA, _pdf
+
+
+def _ruido(stop: threading.Event):
+    # otra sesión usando la caché al mismo tiempo
+    while not stop.is_set():
+        PAGE_CACHE.get(("otro", uuid.uuid4().hex))
+
+
+def test_contadores_por_llamada_con_otra_extraccion_en_paralelo():
+    data = _pdf(BNA + [f"REF {uuid.uuid4().hex}"])
+    stop = threading.Event()
+    t = threading.Thread(target=_ruido, args=(stop,))
+    t.start()
+    try:
+        primera, segunda = {"hits": 0, "misses": 0}, {"hits": 0, "misses": 0}
+        core.extract_all_lines(core.pdf_source(data), counts=primera)
+        core.extract_all_lines(core.pdf_source(data), counts=segunda)
+        out = core.process_statement(data, "Banco de la Nación Argentina")
+    finally:
+        stop.set()
+        t.join()
+    assert primera == {"hits": 0, "misses": 1}
+    assert segunda == out["cache"] == {"hits": 1, "misses": 0}
+
+
+def test_run_statement_cuenta_solo_su_extraccion():
+    data = _pdf(BNA + [f"REF {uuid.uuid4().hex}"])
+    cache = pipeline.StageCache()
+    assert pipeline.run_statement(data, "Banco de la Nación Argentina", cache=cache)["cache"] == {"hits": 0, "misses": 1}
+    # las líneas salen de la memo de etapas: esta corrida no consulta la caché de páginas
+    assert pipeline.run_statement(data, "Banco de la Nación Argentina", cache=cache)["cache"] == {"hits": 0, "misses": 0}
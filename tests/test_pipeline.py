@@ -0,0 +1,19 @@
+import uuid
+
+from parsers import jobs, pipeline
+
+from test_service import BNA, _pdf
+
+
+def test_trabajo_de_texto_trae_su_propia_traza():
+    data = _pdf(BNA + [f"REF {uuid.uuid4().hex}"])
+    cache = pipeline.StageCache()
+    jm = jobs.JobManager(max_workers=1)
+    primero = jm.submit("a", pipeline.run_text, data, "doc", cache=cache).future.result(30)
+    segundo = jm.submit("b", pipeline.run_text, data, "doc", cache=cache).future.result(30)
+
+    assert "BANCO DE LA NACION ARGENTINA" in primero["texto"] and segundo["texto"] == primero["texto"]
+    assert [(t["etapa"], t["recalculada"]) for t in primero["trace"]] == [("texto", True)]
+    assert [(t["etapa"], t["recalculada"]) for t in segundo["trace"]] == [("texto", False)]
+    # el trabajo terminado solo guarda el resultado: ni la función ni sus argumentos
+    assert jm.get("a")._call is None
@@ -0,0 +1,32 @@
+import pytest
+
+from parsers import core, golden
+
+
+@pytest.fixture
+def rep():
+    case = golden.load_case(golden.GOLDEN_DIR / "macro-multicuenta.json.gz")
+    _, accounts = core.split_statement(case["bank"], [tuple(p) for p in case["lines"]])
+    _, _, _, lines, pages = accounts[0]
+    return core.compute_account_report("macro", lines, pages)
+
+
+def test_una_correccion_no_arma_los_excel(rep, monkeypatch):
+    # lo que corre app.effective_report en cada edición
+    desc = rep["df"].loc[rep["df"]["Clasificación"].ne("SALDO ANTERIOR"), "desc_norm"].iloc[0]
+    monkeypatch.setattr(core, "build_xlsx", lambda *a, **k: pytest.fail("el Excel se arma recién al pedirlo"))
+    paso = core.corrected_report(None, rep, {desc: "IVA 21% (sobre comisiones)"})
+    nuevo = paso["rep"]
+    assert nuevo is not rep and paso["firma"] == ((desc, "IVA 21% (sobre comisiones)"),)
+    assert not set(core.ACCOUNT_XLSX) & set(nuevo)
+    assert isinstance(nuevo["pdf_resumen"], bytes) and nuevo["pdf_resumen"] != rep["pdf_resumen"]
+    assert nuevo["resumen"]["iva21"] != rep["resumen"]["iva21"]
+    # misma firma: no se recalcula nada
+    assert core.corrected_report(paso, rep, {desc: "IVA 21% (sobre comisiones)"}) is paso
+
+
+def test_excel_corregido_al_pedirlo(rep):
+    desc = rep["df"]["desc_norm"].iloc[-1]
+    nuevo = core.corrected_report(None, rep, {desc: "Cuota de préstamo"})["rep"]
+    assert core.account_xlsx(nuevo, "xlsx")[:2] == b"PK"
+    assert core.account_xlsx(nuevo, "xlsx_creditos")[:2] == b"PK"
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from parsers import reglas
+
+
+def _referencia(m: reglas.Matcher, u: str, n: str, prev: str) -> str:
+    """Todas las reglas en orden de prioridad, sin prefiltro."""
+    t = reglas.SEP.join((u, n, prev if m.uses_prev else ""))
+    for i, rx in enumerate(m._res):
+        if rx.match(t):
+            return m.clases[i]
+    return "Otros"
+
+
+def _textos(seed: int, n: int):
+    rng = random.Random(seed)
+    piezas = [lit for m in (reglas.RULES.matcher(b, d, c) for b in (None, "macro") for d in (0, 1) for c in (0, 1))
+              for lit in m._gates]
+    piezas += [p[:rng.randrange(1, len(p) + 1)] for p in piezas] + ["10,5", "10.5", "RG 2408", " ", "-", ".", "Ó", "É"]
+    for _ in range(n):
+        yield "".join(rng.choice(piezas) + rng.choice(["", " ", "", "X"]) for _ in range(rng.randrange(0, 6)))
+
+
+@pytest.mark.parametrize("banco", [None, "macro", "santafe"])
+def test_prefiltro_igual_que_todas_las_reglas(banco):
+    textos = list(_textos(11, 3000))
+    rng = random.Random(5)
+    for u in textos:
+        n = rng.choice([u, u.rstrip("0123456789 "), rng.choice(textos)])
+        prev = rng.choice(textos)
+        for deb, cre in ((True, False), (False, True), (True, True), (False, False)):
+            m = reglas.RULES.matcher(banco, deb, cre)
+            assert m.clase(u, n, prev) == _referencia(m, u, n, prev), (u, n, prev, deb, cre)
+
+
+def test_igual_que_la_cadena_original():
+    df = reglas.sample_frame(3000, seed=3)
+    for banco in (None, "macro"):
+        assert (reglas.clasificar_df(df, banco) == reglas._cadena_original_df(df, banco)).all()
+    fila = [reglas.clasificar(u, n, d, c) for u, n, d, c in zip(df["descripcion"], df["desc_norm"], df["debito"], df["credito"])]
+    assert fila == reglas._cadena_original_df(df).tolist()
+
+
+@pytest.mark.parametrize("pat, esperado", [
+    ("SIRCREB", (("SIRCREB",), True)),
+    ("AFIP|ARCA", (("AFIP", "ARCA"), True)),
+    ("I\\.V\\.A|IVA", (("I.V.A", "IVA"), True)),
+    ("PLAZO FIJO|P[. ]?FIJO", (("PLAZO FIJO", "FIJO"), False)),
+    ("RG\\.?\\s*2408", (("2408",), False)),
+    ("CH[ .]48 HS", (("48 HS",), False)),
+    ("COM+ISION", (("ISION",), False)),
+    ("A(B|C)", (None, False)),
+    ("\\d+|IVA", (None, False)),
+    ("[|]X|Y", (("X", "Y"), False)),
+])
+def test_literales(pat, esperado):
+    assert reglas._literales(pat) == esperado
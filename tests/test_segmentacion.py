@@ -0,0 +1,32 @@
+from parsers import core
+
+TABLA = [
+    "INFORMACION DE SU/S CUENTA/S",
+    "CUENTA CORRIENTE BANCARIA 3-100-0000000001-2 $ 1.000,00",
+]
+
+
+def _pares(lineas):
+    return [(1 + i // 20, l) for i, l in enumerate(lineas)]
+
+
+def test_macro_tabla_cierra_en_cuenta_nro_sin_numero():
+    # un encabezado de movimientos no cierra la tabla: los números que siguen entran en la whitelist
+    abierta = TABLA + ["FECHA DESCRIPCION REFERENCIA DEBITOS CREDITOS SALDO",
+                       "CAJA DE AHORRO EN PESOS 4-200-0000000002-3"]
+    assert list(core.macro_extract_account_whitelist(None, all_lines=_pares(abierta))) == [
+        "3-100-0000000001-2", "4-200-0000000002-3"]
+
+    cerrada = TABLA + ["CUENTA CORRIENTE BANCARIA NRO.:", "3-100-0000000001-2",
+                       "01/01/25 TRF A 4-200-0000000002-3 1.000,00 0,00"]
+    assert list(core.macro_extract_account_whitelist(None, all_lines=_pares(cerrada))) == ["3-100-0000000001-2"]
+    bloques = core.macro_split_account_blocks(None, all_lines=_pares(cerrada))
+    assert [(b["nro"], b["titulo"], b["lines"]) for b in bloques] == [
+        ("3-100-0000000001-2", "CUENTA CORRIENTE BANCARIA", ["01/01/25 TRF A 4-200-0000000002-3 1.000,00 0,00"])]
+
+
+def test_santafe_lee_cuentas_despues_del_consolidado():
+    lineas = ["Consolidado de cuentas", "Cuenta Corriente Pesos Nro. 1646/00 $ 1,00",
+              "FECHA CONCEPTO COMPROBANTE DEBITOS CREDITOS SALDO",
+              "Caja de Ahorro Pesos Nro. 2231/01"]
+    assert [a["nro"] for a in core.santafe_extract_accounts(None, all_lines=_pares(lineas))] == ["1646/00", "2231/01"]
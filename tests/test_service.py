@@ -0,0 +1,146 @@
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from parsers import service
+
+BNA = [
+    "BANCO DE LA NACION ARGENTINA",
+    "PERIODO: 01/03/2025 AL 31/03/2025",
+    "FECHA CONCEPTO COMPROBANTE DEBITOS CREDITOS SALDO",
+    "SALDO ANTERIOR 5.000,00",
+    "01/03/25 COMIS. MANT 123 91,51 4.908,49",
+    "02/03/25 TRANSF RECIB 123 753,59 5.662,08",
+    "03/03/25 I.V.A. BASE 123 19,22 5.642,86",
+    "SALDO FINAL 5.642,86",
+]
+
+
+def _pdf(lines: list[str]) -> bytes:
+    """PDF mínimo de una página con `lines` en Helvetica (sin contenido si no hay líneas)."""
+    esc = lambda s: s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    content = ("BT /F1 9 Tf 12 TL 40 800 Td " + " ".join(f"({esc(l)}) Tj T*" for l in lines) + " ET") if lines else ""
+    objs = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    out, offsets = b"%PDF-1.4\n", []
+    for i, o in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{o}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+@pytest.fixture
+def svc():
+    s = service.Service(max_workers=2, max_queue=1, executor=ThreadPoolExecutor(2), timeout=30)
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def bloqueado(monkeypatch):
+    """parse_pdf queda esperando hasta que se suelta el evento."""
+    ev = threading.Event()
+
+    def parse_pdf(*a, **k):
+        ev.wait(10)
+        return "application/json", b"{}"
+
+    monkeypatch.setattr(service, "parse_pdf", parse_pdf)
+    yield ev
+    ev.set()
+
+
+def test_200_json(svc):
+    status, headers, body = svc.handle("POST", "/parse", _pdf(BNA))
+    assert status == 200, body
+    out = json.loads(body)
+    assert out["banco"] == "Banco de la Nación Argentina"
+    cuenta = out["cuentas"][0]
+    assert len(cuenta["movimientos"]) == 4
+    assert cuenta["conciliacion"]["cuadra"] is True
+    assert svc.metrics()["ok"] == 1 and svc.in_flight == 0
+
+
+def test_422_pdf_sin_texto(svc):
+    status, _, body = svc.handle("POST", "/parse", _pdf([]))
+    assert status == 422, body
+    assert svc.metrics()["errores_pdf"] == 1 and svc.in_flight == 0
+
+
+def test_503_cola_llena(svc, bloqueado):
+    primero = threading.Thread(target=svc.handle, args=("POST", "/parse", _pdf(BNA)))
+    primero.start()
+    for _ in range(200):
+        if svc.in_flight:
+            break
+        threading.Event().wait(0.01)
+    status, headers, _ = svc.handle("POST", "/parse", _pdf(BNA))
+    assert status == 503 and headers["Retry-After"] == "5"
+    bloqueado.set()
+    primero.join(10)
+    assert svc.in_flight == 0
+
+
+def test_504_libera_el_lugar_cuando_termina_el_worker(svc, bloqueado):
+    svc.timeout = 0.2
+    status, _, body = svc.handle("POST", "/parse", _pdf(BNA))
+    assert status == 504, body
+    # el worker sigue corriendo: el lugar en la cola sigue tomado
+    assert svc.in_flight == 1
+    assert svc.handle("POST", "/parse", _pdf(BNA))[0] == 503
+    bloqueado.set()
+    for _ in range(200):
+        if not svc.in_flight:
+            break
+        threading.Event().wait(0.01)
+    assert svc.in_flight == 0 and svc.metrics()["vencidos"] == 1
+
+
+@pytest.fixture
+def url(svc):
+    server, base = service.serve_in_thread(svc)
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def _post(addr, length):
+    conn = http.client.HTTPConnection(*addr, timeout=10)
+    conn.putrequest("POST", "/parse")
+    conn.putheader("Content-Length", length)
+    conn.endheaders()
+    resp = conn.getresponse()
+    status = resp.status
+    conn.close()
+    return status
+
+
+def test_413_cuerpo_grande(url):
+    assert _post(url, str(service.MAX_BODY_MB * 2**20 + 1)) == 413
+
+
+@pytest.mark.parametrize("length", ["-5", "abc"])
+def test_400_content_length_invalido(url, length):
+    assert _post(url, length) == 400
+
+
+def test_pool_por_defecto_usa_spawn():
+    s = service.Service(max_workers=1)
+    try:
+        assert s.executor._mp_context.get_start_method() == "spawn"
+        status, _, body = s.handle("POST", "/parse", _pdf(BNA))
+        assert status == 200, body
+    finally:
+        s.close()
@@ -0,0 +1,29 @@
+import random
+
+import pytest
+
+from parsers import golden, tokens
+
+CORPUS = tokens._corpus(golden.GOLDEN_DIR)
+
+
+def test_corpus_dorado_igual_que_las_regex():
+    assert CORPUS
+    assert {ln: tokens.check_line(ln) for ln in CORPUS if tokens.check_line(ln)} == {}
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_fuzz_igual_que_las_regex(seed):
+    rng = random.Random(seed)
+    diferencias = {}
+    for _ in range(5000):
+        ln = tokens._mutate(rng, rng.choice(CORPUS)) if rng.random() < 0.5 else tokens._random_line(rng)
+        errs = tokens.check_line(ln)
+        if errs:
+            diferencias[ln] = errs
+    assert diferencias == {}
+
+
+def test_cli_fuzz(capsys):
+    assert tokens.main(["fuzz", str(golden.GOLDEN_DIR), "--lines", "500", "--seed", "7"]) == 0
+    assert "0 con diferencias" in capsys.readouterr().out